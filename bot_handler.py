@@ -1,7 +1,14 @@
+import os
+import asyncio
 import logging
-from telegram import Update
-from telegram.ext import ApplicationBuilder, CommandHandler, ContextTypes
-from decouple import config
+import django
+
+# Настройка Django: обработчики и настройки ботов общие с сайтом (reminders/telegram_bot.py)
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'reminder_project.settings')
+django.setup()
+
+from reminders.bots import bot_id_for_token
+from reminders.telegram_bot import TELEGRAM_BOT_TOKENS, TELEGRAM_WEBHOOK_URL, build_application
 
 # Настройка логирования
 logging.basicConfig(
@@ -10,36 +17,38 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-TELEGRAM_BOT_TOKEN = config('TELEGRAM_BOT_TOKEN')
+async def poll(application):
+    async with application:
+        await application.start()
+        await application.updater.start_polling()
+        try:
+            await asyncio.Event().wait()
+        finally:
+            await application.updater.stop()
+            await application.stop()
 
-async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Обработчик команды /start."""
-    chat_id = update.effective_message.chat_id
-    chat_type = update.effective_message.chat.type
+async def poll_all(applications):
+    """Опрашивает всех ботов в одном event loop"""
+    async with asyncio.TaskGroup() as tasks:
+        for application in applications:
+            tasks.create_task(poll(application))
 
-    logger.info(f"Received /start command from chat_id: {chat_id}, chat_type: {chat_type}")
+def run_bot():
+    """
+    Запуск ботов в режиме long polling - для запуска без ASGI-сервера.
 
-    if chat_type == 'private':
-        await update.message.reply_text(
-            f"Привет! Я бот для напоминаний.\n"
-            f"Ваш Chat ID: <code>{chat_id}</code>\n"
-            f"Добавьте его при создании пользователя на сайте.",
-            parse_mode='HTML'
-        )
+    При заданном TELEGRAM_WEBHOOK_URL обновления принимает сайт (reminder_project/asgi.py);
+    опрос снимает webhook, поэтому оба режима одновременно не запускаются.
+    """
+    if TELEGRAM_WEBHOOK_URL:
+        logger.error("TELEGRAM_WEBHOOK_URL is set: updates are served by the ASGI app, polling is not started")
+        return
+    applications = [build_application(token) for token in TELEGRAM_BOT_TOKENS]
+    logger.info(f"Bots {', '.join(bot_id_for_token(token) for token in TELEGRAM_BOT_TOKENS)} started polling...")
+    if len(applications) == 1:
+        applications[0].run_polling()
     else:
-        await update.message.reply_text(
-            f"Привет! Я бот для напоминаний.\n"
-            f"Мой Chat ID для этого чата: <code>{chat_id}</code>\n"
-            f"Добавьте его при создании пользователя на сайте.",
-            parse_mode='HTML'
-        )
-
-def run_bot():
-    """Запуск бота."""
-    application = ApplicationBuilder().token(TELEGRAM_BOT_TOKEN).build()
-    application.add_handler(CommandHandler("start", start_command))
-    logger.info("Bot started polling...")
-    application.run_polling()
+        asyncio.run(poll_all(applications))
 
 if __name__ == "__main__":
-    run_bot()
\ No newline at end of file
+    run_bot()
@@ -13,4 +13,15 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'reminder_project.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Импорт после настройки Django: модулю нужны приложения и URL
+from reminders.telegram_bot import webhook_lifespan  # noqa: E402
+
+
+async def application(scope, receive, send):
+    """Django плюс ASGI lifespan, в котором запускаются боты в режиме webhook"""
+    if scope['type'] == 'lifespan':
+        await webhook_lifespan(receive, send)
+        return
+    await django_application(scope, receive, send)
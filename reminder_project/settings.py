@@ -87,9 +87,21 @@ DATABASES = {
         'PASSWORD': config('DB_PASSWORD'),
         'HOST': config('DB_HOST'),
         'PORT': config('DB_PORT'),
+        # Под ASGI асинхронные представления выполняют запросы в разных потоках, и постоянные
+        # соединения там только копятся, поэтому по умолчанию они выключены
+        'CONN_MAX_AGE': config('DB_CONN_MAX_AGE', default=0, cast=int),
+        'CONN_HEALTH_CHECKS': True,
     }
 }
 
+# Долгоживущему диспетчеру (run_dispatcher) постоянное соединение нужно: он подменяет CONN_MAX_AGE этим значением
+DISPATCHER_CONN_MAX_AGE = config('DISPATCHER_DB_CONN_MAX_AGE', default=60, cast=int)
+
+# Кэш получателей (reminders/recipients.py) всегда хранится в памяти процесса; если задан
+# алиас из CACHES (например, общий Redis), состав групп дополнительно делится между процессами
+RECIPIENT_CACHE_ALIAS = config('RECIPIENT_CACHE_ALIAS', default='') or None
+RECIPIENT_CACHE_TIMEOUT = config('RECIPIENT_CACHE_TIMEOUT', default=3600, cast=int)
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
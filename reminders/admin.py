@@ -1,20 +1,53 @@
 from django.contrib import admin
-from .models import Group, UserInGroup, Reminder
+from .health import reactivate_chats
+from .models import Group, UserInGroup, Reminder, Delivery, SendJob
 
 @admin.register(Group)
 class GroupAdmin(admin.ModelAdmin):
-    list_display = ['id', 'name']
-    search_fields = ['name']
+    list_display = [
+        'id', 'name', 'telegram_chat_id', 'telegram_bot_id', 'chat_is_active', 'chat_blocked_at',
+        'chat_consecutive_failures',
+    ]
+    list_filter = ['chat_is_active', 'telegram_bot_id']
+    search_fields = ['name', 'telegram_chat_id']
+    actions = ['reactivate']
+
+    @admin.action(description="Вернуть чаты выбранных групп в рассылку")
+    def reactivate(self, request, queryset):
+        count = reactivate_chats(queryset)
+        self.message_user(request, f"Возвращено в рассылку: {count}")
 
 @admin.register(UserInGroup)
 class UserInGroupAdmin(admin.ModelAdmin):
-    list_display = ['id', 'name', 'telegram_id', 'group']
-    list_filter = ['group']
+    list_display = [
+        'id', 'name', 'telegram_id', 'group', 'telegram_bot_id', 'is_active', 'blocked_at', 'consecutive_failures',
+    ]
+    list_filter = ['is_active', 'telegram_bot_id', 'group']
     search_fields = ['name', 'telegram_id']
+    actions = ['reactivate']
+
+    @admin.action(description="Вернуть выбранные чаты в рассылку")
+    def reactivate(self, request, queryset):
+        count = reactivate_chats(queryset)
+        self.message_user(request, f"Возвращено в рассылку: {count}")
 
 @admin.register(Reminder)
 class ReminderAdmin(admin.ModelAdmin):
     list_display = ['id', 'text', 'due_time', 'is_completed']
     list_filter = ['is_completed', 'due_time', 'groups']
     filter_horizontal = ('groups',) # Для удобного выбора групп
-    search_fields = ['text']
\ No newline at end of file
+    search_fields = ['text']
+
+@admin.register(Delivery)
+class DeliveryAdmin(admin.ModelAdmin):
+    list_display = ['id', 'reminder', 'repeat_number', 'telegram_id', 'status', 'error_code', 'updated_at']
+    list_filter = ['status', 'updated_at']
+    search_fields = ['telegram_id', 'error_code']
+    raw_id_fields = ['reminder']
+
+
+@admin.register(SendJob)
+class SendJobAdmin(admin.ModelAdmin):
+    list_display = ['id', 'reminder', 'status', 'result', 'claimed_by', 'created_at', 'finished_at']
+    list_filter = ['status', 'result']
+    raw_id_fields = ['reminder']
\ No newline at end of file
@@ -0,0 +1,74 @@
+import logging
+from contextlib import AsyncExitStack
+
+from django.db import transaction
+
+from .models import Group, UserInGroup
+from .recipients import recipients_changed
+
+logger = logging.getLogger(__name__)
+
+
+def bot_id_for_token(token):
+    """ID бота - часть токена до двоеточия; он не меняется при перевыпуске токена"""
+    return token.split(':', 1)[0]
+
+
+def parse_bot_tokens(default_token, extra_tokens=''):
+    """Основной токен и дополнительные (через запятую) без повторов; основной идет первым"""
+    tokens = [default_token] + [token.strip() for token in extra_tokens.split(',') if token.strip()]
+    return list(dict.fromkeys(tokens))
+
+
+class BotPool:
+    """
+    Боты рассылки по ID: у каждого своя HTTP-сессия и свой ограничитель скорости,
+    поэтому общий предел растет с числом токенов.
+
+    Чат закреплен за ботом (telegram_bot_id у UserInGroup и Group): писать первым можно только
+    тем, кто начал диалог с этим ботом. Незакрепленные чаты и чаты удаленных из настроек
+    ботов обслуживает основной бот.
+    """
+
+    def __init__(self, bots, default_id):
+        # {bot_id: (bot, limiter)}
+        self._bots = dict(bots)
+        self.default_id = default_id
+        self._stack = None
+
+    @property
+    def ids(self):
+        return list(self._bots)
+
+    def route(self, bot_id):
+        """(бот, ограничитель) для чата, закрепленного за bot_id"""
+        return self._bots.get(bot_id) or self._bots[self.default_id]
+
+    async def __aenter__(self):
+        self._stack = AsyncExitStack()
+        for bot, _ in self._bots.values():
+            await self._stack.enter_async_context(bot)
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self._stack.aclose()
+        self._stack = None
+
+
+def assign_chat_bot(chat_id, bot_id):
+    """
+    Закрепляет чат за ботом, которому в нем нажали /start: личный чат пользователя
+    и групповой чат группы. Возвращает число обновленных записей.
+    """
+    chat_id = str(chat_id)
+    with transaction.atomic():
+        users = UserInGroup.objects.filter(telegram_id=chat_id).exclude(telegram_bot_id=bot_id)
+        groups = Group.objects.filter(telegram_chat_id=chat_id).exclude(telegram_bot_id=bot_id)
+        group_ids = set(users.values_list('group_id', flat=True)) | set(groups.values_list('id', flat=True))
+        updated = users.update(telegram_bot_id=bot_id) + groups.update(telegram_bot_id=bot_id)
+        if group_ids:
+            # update() не отправляет сигналы: кэш получателей сбрасываем сами
+            recipients_changed(group_ids=group_ids)
+    if updated:
+        logger.info(f"Chat {chat_id} assigned to bot {bot_id}")
+    return updated
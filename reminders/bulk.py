@@ -0,0 +1,196 @@
+import logging
+
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import Group, Reminder
+from .notify import notify_reminders_changed
+from .signals import bulk_deleting, record_reminders_deleted
+
+logger = logging.getLogger(__name__)
+
+# Сколько элементов (создание + изменение + удаление) принимается за один запрос
+MAX_BULK_ITEMS = 5000
+BULK_BATCH_SIZE = 500
+
+
+class ItemError(ValueError):
+    pass
+
+
+def _int(value, name):
+    try:
+        return int(value)
+    except (ValueError, TypeError):
+        raise ItemError(f'Invalid {name}')
+
+
+def _datetime(value, name):
+    # parse_datetime возвращает None для чужого формата, но бросает ValueError
+    # для невозможной даты в верном формате (2024-13-01T00:00:00)
+    try:
+        parsed = parse_datetime(str(value))
+    except (ValueError, TypeError):
+        parsed = None
+    if not parsed:
+        raise ItemError(f'Invalid {name} format')
+    return parsed
+
+
+def _parse_fields(item, partial):
+    """Проверяет поля одного напоминания; partial - изменение, где все поля необязательны"""
+    if not isinstance(item, dict):
+        raise ItemError('Item must be an object')
+
+    fields = {}
+    if 'text' in item or not partial:
+        text = str(item.get('text') or '').strip()
+        if not text:
+            raise ItemError('Text is required')
+        fields['text'] = text
+
+    if 'due_time' in item or not partial:
+        if not item.get('due_time'):
+            raise ItemError('Due time is required')
+        fields['due_time'] = _datetime(item['due_time'], 'due_time')
+
+    if 'sent_at' in item:
+        fields['sent_at'] = _datetime(item['sent_at'], 'sent_at') if item['sent_at'] else None
+
+    if 'is_completed' in item:
+        fields['is_completed'] = bool(item['is_completed'])
+    for name in ('repeat_interval_minutes', 'max_repeats'):
+        if name in item:
+            fields[name] = _int(item[name], name)
+
+    group_ids = None
+    if 'groups' in item or not partial:
+        try:
+            group_ids = [int(g['id']) for g in item.get('groups') or []]
+        except (ValueError, TypeError, KeyError):
+            raise ItemError('Invalid group IDs')
+    return fields, group_ids
+
+
+def _set_groups(reminder_group_ids):
+    """Заменяет группы у напоминаний {id: [group_id]} двумя запросами на всю пачку"""
+    through = Reminder.groups.through
+    through.objects.filter(reminder_id__in=list(reminder_group_ids)).delete()
+    through.objects.bulk_create(
+        [
+            through(reminder_id=reminder_id, group_id=group_id)
+            for reminder_id, group_ids in reminder_group_ids.items()
+            for group_id in set(group_ids)
+        ],
+        batch_size=BULK_BATCH_SIZE,
+    )
+
+
+def apply_bulk(create_items, update_items, delete_ids):
+    """
+    Создает, изменяет и удаляет напоминания пачкой в одной транзакции.
+
+    Группы всех элементов проверяются одним запросом, напоминания и их связи с группами
+    создаются через bulk_create, изменения сохраняются одним bulk_update. Ошибочные элементы
+    пропускаются; для каждого элемента возвращается результат с его индексом в запросе.
+    """
+    results = {'created': [], 'updated': [], 'deleted': []}
+
+    parsed_create = []
+    for index, item in enumerate(create_items):
+        try:
+            parsed_create.append((index, *_parse_fields(item, partial=False)))
+        except ItemError as e:
+            results['created'].append({'index': index, 'error': str(e)})
+
+    parsed_update = []
+    for index, item in enumerate(update_items):
+        try:
+            reminder_id = _int(item.get('id') if isinstance(item, dict) else None, 'id')
+            parsed_update.append((index, reminder_id, *_parse_fields(item, partial=True)))
+        except ItemError as e:
+            results['updated'].append({'index': index, 'error': str(e)})
+
+    requested_groups = {
+        group_id
+        for parsed in (parsed_create, parsed_update)
+        for *_, group_ids in parsed
+        for group_id in group_ids or []
+    }
+    existing_groups = set(Group.objects.filter(id__in=requested_groups).values_list('id', flat=True))
+
+    def check_groups(group_ids):
+        if group_ids and not existing_groups.issuperset(group_ids):
+            raise ItemError('Some group IDs do not exist')
+
+    to_create, updated, existing = [], {}, set()
+    with transaction.atomic():
+        # Создание
+        for index, fields, group_ids in parsed_create:
+            try:
+                check_groups(group_ids)
+            except ItemError as e:
+                results['created'].append({'index': index, 'error': str(e)})
+                continue
+            to_create.append((index, Reminder(**fields), group_ids))
+
+        if to_create:
+            Reminder.objects.bulk_create([reminder for _, reminder, _ in to_create], batch_size=BULK_BATCH_SIZE)
+            _set_groups({reminder.id: group_ids for _, reminder, group_ids in to_create})
+            results['created'].extend({'index': index, 'id': reminder.id} for index, reminder, _ in to_create)
+            notify_reminders_changed([reminder.id for _, reminder, _ in to_create], 'created')
+
+        # Изменение
+        if parsed_update:
+            reminders = Reminder.objects.select_for_update().in_bulk([reminder_id for _, reminder_id, *_ in parsed_update])
+            now = timezone.now()
+            changed_fields = {'updated_at'}
+            new_groups = {}
+            for index, reminder_id, fields, group_ids in parsed_update:
+                reminder = reminders.get(reminder_id)
+                try:
+                    if reminder is None:
+                        raise ItemError('Reminder not found')
+                    check_groups(group_ids)
+                except ItemError as e:
+                    results['updated'].append({'index': index, 'id': reminder_id, 'error': str(e)})
+                    continue
+
+                for name, value in fields.items():
+                    setattr(reminder, name, value)
+                changed_fields.update(fields)
+                # Как и в ReminderUpdateView.put: новые настройки повторения сбрасывают счетчик
+                if 'repeat_interval_minutes' in fields or 'max_repeats' in fields:
+                    reminder.repeat_count = 0
+                    changed_fields.add('repeat_count')
+                if group_ids is not None:
+                    new_groups[reminder_id] = group_ids
+                reminder.updated_at = now
+                updated[reminder_id] = reminder
+                results['updated'].append({'index': index, 'id': reminder_id})
+
+            if updated:
+                Reminder.objects.bulk_update(list(updated.values()), sorted(changed_fields), batch_size=BULK_BATCH_SIZE)
+                if new_groups:
+                    _set_groups(new_groups)
+                notify_reminders_changed(list(updated), 'updated')
+
+        # Удаление: QuerySet.delete() ради каскада, но следы для ?since=, очистка старых следов
+        # и уведомление пишутся один раз на пачку, а не в post_delete каждого напоминания
+        if delete_ids:
+            existing = set(Reminder.objects.filter(id__in=delete_ids).values_list('id', flat=True))
+            with bulk_deleting():
+                Reminder.objects.filter(id__in=existing).delete()
+            record_reminders_deleted(sorted(existing))
+            results['deleted'].extend(
+                {'id': reminder_id} if reminder_id in existing else {'id': reminder_id, 'error': 'Reminder not found'}
+                for reminder_id in delete_ids
+            )
+
+    for key in results:
+        results[key].sort(key=lambda result: result.get('index', 0))
+    logger.info(
+        f"Bulk reminders: created {len(to_create)}, updated {len(updated)}, deleted {len(existing)}"
+    )
+    return results
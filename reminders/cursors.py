@@ -0,0 +1,24 @@
+import base64
+import json
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(values):
+    """Непрозрачный для клиента курсор из списка JSON-совместимых значений"""
+    raw = json.dumps(values, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token, size):
+    """Разбирает курсор encode_cursor; ожидает ровно size значений"""
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        values = json.loads(raw)
+    except (ValueError, TypeError):
+        raise InvalidCursor(token)
+    if not isinstance(values, list) or len(values) != size:
+        raise InvalidCursor(token)
+    return values
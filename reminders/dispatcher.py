@@ -0,0 +1,122 @@
+import asyncio
+import logging
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections
+from django.utils import timezone
+
+from send_reminders import create_bot_pool, process_due_reminders
+from .jobs import run_job_workers
+from .notify import ReminderChangeListener
+from .recipients import recipient_cache
+from .scheduler import ReminderScheduler
+
+logger = logging.getLogger(__name__)
+
+
+async def run_dispatcher(max_sleep=60, error_sleep=5, horizon_hours=6, retry_delay=60, job_workers=4):
+    """
+    Постоянно работающий диспетчер рассылки.
+
+    Держит один event loop, ботов рассылки (BotPool, у каждого своя HTTP-сессия) и одно соединение с БД.
+    Ближайшие напоминания хранятся в ReminderScheduler; таблица перечитывается только
+    при загрузке окна и по уведомлениям об изменениях (LISTEN/NOTIFY). Без PostgreSQL
+    окно перезагружается не реже раза в max_sleep секунд.
+
+    Здесь же работают job_workers обработчиков очереди SendJob (отправки из браузера).
+    """
+    bots = create_bot_pool()
+    scheduler = ReminderScheduler(horizon=timedelta(hours=horizon_hours))
+    changed_ids = set()
+    wakeup = asyncio.Event()
+    jobs_wakeup = asyncio.Event()
+
+    def on_change(reminder_ids, event=None):
+        if event == 'recipients':
+            # Здесь ID групп: сменился их состав, расписание не затронуто
+            recipient_cache.invalidate(group_ids=reminder_ids)
+            return
+        if reminder_ids:
+            recipient_cache.invalidate(reminder_ids=reminder_ids)
+        else:
+            recipient_cache.clear()
+        changed_ids.update(reminder_ids)
+        wakeup.set()
+        # Постановка задания в очередь тоже отправляет уведомление
+        jobs_wakeup.set()
+
+    listener = ReminderChangeListener(on_change)
+    passes = set()
+
+    async def process(now, due_ids):
+        """Проход рассылки в фоне: повторы отдельных получателей не задерживают следующие напоминания"""
+        try:
+            await process_due_reminders(bots, now, due_ids, retry_delay=retry_delay)
+            # Повторяющиеся напоминания получили новое due_time, неотправленные - next_attempt_at
+            # через retry_delay; не попавшие в пачку вернутся в кучу, а забранные другим
+            # диспетчером (is_sending) из нее уйдут
+            await scheduler.arefresh(due_ids)
+        except Exception as e:
+            logger.error(f"Dispatcher pass failed: {e}", exc_info=True)
+            scheduler.invalidate()
+        wakeup.set()
+
+    async with bots:
+        logger.info("Dispatcher started")
+        job_workers_task = asyncio.create_task(run_job_workers(bots, jobs_wakeup, workers=job_workers))
+        try:
+            while True:
+                try:
+                    # Закрываем соединение с БД, только если оно сломано или устарело (CONN_MAX_AGE)
+                    await sync_to_async(close_old_connections)()
+
+                    if not listener.active:
+                        # Пока слушатель не работает, изменения могли быть пропущены
+                        scheduler.invalidate()
+                        recipient_cache.clear()
+                        await listener.start()
+
+                    now = timezone.now()
+                    if scheduler.needs_reload(now):
+                        changed_ids.clear()
+                        await scheduler.aload(now)
+                    elif changed_ids:
+                        reminder_ids = list(changed_ids)
+                        changed_ids.clear()
+                        await scheduler.arefresh(reminder_ids)
+
+                    due_ids = scheduler.pop_due(now)
+                    if due_ids:
+                        task = asyncio.create_task(process(now, due_ids))
+                        passes.add(task)
+                        task.add_done_callback(passes.discard)
+                except Exception as e:
+                    logger.error(f"Dispatcher iteration failed: {e}", exc_info=True)
+                    scheduler.invalidate()
+                    await asyncio.sleep(error_sleep)
+                    continue
+
+                delay = max_sleep
+                next_due_time = scheduler.next_due_time()
+                if next_due_time:
+                    delay = min(delay, (next_due_time - timezone.now()).total_seconds())
+                if scheduler.horizon_end:
+                    delay = min(delay, (scheduler.horizon_end - timezone.now()).total_seconds())
+                delay = max(delay, 0)
+
+                if changed_ids:
+                    continue
+
+                logger.info(f"Next due reminder at {next_due_time}, sleeping up to {delay:.1f}s")
+                wakeup.clear()
+                try:
+                    await asyncio.wait_for(wakeup.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            listener.stop()
+            job_workers_task.cancel()
+            await asyncio.gather(job_workers_task, return_exceptions=True)
+            if passes:
+                await asyncio.gather(*passes, return_exceptions=True)
@@ -0,0 +1,103 @@
+import asyncio
+import logging
+
+from asgiref.sync import sync_to_async
+
+from .models import Reminder
+from .notify import ReminderChangeListener
+from .serializers import serialize_reminders
+
+logger = logging.getLogger(__name__)
+
+# Сколько событий может накопиться у медленного клиента, прежде чем он получит resync
+SUBSCRIBER_QUEUE_SIZE = 1000
+
+
+def load_reminder_events(reminder_ids):
+    """Текущее состояние изменившихся напоминаний одним запросом (плюс один для групп)"""
+    return {row['id']: row for row in serialize_reminders(Reminder.objects.filter(id__in=reminder_ids))}
+
+
+class ReminderEventHub:
+    """
+    Раздает изменения напоминаний всем открытым потокам событий процесса.
+
+    На процесс приходится одно LISTEN-соединение и один запрос на каждое уведомление,
+    независимо от числа подписчиков: нагрузка на БД зависит от числа изменений, а не зрителей.
+    """
+
+    def __init__(self):
+        self._subscribers = set()
+        self._listener = ReminderChangeListener(self._on_change)
+        self._publishing = set()
+
+    async def astart(self):
+        """Подключает слушателя, если он еще не работает; False - событий не будет"""
+        if self._listener.active:
+            return True
+        return await self._listener.start()
+
+    def subscribe(self):
+        queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self._subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue):
+        self._subscribers.discard(queue)
+        if not self._subscribers:
+            self._listener.stop()
+
+    def _put(self, queue, event):
+        try:
+            queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Клиент не успевает читать: выбрасываем накопленное и просим перезагрузить страницу
+            while not queue.empty():
+                queue.get_nowait()
+            queue.put_nowait({'type': 'resync'})
+
+    def _broadcast(self, events):
+        for queue in list(self._subscribers):
+            for event in events:
+                self._put(queue, event)
+
+    def _on_change(self, reminder_ids, event):
+        if not reminder_ids:
+            # Соединение потеряно: изменения могли быть пропущены. Закрываем потоки,
+            # браузеры переподключатся (и перезапустят слушателя) и перечитают страницу
+            self._broadcast([{'type': 'resync'}, None])
+            return
+        if event in ('send_queued', 'recipients'):
+            return
+        task = asyncio.create_task(self._publish(reminder_ids, event))
+        self._publishing.add(task)
+        task.add_done_callback(self._publishing.discard)
+
+    async def _publish(self, reminder_ids, event):
+        if event == 'deleted':
+            self._broadcast([{'type': 'deleted', 'id': reminder_id} for reminder_id in reminder_ids])
+            return
+
+        try:
+            rows = await sync_to_async(load_reminder_events)(reminder_ids)
+        except Exception as e:
+            logger.error(f"Failed to load reminder events: {e}")
+            self._broadcast([{'type': 'resync'}])
+            return
+
+        self._broadcast([
+            {'type': event, 'id': reminder_id, 'reminder': rows[reminder_id]}
+            if reminder_id in rows else {'type': 'deleted', 'id': reminder_id}
+            for reminder_id in reminder_ids
+        ])
+
+
+_hub = None
+
+
+def get_event_hub():
+    """Хаб процесса; создается в event loop ASGI-сервера при первом подписчике"""
+    global _hub
+    if _hub is None:
+        _hub = ReminderEventHub()
+    return _hub
@@ -0,0 +1,51 @@
+# Ограничение Telegram на длину текста одного сообщения
+TELEGRAM_MESSAGE_LIMIT = 4096
+
+MESSAGE_HEADER = "Вы просили напомнить:\n"
+MERGED_SEPARATOR = "\n\n"
+
+
+def reminder_message(text):
+    return f"{MESSAGE_HEADER}{text}"
+
+
+def _merge(chat_id, reminders, limit):
+    """Склеивает напоминания одного чата в сообщения не длиннее limit, сохраняя порядок"""
+    messages = []
+    reminder_ids, texts, length = [], [], len(MESSAGE_HEADER)
+    for reminder in reminders:
+        added = len(reminder.text) + (len(MERGED_SEPARATOR) if texts else 0)
+        if texts and length + added > limit:
+            messages.append((chat_id, tuple(reminder_ids), MESSAGE_HEADER + MERGED_SEPARATOR.join(texts)))
+            reminder_ids, texts, length = [], [], len(MESSAGE_HEADER)
+            added = len(reminder.text)
+        reminder_ids.append(reminder.id)
+        texts.append(reminder.text)
+        length += added
+    if texts:
+        messages.append((chat_id, tuple(reminder_ids), MESSAGE_HEADER + MERGED_SEPARATOR.join(texts)))
+    return messages
+
+
+def plan_fanout(reminders_user_data, delivered, merge=False, limit=TELEGRAM_MESSAGE_LIMIT):
+    """
+    Матрица рассылки одного прохода: список сообщений (chat_id, ID напоминаний, текст).
+
+    Чаты каждого напоминания берутся без повторов, уже получившие текущий повтор
+    (delivered: {reminder_id: set(chat_id)}) пропускаются. С merge=True все напоминания,
+    которые причитаются одному чату, уходят одним сообщением (или несколькими, если текст
+    длиннее limit), то есть одним слотом ограничителя скорости вместо нескольких.
+    """
+    by_chat = {}
+    for reminder, chat_ids in reminders_user_data:
+        for chat_id in dict.fromkeys(chat_ids):
+            if chat_id not in delivered[reminder.id]:
+                by_chat.setdefault(chat_id, []).append(reminder)
+
+    messages = []
+    for chat_id, reminders in by_chat.items():
+        if merge and len(reminders) > 1:
+            messages.extend(_merge(chat_id, reminders, limit))
+        else:
+            messages.extend((chat_id, (reminder.id,), reminder_message(reminder.text)) for reminder in reminders)
+    return messages
@@ -6,11 +6,11 @@ from .models import Reminder, Group, UserInGroup
 class GroupForm(forms.ModelForm):
     class Meta:
         model = Group
-        fields = ['name']
-        labels = {'name': 'Имя'}
+        fields = ['name', 'telegram_chat_id', 'telegram_bot_id']
+        labels = {'name': 'Имя', 'telegram_chat_id': 'Чат группы', 'telegram_bot_id': 'Бот'}
 
 class UserInGroupForm(forms.ModelForm):
     class Meta:
         model = UserInGroup
-        fields = ['name', 'telegram_id', 'group']
-        labels = {'name': 'Имя', 'telegram_id': 'Telegram ID', 'group': 'Группа'}
\ No newline at end of file
+        fields = ['name', 'telegram_id', 'group', 'telegram_bot_id']
+        labels = {'name': 'Имя', 'telegram_id': 'Telegram ID', 'group': 'Группа', 'telegram_bot_id': 'Бот'}
\ No newline at end of file
@@ -0,0 +1,110 @@
+import logging
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Delivery, Group, UserInGroup
+from .recipients import recipients_changed
+
+logger = logging.getLogger(__name__)
+
+# После стольких ошибок чата подряд он выключается, как и заблокировавший бота
+CHAT_MAX_FAILURES = 3
+
+# Где хранится состояние чатов: личные чаты участников и общие чаты групп
+# (поле chat_id, поле группы, is_active, blocked_at, consecutive_failures)
+CHAT_HEALTH_FIELDS = {
+    UserInGroup: ('telegram_id', 'group_id', 'is_active', 'blocked_at', 'consecutive_failures'),
+    Group: ('telegram_chat_id', 'id', 'chat_is_active', 'chat_blocked_at', 'chat_consecutive_failures'),
+}
+
+
+def chat_statuses(results):
+    """
+    Итог прохода по каждому чату из пар (chat_id, статус Delivery): хоть одно
+    доставленное сообщение значит, что чат жив, иначе важнее блокировка, затем ошибка чата.
+    """
+    priority = [
+        Delivery.STATUS_SENT, Delivery.STATUS_BLOCKED, Delivery.STATUS_UNREACHABLE,
+        Delivery.STATUS_REJECTED, Delivery.STATUS_FAILED,
+    ]
+    statuses = {}
+    for chat_id, status in results:
+        current = statuses.get(chat_id)
+        if current is None or priority.index(status) < priority.index(current):
+            statuses[chat_id] = status
+    return statuses
+
+
+def _deactivate(model, queryset, now):
+    """Выключает чаты запроса; возвращает группы, у которых изменился состав получателей"""
+    _, group_field, active_field, blocked_field, _ = CHAT_HEALTH_FIELDS[model]
+    rows = list(queryset.filter(**{active_field: True}).values_list('id', group_field))
+    if rows:
+        model.objects.filter(id__in=[pk for pk, _ in rows]).update(**{active_field: False, blocked_field: now})
+    return {group_id for _, group_id in rows}
+
+
+def _record(model, sent, blocked, unreachable, now):
+    chat_field, _, _, _, failures_field = CHAT_HEALTH_FIELDS[model]
+    chats = model.objects.all()
+    changed_groups = set()
+    if sent:
+        chats.filter(**{f'{chat_field}__in': sent, f'{failures_field}__gt': 0}).update(**{failures_field: 0})
+    if blocked:
+        changed_groups |= _deactivate(model, chats.filter(**{f'{chat_field}__in': blocked}), now)
+    if unreachable:
+        chats.filter(**{f'{chat_field}__in': unreachable}).update(**{failures_field: F(failures_field) + 1})
+        changed_groups |= _deactivate(model, chats.filter(**{
+            f'{chat_field}__in': unreachable, f'{failures_field}__gte': CHAT_MAX_FAILURES,
+        }), now)
+    return changed_groups
+
+
+def record_chat_health(statuses):
+    """
+    Пакетно записывает состояние чатов после прохода рассылки ({chat_id: статус}) -
+    и личных чатов участников, и общих чатов групп.
+
+    Заблокировавшие бота выключаются сразу, ошибки чата (не найден, нет прав) копятся
+    в consecutive_failures до CHAT_MAX_FAILURES, успешная отправка обнуляет счетчик.
+    Временные ошибки и отказы в самом сообщении состояние не меняют.
+    Число запросов не зависит от числа чатов.
+    """
+    by_status = {}
+    for chat_id, status in statuses.items():
+        by_status.setdefault(status, []).append(chat_id)
+    sent = by_status.get(Delivery.STATUS_SENT, [])
+    blocked = by_status.get(Delivery.STATUS_BLOCKED, [])
+    unreachable = by_status.get(Delivery.STATUS_UNREACHABLE, [])
+    if not (sent or blocked or unreachable):
+        return
+
+    now = timezone.now()
+    changed_groups = set()
+    with transaction.atomic():
+        for model in CHAT_HEALTH_FIELDS:
+            changed_groups |= _record(model, sent, blocked, unreachable, now)
+        if changed_groups:
+            # update() не отправляет сигналы: кэш получателей сбрасываем сами
+            recipients_changed(group_ids=changed_groups)
+
+    if changed_groups:
+        logger.warning(f"Deactivated dead chats in groups {sorted(changed_groups)}")
+
+
+def reactivate_chats(queryset):
+    """Возвращает чаты в рассылку (участников или групп - по модели запроса); возвращает их число"""
+    model = queryset.model
+    _, group_field, active_field, blocked_field, failures_field = CHAT_HEALTH_FIELDS[model]
+    rows = list(queryset.filter(**{active_field: False}).values_list('id', group_field))
+    if not rows:
+        return 0
+    with transaction.atomic():
+        model.objects.filter(id__in=[pk for pk, _ in rows]).update(
+            **{active_field: True, blocked_field: None, failures_field: 0},
+        )
+        recipients_changed(group_ids={group_id for _, group_id in rows})
+    logger.info(f"Reactivated {len(rows)} chats")
+    return len(rows)
@@ -0,0 +1,163 @@
+import asyncio
+import logging
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from send_reminders import WORKER_ID, CLAIM_LEASE_SECONDS, lease_expiry, process_due_reminders
+from .models import Reminder, SendJob
+from .notify import notify_reminders_changed
+
+logger = logging.getLogger(__name__)
+
+# Браузер может запросить отправку чуть раньше due_time (часы клиента спешат)
+SEND_CUSHION = timedelta(seconds=10)
+
+ACTIVE_STATUSES = [SendJob.STATUS_QUEUED, SendJob.STATUS_RUNNING]
+
+
+def enqueue_send_job(reminder):
+    """
+    Ставит отправку напоминания в очередь.
+
+    Если по напоминанию уже есть незавершенное задание (например, из другой вкладки),
+    возвращается оно, и новая отправка не создается.
+    """
+    with transaction.atomic():
+        job = SendJob.objects.filter(reminder=reminder, status__in=ACTIVE_STATUSES).first()
+        if job is None:
+            job = SendJob.objects.create(reminder=reminder)
+            # Будим обработчиков очереди в диспетчере
+            notify_reminders_changed([reminder.id], 'send_queued')
+            logger.info(f"Queued send job {job.id} for reminder {reminder.id}")
+    return job
+
+
+def claim_send_jobs(limit):
+    """Забирает старейшие задания из очереди (и зависшие у упавших обработчиков)"""
+    now = timezone.now()
+    with transaction.atomic():
+        jobs = list(
+            SendJob.objects.select_for_update(skip_locked=True)
+            .filter(
+                Q(status=SendJob.STATUS_QUEUED)
+                | Q(status=SendJob.STATUS_RUNNING, lease_expires_at__lte=now)
+                # Захваченные до появления аренды
+                | Q(
+                    status=SendJob.STATUS_RUNNING,
+                    lease_expires_at__isnull=True,
+                    started_at__lt=now - timedelta(seconds=CLAIM_LEASE_SECONDS),
+                )
+            )
+            .order_by('created_at')[:limit]
+        )
+        if jobs:
+            SendJob.objects.filter(id__in=[job.id for job in jobs]).update(
+                status=SendJob.STATUS_RUNNING,
+                started_at=now,
+                lease_expires_at=lease_expiry(),
+                claimed_by=WORKER_ID,
+            )
+    return jobs
+
+
+async def keep_job_lease(job_id):
+    """Фоновое продление аренды задания, пока оно выполняется (рассылка может идти дольше аренды)"""
+    while True:
+        await asyncio.sleep(CLAIM_LEASE_SECONDS / 3)
+        try:
+            await SendJob.objects.filter(
+                id=job_id, status=SendJob.STATUS_RUNNING, claimed_by=WORKER_ID,
+            ).aupdate(lease_expires_at=lease_expiry())
+        except Exception as e:
+            logger.error(f"Failed to extend lease of send job {job_id}: {e}")
+
+
+async def run_send_job(bots, job):
+    """Выполняет задание: отправляет напоминание, если оно подошло по времени и его никто не отправляет"""
+    now = timezone.now()
+    heartbeat = asyncio.create_task(keep_job_lease(job.id))
+    try:
+        reminder = await Reminder.objects.filter(id=job.reminder_id).afirst()
+        if reminder is None:
+            return
+
+        if reminder.is_completed:
+            result = 'already_completed'
+        elif reminder.has_active_lease(now):
+            result = 'already_sending'
+        elif reminder.due_time > now + SEND_CUSHION:
+            result = 'not_due_yet'
+        else:
+            claimed_ids, successful_ids = await process_due_reminders(
+                bots, now, [reminder.id], due_before=now + SEND_CUSHION,
+            )
+            if not claimed_ids:
+                # Напоминание успел забрать диспетчер
+                result = 'already_sending'
+            elif reminder.id in successful_ids:
+                reminder = await Reminder.objects.aget(id=reminder.id)
+                result = 'sent' if reminder.is_completed else 'repeated'
+            else:
+                result = 'not_sent'
+
+        await SendJob.objects.filter(id=job.id).aupdate(
+            status=SendJob.STATUS_DONE,
+            result=result,
+            finished_at=timezone.now(),
+        )
+        logger.info(f"Send job {job.id} for reminder {job.reminder_id} finished: {result}")
+    except Exception as e:
+        logger.error(f"Send job {job.id} failed: {e}", exc_info=True)
+        await SendJob.objects.filter(id=job.id).aupdate(
+            status=SendJob.STATUS_FAILED,
+            error=str(e),
+            finished_at=timezone.now(),
+        )
+    finally:
+        heartbeat.cancel()
+
+
+async def run_job_workers(bots, wakeup, workers=4, poll_interval=5):
+    """
+    Пул из workers обработчиков очереди SendJob в event loop диспетчера.
+
+    Новые задания будят пул через wakeup (уведомление о изменении напоминания);
+    без LISTEN/NOTIFY очередь проверяется раз в poll_interval секунд.
+    """
+    slots = asyncio.Semaphore(workers)
+    running = set()
+
+    async def run(job):
+        try:
+            await run_send_job(bots, job)
+        finally:
+            slots.release()
+
+    try:
+        while True:
+            await slots.acquire()
+            wakeup.clear()
+            try:
+                jobs = await sync_to_async(claim_send_jobs)(1)
+            except Exception as e:
+                logger.error(f"Failed to claim send jobs: {e}")
+                jobs = []
+
+            if not jobs:
+                slots.release()
+                try:
+                    await asyncio.wait_for(wakeup.wait(), timeout=poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            task = asyncio.create_task(run(jobs[0]))
+            running.add(task)
+            task.add_done_callback(running.discard)
+    finally:
+        if running:
+            await asyncio.gather(*running, return_exceptions=True)
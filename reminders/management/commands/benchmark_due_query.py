@@ -0,0 +1,81 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+
+from reminders.models import Reminder
+from send_reminders import CLAIM_BATCH_SIZE
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Замеряет запрос, которым диспетчер забирает просроченные напоминания (claim_due_reminders), "
+        "при растущей истории выполненных. Все тестовые данные создаются в транзакции и откатываются."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes',
+            default='10000,100000,1000000',
+            help="Сколько выполненных напоминаний должно быть в истории на каждом шаге (через запятую)",
+        )
+        parser.add_argument('--pending', type=int, default=1000, help="Сколько ожидающих напоминаний создать")
+        parser.add_argument('--runs', type=int, default=20, help="Сколько раз выполнять запрос на каждом шаге")
+        parser.add_argument('--explain', action='store_true', help="Показать план запроса на каждом шаге")
+
+    def handle(self, *args, **options):
+        sizes = sorted(int(size) for size in options['sizes'].split(','))
+        try:
+            with transaction.atomic():
+                self._run(sizes, options)
+                raise Rollback
+        except Rollback:
+            pass
+
+    def _create(self, count, due_time, is_completed=False):
+        batch = []
+        for i in range(count):
+            batch.append(Reminder(text=f"benchmark {i}", due_time=due_time, is_completed=is_completed))
+            if len(batch) == 5000:
+                Reminder.objects.bulk_create(batch)
+                batch = []
+        Reminder.objects.bulk_create(batch)
+
+    def _run(self, sizes, options):
+        now = timezone.now()
+        self._create(options['pending'], now + timedelta(minutes=5))
+        self._create(options['pending'] // 10, now - timedelta(minutes=1))
+
+        completed = 0
+        for size in sizes:
+            self._create(size - completed, now - timedelta(days=30), is_completed=True)
+            completed = size
+            if connection.vendor == 'postgresql':
+                with connection.cursor() as cursor:
+                    cursor.execute(f"ANALYZE {Reminder._meta.db_table}")
+
+            # Тот же запрос, что в send_reminders.claim_due_reminders: с захватами, у которых
+            # истекла аренда, отложенными повторами и блокировкой строк
+            run_at = timezone.now()
+            due_query = Reminder.objects.select_for_update(skip_locked=True).claimable(run_at).filter(
+                due_time__lte=run_at,
+            ).order_by('due_time')[:CLAIM_BATCH_SIZE]
+            timings = []
+            for _ in range(options['runs']):
+                started = time.perf_counter()
+                list(due_query.all())
+                timings.append(time.perf_counter() - started)
+            timings.sort()
+
+            self.stdout.write(
+                f"completed={size:>9}  median={timings[len(timings) // 2] * 1000:.2f}ms  "
+                f"max={timings[-1] * 1000:.2f}ms"
+            )
+            if options['explain']:
+                self.stdout.write(due_query.explain())
@@ -0,0 +1,103 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.http import JsonResponse
+from django.utils import timezone
+
+from reminders import serializers
+from reminders.models import Group, Reminder
+
+
+class Rollback(Exception):
+    pass
+
+
+def legacy_page(queryset):
+    """Прежний способ: модели, prefetch_related и словарь на каждую строку через JsonResponse"""
+    rows = [
+        {
+            'id': r.id,
+            'text': r.text,
+            'groups': [{'id': g.id, 'name': g.name} for g in r.groups.all()],
+            'due_time': r.due_time.isoformat(),
+            'is_completed': r.is_completed,
+            'is_sending': r.is_sending,
+            'sent_at': r.sent_at,
+            'repeat_interval_minutes': r.repeat_interval_minutes,
+            'repeat_count': r.repeat_count,
+            'max_repeats': r.max_repeats,
+        }
+        for r in queryset.prefetch_related('groups')
+    ]
+    return JsonResponse({'reminders': rows}).content
+
+
+def values_page(queryset):
+    return serializers.FastJsonResponse({'reminders': serializers.serialize_reminders(queryset)}).content
+
+
+class Command(BaseCommand):
+    help = (
+        "Сравнивает сериализацию страницы напоминаний: прежний способ и serializers.py "
+        "(с orjson и без). Тестовые данные создаются в транзакции и откатываются."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='20,100,1000', help="Размеры страницы (через запятую)")
+        parser.add_argument('--groups', type=int, default=3, help="Сколько групп у каждого напоминания")
+        parser.add_argument('--runs', type=int, default=20, help="Сколько раз сериализовать каждую страницу")
+        parser.add_argument(
+            '--max-ratio',
+            type=float,
+            default=None,
+            help="Завершиться с ошибкой, если новый способ медленнее прежнего больше чем в столько раз",
+        )
+
+    def handle(self, *args, **options):
+        sizes = sorted(int(size) for size in options['sizes'].split(','))
+        try:
+            with transaction.atomic():
+                self._run(sizes, options)
+                raise Rollback
+        except Rollback:
+            pass
+
+    def _median(self, func, queryset, runs):
+        timings = []
+        for _ in range(runs):
+            started = time.perf_counter()
+            func(queryset)
+            timings.append(time.perf_counter() - started)
+        timings.sort()
+        return timings[len(timings) // 2]
+
+    def _run(self, sizes, options):
+        now = timezone.now()
+        groups = [Group.objects.create(name=f"benchmark {i}") for i in range(options['groups'])]
+        reminders = Reminder.objects.bulk_create(
+            Reminder(text=f"benchmark reminder {i} " * 5, due_time=now + timedelta(minutes=i))
+            for i in range(sizes[-1])
+        )
+        Reminder.groups.through.objects.bulk_create(
+            Reminder.groups.through(reminder_id=reminder.id, group_id=group.id)
+            for reminder in reminders
+            for group in groups
+        )
+
+        orjson = serializers.orjson
+        for size in sizes:
+            queryset = Reminder.objects.filter(text__startswith="benchmark reminder")[:size]
+            legacy = self._median(legacy_page, queryset, options['runs'])
+            serializers.orjson = None
+            stdlib = self._median(values_page, queryset, options['runs'])
+            serializers.orjson = orjson
+            fast = self._median(values_page, queryset, options['runs']) if orjson else stdlib
+
+            self.stdout.write(
+                f"rows={size:>6}  legacy={legacy * 1000:.2f}ms  values+json={stdlib * 1000:.2f}ms  "
+                f"values+orjson={fast * 1000 if orjson else float('nan'):.2f}ms"
+            )
+            if options['max_ratio'] and fast > legacy * options['max_ratio']:
+                raise CommandError(f"Serialization regression at {size} rows: {fast * 1000:.2f}ms vs {legacy * 1000:.2f}ms")
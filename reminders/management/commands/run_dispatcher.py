@@ -0,0 +1,50 @@
+import asyncio
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from reminders.dispatcher import run_dispatcher
+
+
+class Command(BaseCommand):
+    help = "Запускает постоянно работающий диспетчер рассылки напоминаний"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--max-sleep',
+            type=float,
+            default=60,
+            help="Максимальное время сна между проходами в секундах (по умолчанию 60)",
+        )
+        parser.add_argument(
+            '--horizon-hours',
+            type=float,
+            default=6,
+            help="На сколько часов вперед напоминания держатся в памяти (по умолчанию 6)",
+        )
+        parser.add_argument(
+            '--retry-delay',
+            type=float,
+            default=60,
+            help="Через сколько секунд повторять неотправленные напоминания (по умолчанию 60)",
+        )
+        parser.add_argument(
+            '--job-workers',
+            type=int,
+            default=4,
+            help="Сколько заданий на отправку из браузера выполнять одновременно (по умолчанию 4)",
+        )
+
+    def handle(self, *args, **options):
+        # Только этому процессу: сайт работает без постоянных соединений (settings.py)
+        connections.settings[DEFAULT_DB_ALIAS]['CONN_MAX_AGE'] = settings.DISPATCHER_CONN_MAX_AGE
+        try:
+            asyncio.run(run_dispatcher(
+                max_sleep=options['max_sleep'],
+                horizon_hours=options['horizon_hours'],
+                retry_delay=options['retry_delay'],
+                job_workers=options['job_workers'],
+            ))
+        except KeyboardInterrupt:
+            self.stdout.write("Dispatcher stopped")
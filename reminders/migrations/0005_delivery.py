@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-17 17:14
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reminders', '0004_alter_reminder_options_reminder_created_at_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Delivery',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('repeat_number', models.IntegerField(help_text='Номер отправки напоминания (repeat_count + 1)')),
+                ('telegram_id', models.CharField(max_length=100)),
+                ('status', models.CharField(choices=[('sent', 'Отправлено'), ('failed', 'Ошибка'), ('blocked', 'Бот заблокирован'), ('rejected', 'Отклонено')], max_length=20)),
+                ('error_code', models.CharField(blank=True, max_length=100)),
+                ('message_id', models.BigIntegerField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('reminder', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='deliveries', to='reminders.reminder')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'updated_at'], name='delivery_status_updated_idx')],
+                'constraints': [models.UniqueConstraint(fields=('reminder', 'repeat_number', 'telegram_id'), name='unique_delivery_per_repeat')],
+            },
+        ),
+    ]
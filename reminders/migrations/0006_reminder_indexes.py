@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-17 17:16
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # Индекс строится через CREATE INDEX CONCURRENTLY, чтобы не блокировать запись в большую таблицу
+    atomic = False
+
+    dependencies = [
+        ('reminders', '0005_delivery'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='reminder',
+            index=models.Index(condition=models.Q(('is_completed', False), ('is_sending', False)), fields=['due_time'], name='reminder_pending_due_idx'),
+        ),
+    ]
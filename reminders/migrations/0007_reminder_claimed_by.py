@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 17:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reminders', '0006_reminder_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reminder',
+            name='claimed_by',
+            field=models.CharField(blank=True, help_text='Обработчик, который забрал напоминание на отправку', max_length=100),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-17 17:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reminders', '0007_reminder_claimed_by'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reminder',
+            name='claimed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='reminder',
+            name='lease_expires_at',
+            field=models.DateTimeField(blank=True, help_text='До какого момента действует захват; после него напоминание можно забрать снова', null=True),
+        ),
+        migrations.AddIndex(
+            model_name='reminder',
+            index=models.Index(condition=models.Q(('is_sending', True)), fields=['lease_expires_at'], name='reminder_sending_lease_idx'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-17 17:21
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reminders', '0008_reminder_lease'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SendJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('queued', 'В очереди'), ('running', 'Выполняется'), ('done', 'Выполнено'), ('failed', 'Ошибка')], default='queued', max_length=20)),
+                ('result', models.CharField(blank=True, help_text='Итог отправки: sent, repeated, already_completed, already_sending, not_due_yet, not_sent', max_length=30)),
+                ('error', models.TextField(blank=True)),
+                ('claimed_by', models.CharField(blank=True, max_length=100)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('reminder', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='send_jobs', to='reminders.reminder')),
+            ],
+            options={
+                'indexes': [models.Index(condition=models.Q(('status', 'queued')), fields=['created_at'], name='sendjob_queued_idx')],
+            },
+        ),
+    ]
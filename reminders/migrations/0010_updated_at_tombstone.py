@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-17 17:40
+
+import django.utils.timezone
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # Индекс по updated_at строится через CREATE INDEX CONCURRENTLY
+    atomic = False
+
+    dependencies = [
+        ('reminders', '0009_sendjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='group',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='reminder',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.CreateModel(
+            name='ReminderTombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('reminder_id', models.BigIntegerField()),
+                ('deleted_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+            ],
+        ),
+        AddIndexConcurrently(
+            model_name='reminder',
+            index=models.Index(fields=['updated_at'], name='reminder_updated_at_idx'),
+        ),
+    ]
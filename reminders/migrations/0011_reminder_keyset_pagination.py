@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-17 17:55
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def fill_created_at(apps, schema_editor):
+    """Напоминания, созданные до появления created_at, получают время отправки или срок"""
+    Reminder = apps.get_model('reminders', 'Reminder')
+    Reminder.objects.filter(created_at__isnull=True).update(created_at=Coalesce('sent_at', 'due_time'))
+
+
+class Migration(migrations.Migration):
+    # Индекс строится через CREATE INDEX CONCURRENTLY, чтобы не блокировать запись в большую таблицу
+    atomic = False
+
+    dependencies = [
+        ('reminders', '0010_updated_at_tombstone'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_created_at, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='reminder',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True),
+        ),
+        migrations.AlterModelOptions(
+            name='reminder',
+            options={'ordering': ['-created_at', '-id']},
+        ),
+        AddIndexConcurrently(
+            model_name='reminder',
+            index=models.Index(fields=['-created_at', '-id'], name='reminder_created_id_idx'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-17 18:10
+
+import django.contrib.postgres.indexes
+import django.db.models.functions.text
+from django.contrib.postgres.operations import AddIndexConcurrently, TrigramExtension
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # Индексы строятся через CREATE INDEX CONCURRENTLY, чтобы не блокировать запись в большую таблицу
+    atomic = False
+
+    dependencies = [
+        ('reminders', '0011_reminder_keyset_pagination'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        AddIndexConcurrently(
+            model_name='reminder',
+            index=models.Index(fields=['due_time', 'id'], name='reminder_due_id_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='reminder',
+            index=models.Index(fields=['is_completed', '-created_at', '-id'], name='reminder_status_created_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='reminder',
+            index=models.Index(fields=['is_completed', 'due_time', 'id'], name='reminder_status_due_idx'),
+        ),
+        # icontains в PostgreSQL - это UPPER("text"::text) LIKE UPPER('%q%'): индекс по UPPER(text)
+        AddIndexConcurrently(
+            model_name='reminder',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('text'), name='gin_trgm_ops'), name='reminder_text_upper_trgm_idx'),
+        ),
+    ]
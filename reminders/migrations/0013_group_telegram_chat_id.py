@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 17:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reminders', '0012_reminder_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='group',
+            name='telegram_chat_id',
+            field=models.CharField(blank=True, help_text='Chat ID группового чата Telegram (бот сообщает его по /start в чате)', max_length=100),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-17 17:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reminders', '0013_group_telegram_chat_id'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='useringroup',
+            name='blocked_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='useringroup',
+            name='consecutive_failures',
+            field=models.PositiveIntegerField(default=0, help_text='Ошибок чата подряд (не найден, нет прав и т.п.); сбрасывается успешной отправкой'),
+        ),
+        migrations.AddField(
+            model_name='useringroup',
+            name='is_active',
+            field=models.BooleanField(default=True),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-17 17:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reminders', '0014_useringroup_chat_health'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='group',
+            name='telegram_bot_id',
+            field=models.CharField(blank=True, help_text='ID бота, который пишет в чат группы; пусто - основной бот', max_length=32),
+        ),
+        migrations.AddField(
+            model_name='useringroup',
+            name='telegram_bot_id',
+            field=models.CharField(blank=True, help_text='ID бота из ответа на /start; пусто - основной бот', max_length=32),
+        ),
+    ]
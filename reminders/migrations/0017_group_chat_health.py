@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-17 18:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reminders', '0015_telegram_bot_id'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='group',
+            name='chat_blocked_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='group',
+            name='chat_consecutive_failures',
+            field=models.PositiveIntegerField(default=0, help_text='Ошибок чата подряд (не найден, нет прав и т.п.); сбрасывается успешной отправкой'),
+        ),
+        migrations.AddField(
+            model_name='group',
+            name='chat_is_active',
+            field=models.BooleanField(default=True),
+        ),
+        migrations.AlterField(
+            model_name='delivery',
+            name='status',
+            field=models.CharField(choices=[('sent', 'Отправлено'), ('failed', 'Ошибка'), ('blocked', 'Бот заблокирован'), ('unreachable', 'Чат недоступен'), ('rejected', 'Отклонено')], max_length=20),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 18:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reminders', '0017_group_chat_health'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sendjob',
+            name='lease_expires_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 18:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reminders', '0018_sendjob_lease'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reminder',
+            name='next_attempt_at',
+            field=models.DateTimeField(blank=True, help_text='Не раньше какого момента повторять неудавшуюся отправку', null=True),
+        ),
+    ]
@@ -1,7 +1,31 @@
+from datetime import timedelta
+
+from django.contrib.postgres.indexes import GinIndex, OpClass
 from django.db import models
+from django.db.models.functions import Upper
 
 class Group(models.Model):
     name = models.CharField(max_length=100, unique=True)
+    # Групповой чат Telegram: если задан, напоминания группы отправляются в него один раз,
+    # а не каждому участнику отдельно
+    telegram_chat_id = models.CharField(
+        max_length=100,
+        blank=True,
+        help_text="Chat ID группового чата Telegram (бот сообщает его по /start в чате)",
+    )
+    telegram_bot_id = models.CharField(
+        max_length=32,
+        blank=True,
+        help_text="ID бота, который пишет в чат группы; пусто - основной бот",
+    )
+    # Состояние группового чата, как у личных чатов участников (reminders/health.py)
+    chat_is_active = models.BooleanField(default=True)
+    chat_blocked_at = models.DateTimeField(null=True, blank=True)
+    chat_consecutive_failures = models.PositiveIntegerField(
+        default=0,
+        help_text="Ошибок чата подряд (не найден, нет прав и т.п.); сбрасывается успешной отправкой",
+    )
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return self.name
@@ -10,18 +34,62 @@ class UserInGroup(models.Model):
     name = models.CharField(max_length=100)
     telegram_id = models.CharField(max_length=100, unique=True) # Telegram ID может быть длинным числом как строку
     group = models.ForeignKey(Group, on_delete=models.CASCADE, related_name='users')
+    # Бот, которому пользователь нажал /start (reminders/bots.py); пусто - основной бот
+    telegram_bot_id = models.CharField(
+        max_length=32,
+        blank=True,
+        help_text="ID бота из ответа на /start; пусто - основной бот",
+    )
+    # Состояние чата по итогам отправок (reminders/health.py): неактивным чатам не пишем
+    is_active = models.BooleanField(default=True)
+    blocked_at = models.DateTimeField(null=True, blank=True)
+    consecutive_failures = models.PositiveIntegerField(
+        default=0,
+        help_text="Ошибок чата подряд (не найден, нет прав и т.п.); сбрасывается успешной отправкой",
+    )
 
     def __str__(self):
         return f"{self.name} ({self.telegram_id}) in {self.group.name}"
 
+class ReminderQuerySet(models.QuerySet):
+    def claimable(self, now):
+        """
+        Невыполненные напоминания, которые можно забрать на отправку: свободные и те,
+        чья аренда истекла (или не была выставлена), т.е. обработчик упал посреди отправки.
+        Неудавшаяся отправка повторяется не раньше next_attempt_at.
+        """
+        return self.filter(is_completed=False).filter(
+            models.Q(is_sending=False)
+            | models.Q(is_sending=True, lease_expires_at__isnull=True)
+            | models.Q(is_sending=True, lease_expires_at__lte=now)
+        ).filter(models.Q(next_attempt_at__isnull=True) | models.Q(next_attempt_at__lte=now))
+
 class Reminder(models.Model):
     text = models.TextField()
     groups = models.ManyToManyField('Group')
     due_time = models.DateTimeField()
     is_completed = models.BooleanField(default=False)
     is_sending = models.BooleanField(default=False)
+    claimed_by = models.CharField(
+        max_length=100,
+        blank=True,
+        help_text="Обработчик, который забрал напоминание на отправку"
+    )
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    lease_expires_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text="До какого момента действует захват; после него напоминание можно забрать снова"
+    )
+    next_attempt_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text="Не раньше какого момента повторять неудавшуюся отправку"
+    )
     sent_at = models.DateTimeField(null=True, blank=True)
-    created_at = models.DateTimeField(auto_now_add=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    # QuerySet.update() и bulk_update не трогают auto_now: там updated_at выставляется явно
+    updated_at = models.DateTimeField(auto_now=True)
     
     # Добавляем поля для периодической отправки
     repeat_interval_minutes = models.IntegerField(
@@ -37,8 +105,134 @@ class Reminder(models.Model):
         help_text="Максимальное количество отправок"
     )
     
+    objects = ReminderQuerySet.as_manager()
+
     def __str__(self):
         return f"Reminder {self.id}: {self.text[:50]}"
+
+    def has_active_lease(self, now):
+        """Напоминание сейчас отправляется живым обработчиком"""
+        return self.is_sending and self.lease_expires_at is not None and self.lease_expires_at > now
     
     class Meta:
-        ordering = ['-created_at']
\ No newline at end of file
+        ordering = ['-created_at', '-id']
+        indexes = [
+            # Частичный индекс под запрос просроченных напоминаний: выполненные в него не попадают,
+            # поэтому он не растет вместе с историей
+            models.Index(
+                fields=['due_time'],
+                name='reminder_pending_due_idx',
+                condition=models.Q(is_completed=False, is_sending=False),
+            ),
+            # Поиск захватов с истекшей арендой (упавшие обработчики)
+            models.Index(
+                fields=['lease_expires_at'],
+                name='reminder_sending_lease_idx',
+                condition=models.Q(is_sending=True),
+            ),
+            # Сортировка списка и постраничный вывод по курсору (created_at, id)
+            models.Index(fields=['-created_at', '-id'], name='reminder_created_id_idx'),
+            # Изменения после курсора (?since=) и версия списка для ETag
+            models.Index(fields=['updated_at'], name='reminder_updated_at_idx'),
+            # Фильтры API: диапазон и сортировка по due_time, статус с любой из сортировок
+            models.Index(fields=['due_time', 'id'], name='reminder_due_id_idx'),
+            models.Index(fields=['is_completed', '-created_at', '-id'], name='reminder_status_created_idx'),
+            models.Index(fields=['is_completed', 'due_time', 'id'], name='reminder_status_due_idx'),
+            # Поиск подстроки в тексте по триграммам. icontains в PostgreSQL - это
+            # UPPER("text"::text) LIKE UPPER('%q%'), поэтому индекс построен по UPPER(text)
+            GinIndex(OpClass(Upper('text'), name='gin_trgm_ops'), name='reminder_text_upper_trgm_idx'),
+        ]
+
+class ReminderTombstone(models.Model):
+    """След удаленного напоминания: по нему клиенты с ?since= узнают об удалении"""
+    # Сколько хранятся следы; клиент, чей курсор старше стертых следов, получает 410
+    RETENTION = timedelta(days=7)
+
+    reminder_id = models.BigIntegerField()
+    deleted_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f"Reminder {self.reminder_id} deleted at {self.deleted_at}"
+
+class Delivery(models.Model):
+    """Результат отправки одного повтора напоминания одному получателю"""
+    STATUS_SENT = 'sent'
+    STATUS_FAILED = 'failed'      # временная ошибка, попытки исчерпаны
+    STATUS_BLOCKED = 'blocked'    # пользователь заблокировал бота
+    STATUS_UNREACHABLE = 'unreachable'  # чат не найден, перенесен или в него нельзя писать
+    STATUS_REJECTED = 'rejected'  # Telegram отклонил сообщение (слишком длинный текст и т.п.)
+    STATUS_CHOICES = [
+        (STATUS_SENT, 'Отправлено'),
+        (STATUS_FAILED, 'Ошибка'),
+        (STATUS_BLOCKED, 'Бот заблокирован'),
+        (STATUS_UNREACHABLE, 'Чат недоступен'),
+        (STATUS_REJECTED, 'Отклонено'),
+    ]
+
+    reminder = models.ForeignKey(Reminder, on_delete=models.CASCADE, related_name='deliveries')
+    repeat_number = models.IntegerField(help_text="Номер отправки напоминания (repeat_count + 1)")
+    telegram_id = models.CharField(max_length=100)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES)
+    error_code = models.CharField(max_length=100, blank=True)
+    message_id = models.BigIntegerField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Delivery of reminder {self.reminder_id} #{self.repeat_number} to {self.telegram_id}: {self.status}"
+
+    class Meta:
+        constraints = [
+            # Уникальность дает повторную отправку только недостающим получателям
+            models.UniqueConstraint(
+                fields=['reminder', 'repeat_number', 'telegram_id'],
+                name='unique_delivery_per_repeat',
+            ),
+        ]
+        indexes = [
+            # "Ошибки за последний час"
+            models.Index(fields=['status', 'updated_at'], name='delivery_status_updated_idx'),
+        ]
+
+
+class SendJob(models.Model):
+    """Задание на отправку напоминания, поставленное из браузера; выполняется фоновыми обработчиками"""
+    STATUS_QUEUED = 'queued'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_QUEUED, 'В очереди'),
+        (STATUS_RUNNING, 'Выполняется'),
+        (STATUS_DONE, 'Выполнено'),
+        (STATUS_FAILED, 'Ошибка'),
+    ]
+
+    reminder = models.ForeignKey(Reminder, on_delete=models.CASCADE, related_name='send_jobs')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_QUEUED)
+    result = models.CharField(
+        max_length=30,
+        blank=True,
+        help_text="Итог отправки: sent, repeated, already_completed, already_sending, not_due_yet, not_sent"
+    )
+    error = models.TextField(blank=True)
+    claimed_by = models.CharField(max_length=100, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    # Аренда выполняющегося задания: обработчик продлевает ее, пока работает (jobs.keep_job_lease),
+    # задание с истекшей арендой (обработчик упал) забирает другой
+    lease_expires_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"SendJob {self.id} for reminder {self.reminder_id}: {self.status}"
+
+    class Meta:
+        indexes = [
+            # Очередь: обработчики выбирают старейшие задания в статусе queued
+            models.Index(
+                fields=['created_at'],
+                name='sendjob_queued_idx',
+                condition=models.Q(status='queued'),
+            ),
+        ]
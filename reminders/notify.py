@@ -0,0 +1,104 @@
+import asyncio
+import json
+import logging
+
+from asgiref.sync import sync_to_async
+from django.db import connection, connections
+
+logger = logging.getLogger(__name__)
+
+REMINDER_CHANGES_CHANNEL = 'reminder_changes'
+
+# Полезная нагрузка NOTIFY ограничена 8000 байт, поэтому ID отправляются пачками
+NOTIFY_CHUNK_SIZE = 500
+
+
+def notify_reminders_changed(reminder_ids, event='updated'):
+    """
+    Сообщает слушателям (диспетчеру, потоку событий браузера) об изменении напоминаний
+    через PostgreSQL NOTIFY.
+
+    event - что произошло: created, updated, sent, completed, deleted, send_queued;
+    особое событие recipients несет ID групп, чей состав получателей изменился.
+    NOTIFY транзакционный: внутри transaction.atomic() уведомление уйдет только после коммита.
+    """
+    reminder_ids = list(reminder_ids)
+    if connection.vendor != 'postgresql' or not reminder_ids:
+        return
+
+    with connection.cursor() as cursor:
+        for i in range(0, len(reminder_ids), NOTIFY_CHUNK_SIZE):
+            payload = json.dumps({'event': event, 'ids': reminder_ids[i:i + NOTIFY_CHUNK_SIZE]})
+            cursor.execute("SELECT pg_notify(%s, %s)", [REMINDER_CHANGES_CHANNEL, payload])
+
+
+class ReminderChangeListener:
+    """
+    Слушает канал изменений напоминаний на отдельном соединении и передает
+    каждое уведомление в on_change(ids, event).
+
+    При потере соединения вызывает on_change([], None): владелец должен переподключиться
+    и перечитать состояние.
+    """
+
+    def __init__(self, on_change):
+        self.on_change = on_change
+        self.active = False
+        self._connection = None
+
+    async def start(self):
+        """Подключается к каналу; возвращает False, если LISTEN недоступен"""
+        if connection.vendor != 'postgresql':
+            return False
+
+        try:
+            self._connection = await sync_to_async(self._connect)()
+        except Exception as e:
+            logger.error(f"Failed to LISTEN {REMINDER_CHANGES_CHANNEL}: {e}")
+            return False
+
+        asyncio.get_running_loop().add_reader(self._connection.fileno(), self._on_readable)
+        self.active = True
+        logger.info(f"Listening for {REMINDER_CHANGES_CHANNEL} notifications")
+        return True
+
+    def stop(self):
+        if self._connection is None:
+            return
+        try:
+            asyncio.get_running_loop().remove_reader(self._connection.fileno())
+            self._connection.close()
+        except Exception:
+            pass
+        self._connection = None
+        self.active = False
+
+    def _connect(self):
+        wrapper = connections.create_connection('default')
+        wrapper.ensure_connection()
+        raw_connection = wrapper.connection
+        raw_connection.autocommit = True
+        with raw_connection.cursor() as cursor:
+            cursor.execute(f"LISTEN {REMINDER_CHANGES_CHANNEL}")
+        return raw_connection
+
+    def _on_readable(self):
+        try:
+            self._connection.poll()
+        except Exception as e:
+            logger.error(f"Lost {REMINDER_CHANGES_CHANNEL} listener connection: {e}")
+            self.stop()
+            # Будим владельца, чтобы он переподключился и перечитал состояние
+            self.on_change([], None)
+            return
+
+        while self._connection.notifies:
+            notify = self._connection.notifies.pop(0)
+            try:
+                payload = json.loads(notify.payload)
+                reminder_ids, event = payload['ids'], payload['event']
+            except (ValueError, KeyError, TypeError):
+                logger.warning(f"Bad {REMINDER_CHANGES_CHANNEL} payload: {notify.payload}")
+                continue
+            if reminder_ids:
+                self.on_change(reminder_ids, event)
@@ -0,0 +1,101 @@
+import asyncio
+import threading
+import time
+import weakref
+from contextlib import asynccontextmanager
+from datetime import timedelta
+
+
+class TelegramRateLimiter:
+    """
+    Ограничитель скорости отправки в Telegram.
+
+    Сочетает глобальное ведро токенов (rate сообщений в секунду с запасом burst),
+    минимальный интервал между сообщениями в один чат и семафор на число
+    одновременных запросов. Слоты резервируются под threading.Lock без привязки
+    к event loop, поэтому один ограничитель можно делить между потоками веб-сервера
+    и диспетчером.
+    """
+
+    # Не храним интервалы для чатов, которым давно ничего не отправляли
+    CHAT_PRUNE_THRESHOLD = 10000
+
+    def __init__(self, rate=25, burst=1, chat_interval=1.0, max_concurrency=10, clock=time.monotonic):
+        self.clock = clock
+        self.interval = 1 / rate
+        self.burst_tolerance = (max(burst, 1) - 1) * self.interval
+        self.chat_interval = chat_interval
+        self.max_concurrency = max_concurrency
+        self._lock = threading.Lock()
+        self._next_slot = 0.0
+        self._paused_until = 0.0
+        self._chat_next_slot = {}
+        self._semaphores = weakref.WeakKeyDictionary()
+
+    def _reserve(self, chat_id):
+        """
+        Резервирует слот для чата. Возвращает (задержка, зарезервирован ли слот): если чат
+        еще не может получить сообщение, глобальный слот не тратится - нужно подождать
+        задержку и попробовать снова, а слоты тем временем достаются другим чатам.
+        """
+        now = self.clock()
+        with self._lock:
+            if len(self._chat_next_slot) > self.CHAT_PRUNE_THRESHOLD:
+                self._chat_next_slot = {
+                    chat: next_slot for chat, next_slot in self._chat_next_slot.items() if next_slot > now
+                }
+
+            # Виртуальное расписание (GCRA) общим темпом; слот чата его не сдвигает,
+            # иначе все чаты стояли бы за самым занятым
+            slot = max(now, self._next_slot - self.burst_tolerance)
+            chat_slot = self._chat_next_slot.get(chat_id, 0.0)
+            if chat_slot > slot:
+                return chat_slot - now, False
+            self._next_slot = max(self._next_slot, slot) + self.interval
+            self._chat_next_slot[chat_id] = slot + self.chat_interval
+        return slot - now, True
+
+    def _pause_delay(self):
+        return self._paused_until - self.clock()
+
+    def pause(self, retry_after):
+        """Приостанавливает все отправки (например, по RetryAfter от Telegram)"""
+        if isinstance(retry_after, timedelta):
+            retry_after = retry_after.total_seconds()
+        with self._lock:
+            self._paused_until = max(self._paused_until, self.clock() + retry_after)
+            # Расписание сдвигается за паузу целиком (без запаса burst), иначе все ждущие
+            # отправки проснутся в момент ее окончания одной пачкой
+            self._next_slot = max(self._next_slot, self._paused_until + self.burst_tolerance)
+            self._chat_next_slot = {
+                chat: max(next_slot, self._paused_until) for chat, next_slot in self._chat_next_slot.items()
+            }
+
+    def _semaphore(self):
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = self._semaphores[loop] = asyncio.Semaphore(self.max_concurrency)
+        return semaphore
+
+    async def _wait(self, chat_id):
+        while True:
+            while (delay := self._pause_delay()) > 0:
+                await asyncio.sleep(delay)
+            paused_until = self._paused_until
+            delay, reserved = self._reserve(chat_id)
+            if delay > 0:
+                await asyncio.sleep(delay)
+            if not reserved:
+                # Ждали своего чата, глобальный слот еще не взят
+                continue
+            if self._paused_until == paused_until:
+                return
+            # Пока ждали слот, объявили паузу: слот зарезервирован по старому расписанию, берем новый
+
+    @asynccontextmanager
+    async def slot(self, chat_id):
+        """Ждет разрешенного момента для отправки в chat_id и держит место в семафоре"""
+        await self._wait(chat_id)
+        async with self._semaphore():
+            yield
@@ -0,0 +1,229 @@
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+from .models import Group, Reminder, UserInGroup
+from .notify import notify_reminders_changed
+
+BACKEND_KEY_PREFIX = 'recipients:v3:group:'
+# Поколение состава группы в общем кэше: входит в ключ записи и растет при инвалидации
+BACKEND_GENERATION_PREFIX = 'recipients:v3:generation:'
+
+
+class RecipientCache:
+    """
+    Чаты получателей по группам: {group_id: tuple((chat_id, bot_id))} и группы напоминаний
+    {reminder_id: tuple(group_id)} в памяти процесса. У группы с telegram_chat_id
+    единственный получатель - ее групповой чат (если он не выключен), иначе - личные чаты участников.
+    bot_id - закрепленный за чатом бот (пусто - основной).
+
+    Состав групп может дополнительно храниться в кэше Django (settings.RECIPIENT_CACHE_ALIAS),
+    общем для процессов. Записи живут до инвалидации сигналами (signals.py) и уведомлениями
+    'recipients' из других процессов; на прогретом кэше получатели находятся без запросов к БД.
+    Ключ записи в общем кэше содержит поколение группы, прочитанное до запроса к БД: если
+    другой процесс инвалидировал группу, пока шло чтение, устаревший состав запишется
+    под старым поколением и читать его уже никто не будет.
+    """
+
+    def __init__(self, backend_alias=None, backend_timeout=None):
+        self._lock = threading.Lock()
+        self._groups = {}
+        self._reminders = {}
+        self.backend_alias = backend_alias
+        self.backend_timeout = backend_timeout
+        # Растет при каждой инвалидации: загруженное до нее в кэш не записывается
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.backend_hits = 0
+        self.invalidations = 0
+
+    @property
+    def backend(self):
+        return caches[self.backend_alias] if self.backend_alias else None
+
+    def _backend_generations(self, backend, group_ids):
+        """{group_id: поколение} из общего кэша; группам без поколения назначается новое"""
+        keys = {gid: f'{BACKEND_GENERATION_PREFIX}{gid}' for gid in group_ids}
+        cached = backend.get_many(list(keys.values()))
+        generations = {}
+        for gid, key in keys.items():
+            if key not in cached:
+                # Поколение могло быть вытеснено вместе с инвалидацией: начинаем с уникального
+                # значения, а не с нуля, чтобы не попасть на записи старых поколений.
+                # add не перезапишет поколение, назначенное параллельно другим процессом
+                backend.add(key, time.time_ns(), timeout=None)
+                cached[key] = backend.get(key)
+            generations[gid] = cached[key]
+        return generations
+
+    def invalidate_backend(self, group_ids):
+        """Переводит группы в общем кэше на новое поколение: прежние записи больше не читаются"""
+        backend = self.backend
+        if backend is None:
+            return
+        for gid in group_ids:
+            try:
+                backend.incr(f'{BACKEND_GENERATION_PREFIX}{gid}')
+            except ValueError:
+                # Поколения нет: читатель назначит новое
+                pass
+
+    def stats(self):
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'backend_hits': self.backend_hits,
+                'invalidations': self.invalidations,
+                'groups': len(self._groups),
+                'reminders': len(self._reminders),
+            }
+
+    def reminder_groups(self, reminder_ids):
+        """{reminder_id: tuple(group_id)}; недостающие читаются одним запросом к таблице связей"""
+        with self._lock:
+            found = {rid: self._reminders[rid] for rid in reminder_ids if rid in self._reminders}
+            self.hits += len(found)
+            generation = self._generation
+        missing = [rid for rid in reminder_ids if rid not in found]
+        if missing:
+            loaded = {rid: [] for rid in missing}
+            rows = Reminder.groups.through.objects.filter(reminder_id__in=missing).values_list('reminder_id', 'group_id')
+            for reminder_id, group_id in rows:
+                loaded[reminder_id].append(group_id)
+            loaded = {rid: tuple(group_ids) for rid, group_ids in loaded.items()}
+            with self._lock:
+                self.misses += len(missing)
+                if generation == self._generation:
+                    self._reminders.update(loaded)
+            found.update(loaded)
+        return found
+
+    def group_chats(self, group_ids):
+        """{group_id: tuple((chat_id, bot_id))}: память процесса, затем кэш Django, затем БД"""
+        with self._lock:
+            found = {gid: self._groups[gid] for gid in group_ids if gid in self._groups}
+            self.hits += len(found)
+            generation = self._generation
+        missing = [gid for gid in group_ids if gid not in found]
+        if not missing:
+            return found
+
+        backend = self.backend
+        loaded = {}
+        if backend is not None:
+            generations = self._backend_generations(backend, missing)
+            keys = {gid: f'{BACKEND_KEY_PREFIX}{gid}:{generations[gid]}' for gid in missing}
+            cached = backend.get_many(list(keys.values()))
+            for gid, key in keys.items():
+                if key in cached:
+                    loaded[gid] = tuple(cached[key])
+        from_db = [gid for gid in missing if gid not in loaded]
+        if from_db:
+            members = {gid: [] for gid in from_db}
+            group_chats = {
+                group_id: (chat_id, bot_id, is_active)
+                for group_id, chat_id, bot_id, is_active in Group.objects.filter(id__in=from_db).exclude(
+                    telegram_chat_id='',
+                ).values_list('id', 'telegram_chat_id', 'telegram_bot_id', 'chat_is_active')
+            }
+            for group_id, (chat_id, bot_id, is_active) in group_chats.items():
+                # Выключенный общий чат (health.py) не заменяется рассылкой участникам
+                if is_active:
+                    members[group_id].append((chat_id, bot_id))
+            # Участников групп с общим чатом не читаем: им отдельные сообщения не нужны
+            per_member = [gid for gid in from_db if gid not in group_chats]
+            if per_member:
+                # Выключенные чаты (заблокировали бота и т.п., см. health.py) не получают рассылку
+                rows = UserInGroup.objects.filter(group_id__in=per_member, is_active=True).order_by('id').values_list(
+                    'group_id', 'telegram_id', 'telegram_bot_id',
+                )
+                for group_id, telegram_id, bot_id in rows:
+                    members[group_id].append((telegram_id, bot_id))
+            members = {gid: tuple(chat_ids) for gid, chat_ids in members.items()}
+            if backend is not None:
+                backend.set_many(
+                    {keys[gid]: chat_ids for gid, chat_ids in members.items()},
+                    timeout=self.backend_timeout,
+                )
+            loaded.update(members)
+
+        with self._lock:
+            self.backend_hits += len(missing) - len(from_db)
+            self.misses += len(from_db)
+            if generation == self._generation:
+                self._groups.update(loaded)
+        found.update(loaded)
+        return found
+
+    def invalidate(self, group_ids=(), reminder_ids=()):
+        """
+        Сбрасывает записи в памяти процесса: составы групп group_ids, группы напоминаний
+        reminder_ids и всех напоминаний, ссылающихся на group_ids (группу могли отвязать целиком).
+        """
+        group_ids, reminder_ids = set(group_ids), set(reminder_ids)
+        with self._lock:
+            for group_id in group_ids:
+                self._groups.pop(group_id, None)
+            if group_ids:
+                reminder_ids.update(rid for rid, gids in self._reminders.items() if group_ids.intersection(gids))
+            for reminder_id in reminder_ids:
+                self._reminders.pop(reminder_id, None)
+            self._generation += 1
+            self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._groups.clear()
+            self._reminders.clear()
+            self._generation += 1
+            self.invalidations += 1
+
+
+recipient_cache = RecipientCache(
+    backend_alias=getattr(settings, 'RECIPIENT_CACHE_ALIAS', None),
+    backend_timeout=getattr(settings, 'RECIPIENT_CACHE_TIMEOUT', 3600),
+)
+
+
+def recipients_changed(group_ids=(), reminder_ids=()):
+    """
+    Инвалидация после изменения состава групп или групп напоминаний: своя память, общий кэш
+    Django и (через NOTIFY 'recipients' с ID групп) память других процессов, например диспетчера.
+    Изменения групп напоминаний другие процессы узнают из обычных уведомлений о напоминаниях.
+    """
+    group_ids, reminder_ids = list(group_ids), list(reminder_ids)
+
+    def invalidate():
+        recipient_cache.invalidate(group_ids, reminder_ids)
+        recipient_cache.invalidate_backend(group_ids)
+
+    # После коммита, иначе параллельное чтение успеет закэшировать старый состав
+    transaction.on_commit(invalidate)
+    notify_reminders_changed(group_ids, 'recipients')
+
+
+def resolve_recipients(reminder_ids):
+    """
+    Чаты получателей для пачки напоминаний через RecipientCache.
+
+    Возвращает {reminder_id: {chat_id: bot_id}} без повторов (пользователь может быть
+    в нескольких группах); группа с общим чатом дает один получатель вместо всех участников,
+    а с выключенным общим чатом - ни одного.
+    Напоминания без получателей в результат не попадают.
+    """
+    reminder_groups = recipient_cache.reminder_groups(list(reminder_ids))
+    chats = recipient_cache.group_chats(list({gid for gids in reminder_groups.values() for gid in gids}))
+    recipients = {}
+    for reminder_id, group_ids in reminder_groups.items():
+        chat_bots = {}
+        for group_id in group_ids:
+            for chat_id, bot_id in chats.get(group_id, ()):
+                chat_bots.setdefault(chat_id, bot_id)
+        if chat_bots:
+            recipients[reminder_id] = chat_bots
+    return recipients
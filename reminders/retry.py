@@ -0,0 +1,45 @@
+import random
+
+from telegram.error import BadRequest, ChatMigrated, NetworkError, RetryAfter, TimedOut
+
+# Ответы Telegram о самом чате (в отличие от ошибок в тексте сообщения): писать в такой чат
+# бесполезно, пока его не исправят на сайте
+CHAT_ERROR_MESSAGES = (
+    'chat not found',
+    'user not found',
+    'peer_id_invalid',
+    'chat_write_forbidden',
+    'chat_restricted',
+    'have no rights to send',
+    'not enough rights to send',
+    'need administrator rights',
+)
+
+
+def is_retryable(error):
+    """
+    Временные ошибки Telegram, после которых отправку стоит повторить.
+
+    NetworkError покрывает обрывы соединения с прокси и ответы 5xx, но BadRequest
+    (неверный chat_id, слишком длинный текст и т.п.) тоже его наследник и не повторяется.
+    """
+    if isinstance(error, (RetryAfter, TimedOut)):
+        return True
+    return isinstance(error, NetworkError) and not isinstance(error, BadRequest)
+
+
+def is_chat_error(error):
+    """
+    Неисправимые ошибки чата получателя: несуществующий или перенесенный (ChatMigrated)
+    чат, нет прав писать в него. Остальные отказы относятся к конкретному сообщению
+    (слишком длинный текст, ошибка разметки) и состояние чата не меняют.
+    """
+    if isinstance(error, ChatMigrated):
+        return True
+    return isinstance(error, BadRequest) and any(text in error.message.lower() for text in CHAT_ERROR_MESSAGES)
+
+
+def backoff_delay(attempt, base_delay, max_delay):
+    """Экспоненциальная задержка с полным джиттером для попытки attempt (с нуля)"""
+    return random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+
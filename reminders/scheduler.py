@@ -0,0 +1,118 @@
+import heapq
+import logging
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.db.models import Q
+
+from .models import Reminder
+
+logger = logging.getLogger(__name__)
+
+
+def pending_reminders():
+    """
+    Невыполненные напоминания: ожидающие отправки и отправляющиеся.
+
+    Для отправляющихся важна не due_time, а окончание аренды: после него напоминание
+    нужно забрать повторно, если обработчик упал.
+    """
+    return Reminder.objects.filter(is_completed=False).order_by('due_time')
+
+
+def _fetch_due_times(queryset):
+    """Когда диспетчеру нужно проснуться ради каждого напоминания: {id: время}"""
+    due_times = {}
+    for reminder_id, due_time, is_sending, lease_expires_at, next_attempt_at in queryset.values_list(
+        'id', 'due_time', 'is_sending', 'lease_expires_at', 'next_attempt_at'
+    ):
+        if is_sending and lease_expires_at:
+            due_time = max(due_time, lease_expires_at)
+        if next_attempt_at:
+            # Неудавшуюся отправку повторяем не раньше срока из БД
+            due_time = max(due_time, next_attempt_at)
+        due_times[reminder_id] = due_time
+    return due_times
+
+
+class ReminderScheduler:
+    """
+    Мин-куча ожидающих напоминаний на ближайшие horizon часов, упорядоченная по due_time
+    (для отправляющихся - по окончанию аренды, для неудавшихся - по next_attempt_at).
+
+    Таблица читается только при загрузке окна и при изменениях конкретных напоминаний (arefresh).
+    Удаление ленивое: актуальное время каждого напоминания хранится в _due, а устаревшие
+    записи выбрасываются из кучи при обращении к ее вершине.
+    """
+
+    def __init__(self, horizon=timedelta(hours=6)):
+        self.horizon = horizon
+        self.horizon_end = None
+        self._heap = []
+        self._due = {}
+
+    def __len__(self):
+        return len(self._due)
+
+    def needs_reload(self, now):
+        return self.horizon_end is None or now >= self.horizon_end
+
+    def invalidate(self):
+        """Помечает окно устаревшим: при следующем проходе оно будет загружено заново"""
+        self.horizon_end = None
+
+    async def aload(self, now):
+        """Загружает в кучу все ожидающие напоминания до конца нового окна"""
+        horizon_end = now + self.horizon
+        rows = await sync_to_async(_fetch_due_times)(
+            pending_reminders().filter(Q(is_sending=False, due_time__lte=horizon_end) | Q(is_sending=True))
+        )
+        # Куча меняется только в потоке event loop, в потоке ORM выполняется лишь запрос
+        self.horizon_end = horizon_end
+        self._due = rows
+        self._heap = [(due_time, reminder_id) for reminder_id, due_time in rows.items()]
+        heapq.heapify(self._heap)
+        logger.info(f"Scheduler loaded {len(self._due)} reminders until {self.horizon_end}")
+
+    def schedule(self, reminder_id, due_time):
+        """Добавляет напоминание или переносит его на новое время"""
+        if self.horizon_end is not None and due_time > self.horizon_end:
+            self.discard(reminder_id)
+            return
+        self._due[reminder_id] = due_time
+        heapq.heappush(self._heap, (due_time, reminder_id))
+
+    def discard(self, reminder_id):
+        self._due.pop(reminder_id, None)
+
+    async def arefresh(self, reminder_ids):
+        """Перечитывает из БД состояние изменившихся напоминаний"""
+        reminder_ids = set(reminder_ids)
+        if not reminder_ids:
+            return
+        rows = await sync_to_async(_fetch_due_times)(pending_reminders().filter(id__in=reminder_ids))
+        for reminder_id in reminder_ids:
+            if reminder_id in rows:
+                self.schedule(reminder_id, rows[reminder_id])
+            else:
+                self.discard(reminder_id)
+
+    def _prune(self):
+        while self._heap and self._due.get(self._heap[0][1]) != self._heap[0][0]:
+            heapq.heappop(self._heap)
+
+    def next_due_time(self):
+        self._prune()
+        return self._heap[0][0] if self._heap else None
+
+    def pop_due(self, now):
+        """Извлекает ID всех напоминаний, время которых наступило"""
+        due_ids = []
+        while True:
+            self._prune()
+            if not self._heap or self._heap[0][0] > now:
+                break
+            _, reminder_id = heapq.heappop(self._heap)
+            del self._due[reminder_id]
+            due_ids.append(reminder_id)
+        return due_ids
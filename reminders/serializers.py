@@ -0,0 +1,80 @@
+import json
+from datetime import date, datetime
+
+from django.http import HttpResponse
+
+from .models import Reminder
+
+try:
+    import orjson
+except ImportError:  # orjson необязателен: без него используется стандартный json
+    orjson = None
+
+# Поля напоминания во всех ответах API и событиях; groups добавляется отдельным запросом
+REMINDER_FIELDS = (
+    'id', 'text', 'due_time', 'is_completed', 'is_sending', 'sent_at',
+    'repeat_interval_minutes', 'repeat_count', 'max_repeats', 'created_at', 'updated_at',
+)
+
+
+def _default(value):
+    # Тот же формат дат, что у orjson (isoformat с микросекундами и смещением)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(data):
+    """JSON в байтах: orjson, если установлен, иначе стандартный json с тем же форматом"""
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, default=_default, ensure_ascii=False, separators=(',', ':')).encode()
+
+
+class FastJsonResponse(HttpResponse):
+    """Замена JsonResponse для ответов с напоминаниями"""
+
+    def __init__(self, data, **kwargs):
+        kwargs.setdefault('content_type', 'application/json')
+        super().__init__(content=dumps(data), **kwargs)
+
+
+def _groups_query(reminder_ids):
+    return Reminder.groups.through.objects.filter(reminder_id__in=reminder_ids).order_by(
+        'group__name'
+    ).values_list('reminder_id', 'group_id', 'group__name')
+
+
+def _attach_groups(rows, group_rows):
+    by_id = {}
+    for row in rows:
+        row['groups'] = []
+        by_id[row['id']] = row
+    for reminder_id, group_id, group_name in group_rows:
+        by_id[reminder_id]['groups'].append({'id': group_id, 'name': group_name})
+    return rows
+
+
+def serialize_reminders(queryset):
+    """
+    Напоминания запроса в виде словарей для API: строки из .values() без создания моделей,
+    группы всех строк - одним запросом к промежуточной таблице. Порядок запроса сохраняется.
+    """
+    rows = list(queryset.values(*REMINDER_FIELDS))
+    if not rows:
+        return rows
+    return _attach_groups(rows, _groups_query([row['id'] for row in rows]))
+
+
+async def aserialize_reminders(queryset):
+    """Асинхронная версия serialize_reminders для async-представлений"""
+    rows = [row async for row in queryset.values(*REMINDER_FIELDS)]
+    if not rows:
+        return rows
+    return _attach_groups(rows, [group async for group in _groups_query([row['id'] for row in rows])])
+
+
+async def aserialize_reminder(reminder_id):
+    """Одно напоминание или None, если его уже нет"""
+    rows = await aserialize_reminders(Reminder.objects.filter(id=reminder_id))
+    return rows[0] if rows else None
@@ -0,0 +1,103 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db.models.signals import pre_save, post_save, post_delete, m2m_changed
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import Group, Reminder, ReminderTombstone, UserInGroup
+from .notify import notify_reminders_changed
+from .recipients import recipients_changed
+
+
+@receiver(post_save, sender=Reminder)
+def reminder_saved(sender, instance, created, **kwargs):
+    """Создание и редактирование напоминаний будят диспетчер и попадают в поток событий"""
+    notify_reminders_changed([instance.pk], 'created' if created else 'updated')
+
+
+# Внутри bulk_deleting() удаление каждого напоминания ничего не пишет: вызывающий
+# отмечает всю пачку одним record_reminders_deleted
+_bulk_deleting = ContextVar('bulk_deleting', default=False)
+
+
+@contextmanager
+def bulk_deleting():
+    token = _bulk_deleting.set(True)
+    try:
+        yield
+    finally:
+        _bulk_deleting.reset(token)
+
+
+def record_reminders_deleted(reminder_ids):
+    """Оставляет следы удаления для ?since=, заодно удаляет слишком старые следы и уведомляет слушателей"""
+    reminder_ids = list(reminder_ids)
+    if not reminder_ids:
+        return
+    now = timezone.now()
+    ReminderTombstone.objects.bulk_create([ReminderTombstone(reminder_id=reminder_id) for reminder_id in reminder_ids])
+    ReminderTombstone.objects.filter(deleted_at__lt=now - ReminderTombstone.RETENTION).delete()
+    notify_reminders_changed(reminder_ids, 'deleted')
+
+
+@receiver(post_delete, sender=Reminder)
+def reminder_deleted(sender, instance, **kwargs):
+    if not _bulk_deleting.get():
+        record_reminders_deleted([instance.pk])
+
+
+@receiver(m2m_changed, sender=Reminder.groups.through)
+def reminder_groups_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """Группы назначаются после создания напоминания, поэтому об этом сообщаем отдельно"""
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if reverse:
+        # Изменение со стороны группы: instance - Group, pk_set - напоминания
+        # (для post_clear pk_set неизвестен, такие изменения подхватит перезагрузка окна)
+        reminder_ids = list(pk_set or [])
+    else:
+        reminder_ids = [instance.pk]
+    # Группы входят в данные напоминания, поэтому для ?since= это тоже изменение
+    Reminder.objects.filter(id__in=reminder_ids).update(updated_at=timezone.now())
+    notify_reminders_changed(reminder_ids)
+    if reverse and action == 'post_clear':
+        # Напоминания, от которых отвязали группу, найдет инвалидация по ID группы
+        recipients_changed(group_ids=[instance.pk])
+    else:
+        recipients_changed(reminder_ids=reminder_ids)
+
+
+@receiver(pre_save, sender=UserInGroup)
+def user_in_group_moving(sender, instance, **kwargs):
+    """Запоминает прежнюю группу: при переносе пользователя меняется состав обеих"""
+    instance._previous_group_id = None
+    if instance.pk:
+        instance._previous_group_id = (
+            UserInGroup.objects.filter(pk=instance.pk).values_list('group_id', flat=True).first()
+        )
+
+
+@receiver(post_save, sender=UserInGroup)
+@receiver(post_delete, sender=UserInGroup)
+def user_in_group_changed(sender, instance, **kwargs):
+    group_ids = {instance.group_id, getattr(instance, '_previous_group_id', None)} - {None}
+    recipients_changed(group_ids=group_ids)
+
+
+@receiver(pre_save, sender=Group)
+def group_chat_replaced(sender, instance, **kwargs):
+    """Новый общий чат группы начинает с чистого состояния: ошибки старого к нему не относятся"""
+    if not instance.pk:
+        return
+    previous_chat_id = Group.objects.filter(pk=instance.pk).values_list('telegram_chat_id', flat=True).first()
+    if previous_chat_id is not None and previous_chat_id != instance.telegram_chat_id:
+        instance.chat_is_active = True
+        instance.chat_blocked_at = None
+        instance.chat_consecutive_failures = 0
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def group_changed(sender, instance, **kwargs):
+    recipients_changed(group_ids=[instance.pk])
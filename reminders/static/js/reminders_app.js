@@ -16,8 +16,7 @@ document.addEventListener('DOMContentLoaded', () => {
         data() {
             return {
                 reminders: [],
-                remindersBeingSent: [],
-                reminderTimers: {},
+                eventSource: null,
                 loading: true,
                 refreshing: false,
                 error: null,
@@ -26,6 +25,7 @@ document.addEventListener('DOMContentLoaded', () => {
                 filterText: '',
                 isFormActive: false,
                 refreshInterval: null,
+                filterTextTimeout: null,
                 filterGroup: null,
                 editingForm: {
                     isActive: false,
@@ -45,13 +45,15 @@ document.addEventListener('DOMContentLoaded', () => {
                 currentTime: new Date(),
                 timerInterval: null,
                 pagination: {
-                    current_page: 1,
-                    total_pages: 1,
+                    next: null,
+                    previous: null,
                     total_count: 0,
                     has_next: false,
                     has_previous: false,
                     page_size: 20
                 },
+                // Курсор, по которому загружена текущая страница ('' - первая)
+                pageCursor: '',
                 storageKeys: {
                     filterGroup: 'reminders_filterGroup',
                     filterCompleted: 'reminders_filterCompleted',
@@ -131,14 +133,22 @@ document.addEventListener('DOMContentLoaded', () => {
             }
         },
         watch: {
+            // Фильтры применяются на сервере: при их смене список загружается с первой страницы
             filterGroup(newVal) {
                 this.saveToStorage();
                 if (this.initialLoadComplete) {
-                    this.loadReminders(this.pagination.current_page);
+                    this.loadReminders();
                 }
             },
             filterCompleted(newVal) {
                 this.saveToStorage();
+                if (this.initialLoadComplete) {
+                    this.loadReminders();
+                }
+            },
+            filterText(newVal) {
+                clearTimeout(this.filterTextTimeout);
+                this.filterTextTimeout = setTimeout(() => this.loadReminders(), 300);
             },
             'editingForm.repeatInterval'(newVal) {
                 if (newVal === 0) {
@@ -299,18 +309,23 @@ document.addEventListener('DOMContentLoaded', () => {
                 });
             },
 
-            async loadReminders(page = 1, isRefresh = false) {
+            async loadReminders(cursor = '', isRefresh = false) {
                 if (!isRefresh) {
                     this.loading = true;
                 }
                 this.error = null;
             
                 try {
-                    const response = await fetch(`${data.remindersApiEndpoint}?page=${page}&page_size=20`);
+                    const params = new URLSearchParams({ cursor, page_size: 20, count: 1 });
+                    if (this.filterCompleted !== 'all') params.set('status', this.filterCompleted);
+                    if (this.filterGroup) params.set('group', this.filterGroup);
+                    if (this.filterText.trim()) params.set('q', this.filterText.trim());
+                    const response = await fetch(`${data.remindersApiEndpoint}?${params}`);
                     if (!response.ok) throw new Error(`HTTP error! status: ${response.status}`);
                     const result = await response.json();
             
                     this.pagination = result.pagination;
+                    this.pageCursor = cursor;
             
                     const freshMap = new Map(
                         result.reminders.map(rem => [
@@ -343,15 +358,6 @@ document.addEventListener('DOMContentLoaded', () => {
             
                     this.reminders.splice(0, this.reminders.length, ...updated);
             
-                    // Перезапуск таймеров
-                    Object.values(this.reminderTimers).forEach(clearInterval);
-                    this.reminderTimers = {};
-                    this.reminders.forEach(reminder => {
-                        if (!reminder.is_completed || reminder.repeat_count >= reminder.max_repeats) {
-                            this.startReminderTimer(reminder);
-                        }
-                    });
-            
                 } catch (err) {
                     console.error('Error loading reminders:', err);
                     if (!isRefresh) {
@@ -396,32 +402,6 @@ document.addEventListener('DOMContentLoaded', () => {
                 }
             },
 
-            startReminderTimer(reminder) {
-                // Очищаем существующий таймер
-                if (this.reminderTimers[reminder.id]) {
-                    clearInterval(this.reminderTimers[reminder.id]);
-                }
-            
-                const timerId = setInterval(() => {
-                    const now = new Date();
-                    const due = new Date(reminder.due_time);
-                    const diffMs = due - now;
-            
-                    // Если время пришло и напоминание не в процессе отправки и не завершено
-                    if (diffMs <= 0 && !this.remindersBeingSent.includes(reminder.id) && !reminder.is_completed) {
-                        this.triggerReminderIfNeeded(reminder.id);
-                    }
-                    
-                    // Если напоминание завершено, останавливаем таймер
-                    if (reminder.is_completed) {
-                        clearInterval(this.reminderTimers[reminder.id]);
-                        delete this.reminderTimers[reminder.id];
-                    }
-                }, 1000);
-            
-                this.reminderTimers[reminder.id] = timerId;
-            },
-
             async toggleCompleted(reminder) {
                 const newStatus = !reminder.is_completed;
                 reminder.is_completed = newStatus;
@@ -581,13 +561,12 @@ document.addEventListener('DOMContentLoaded', () => {
                     // Сохраняем настройки формы после успешной отправки
                     this.saveToStorage();
         
-                    if (this.editingForm.mode === 'create') {
+                    // Событие об этом изменении могло прийти раньше ответа
+                    const index = this.reminders.findIndex(r => r.id === result.id);
+                    if (index !== -1) {
+                        this.reminders.splice(index, 1, result);
+                    } else if (this.editingForm.mode === 'create') {
                         this.reminders.push(result);
-                    } else {
-                        const index = this.reminders.findIndex(r => r.id === result.id);
-                        if (index !== -1) {
-                            this.reminders.splice(index, 1, result);
-                        }
                     }
         
                     this.cancelForm(); 
@@ -640,78 +619,81 @@ document.addEventListener('DOMContentLoaded', () => {
                 }
             },
 
-            async triggerReminderIfNeeded(reminderId) {
-                if (this.remindersBeingSent.includes(reminderId)) {
-                    return;
-                }
-            
-                this.remindersBeingSent.push(reminderId);
-            
-                try {
-                    const response = await fetch(`${data.sendDueRemindersApiEndpoint}`, {
-                        method: 'POST',
-                        headers: {
-                            'X-CSRFToken': data.csrfToken,
-                            'Content-Type': 'application/json'
-                        },
-                        body: JSON.stringify({ reminder_id: reminderId })
-                    });
-            
-                    const result = await response.json();
-                    
-                    if (result.status === 'sent') {
-                        const reminder = this.reminders.find(r => r.id === reminderId);
-                        if (reminder) {
-                            reminder.is_completed = true;
-                            reminder.sent_at = new Date().toISOString();
-                            // Останавливаем таймер для завершенного напоминания
-                            if (this.reminderTimers[reminderId]) {
-                                clearInterval(this.reminderTimers[reminderId]);
-                                delete this.reminderTimers[reminderId];
-                            }
-                        }
-                    } else if (result.status === 'repeated' && result.reminder) {
-                        // Обновляем данные напоминания для повторения
-                        const reminder = this.reminders.find(r => r.id === reminderId);
-                        if (reminder) {
-                            Object.assign(reminder, result.reminder);
-                            // Перезапускаем таймер для нового времени
-                            this.startReminderTimer(reminder);
-                        }
-                    } else if (result.status === 'already_completed') {
-                        // Напоминание уже завершено - обновляем локальное состояние
-                        const reminder = this.reminders.find(r => r.id === reminderId);
-                        if (reminder) {
-                            reminder.is_completed = true;
-                            if (this.reminderTimers[reminderId]) {
-                                clearInterval(this.reminderTimers[reminderId]);
-                                delete this.reminderTimers[reminderId];
-                            }
-                        }
-                    } else if (result.status === 'already_sending') {
-                        // Уже отправляется - ждем следующей попытки
-                        console.log(`Reminder ${reminderId} is already being sent`);
-                    } else if (result.status === 'not_due_yet') {
-                        // Еще не время - перезапускаем таймер
-                        const reminder = this.reminders.find(r => r.id === reminderId);
-                        if (reminder) {
-                            this.startReminderTimer(reminder);
-                        }
-                    } else {
-                        console.log("[triggerReminderIfNeeded] Unknown status:", result);
+            connectEvents() {
+                // Сервер сам рассылает напоминания по расписанию, страница лишь применяет изменения
+                const source = new EventSource(data.remindersEventsEndpoint);
+                let wasConnected = false;
+
+                source.onopen = () => {
+                    if (wasConnected) {
+                        // Во время обрыва события могли быть пропущены
+                        this.loadReminders(this.pageCursor, true);
                     }
-                } catch (err) {
-                    console.error('Error triggering reminder:', err);
-                    // При ошибке сети тоже сбрасываем флаг, чтобы можно было повторить
-                    const reminder = this.reminders.find(r => r.id === reminderId);
-                    if (reminder) {
-                        this.startReminderTimer(reminder);
+                    wasConnected = true;
+                    this.stopPolling();
+                };
+
+                source.onmessage = (message) => {
+                    try {
+                        this.applyReminderEvent(JSON.parse(message.data));
+                    } catch (err) {
+                        console.error('Error applying reminder event:', err);
                     }
-                } finally {
-                    const index = this.remindersBeingSent.indexOf(reminderId);
+                };
+
+                source.onerror = () => {
+                    // Браузер переподключается сам; если поток недоступен совсем - перечитываем страницу по таймеру
+                    if (source.readyState === EventSource.CLOSED) {
+                        this.startPolling();
+                    }
+                };
+
+                this.eventSource = source;
+            },
+
+            applyReminderEvent(event) {
+                if (event.type === 'resync') {
+                    this.loadReminders(this.pageCursor, true);
+                    return;
+                }
+
+                const index = this.reminders.findIndex(r => r.id === event.id);
+
+                if (event.type === 'deleted') {
                     if (index !== -1) {
-                        this.remindersBeingSent.splice(index, 1);
+                        this.reminders.splice(index, 1);
+                    }
+                    return;
+                }
+
+                const fresh = {
+                    ...event.reminder,
+                    updateUrl: `${data.updateReminderBaseUrl}${event.id}/`,
+                    deleteUrl: `${data.deleteReminderBaseUrl}${event.id}/`
+                };
+
+                if (index !== -1) {
+                    Object.assign(this.reminders[index], fresh);
+                } else if (event.type === 'created' && !this.pagination.has_previous) {
+                    // Новые напоминания попадают на первую страницу
+                    this.reminders.push(fresh);
+                    this.pagination.total_count += 1;
+                }
+            },
+
+            startPolling() {
+                if (this.refreshInterval) return;
+                this.refreshInterval = setInterval(async () => {
+                    if (!this.isFormActive) {
+                        await this.loadReminders(this.pageCursor, true); 
                     }
+                }, 30000);
+            },
+
+            stopPolling() {
+                if (this.refreshInterval) {
+                    clearInterval(this.refreshInterval);
+                    this.refreshInterval = null;
                 }
             },
 
@@ -764,56 +746,17 @@ document.addEventListener('DOMContentLoaded', () => {
                 }
             },
 
-            async goToPage(page) {
-                if (page < 1 || page > this.pagination.total_pages) return;
-                await this.loadReminders(page);
-            },
-
             async goToNextPage() {
                 if (this.pagination.has_next) {
-                    await this.goToPage(this.pagination.current_page + 1);
+                    await this.loadReminders(this.pagination.next);
                 }
             },
 
             async goToPrevPage() {
                 if (this.pagination.has_previous) {
-                    await this.goToPage(this.pagination.current_page - 1);
+                    await this.loadReminders(this.pagination.previous);
                 }
             },
-
-            getVisiblePages() {
-                const totalPages = this.pagination.total_pages;
-                const currentPage = this.pagination.current_page;
-                const delta = 2;
-
-                const range = [];
-                const rangeWithDots = [];
-
-                let l = Math.max(1, currentPage - delta);
-                let r = Math.min(totalPages, currentPage + delta);
-
-                for (let i = l; i <= r; i++) {
-                    range.push(i);
-                }
-
-                if (currentPage - delta > 1) {
-                    rangeWithDots.push(1);
-                    if (currentPage - delta > 2) {
-                        rangeWithDots.push('...');
-                    }
-                }
-
-                rangeWithDots.push(...range);
-
-                if (currentPage + delta < totalPages) {
-                    if (currentPage + delta < totalPages - 1) {
-                        rangeWithDots.push('...');
-                    }
-                    rangeWithDots.push(totalPages);
-                }
-
-                return rangeWithDots;
-            },
         },
 
         async mounted() {
@@ -825,20 +768,16 @@ document.addEventListener('DOMContentLoaded', () => {
                 this.currentTime = new Date();
             }, 1000);
 
-            this.refreshInterval = setInterval(async () => {
-                if (!this.isFormActive) {
-                    await this.loadReminders(this.pagination.current_page, true); 
-                }
-            }, 30000);
+            this.connectEvents();
         },
         unmounted() {
             if (this.timerInterval) {
                 clearInterval(this.timerInterval);
             }
-            if (this.refreshInterval) {
-                clearInterval(this.refreshInterval);
+            this.stopPolling();
+            if (this.eventSource) {
+                this.eventSource.close();
             }
-            Object.values(this.reminderTimers).forEach(clearInterval);
         }
     }).mount('#reminders-app');
 });
\ No newline at end of file
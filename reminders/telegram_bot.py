@@ -0,0 +1,172 @@
+import asyncio
+import logging
+
+from asgiref.sync import sync_to_async
+from decouple import config
+from django.urls import reverse
+from telegram import Update
+from telegram.ext import ApplicationBuilder, CommandHandler, ContextTypes
+
+from .bots import assign_chat_bot, bot_id_for_token, parse_bot_tokens
+
+logger = logging.getLogger(__name__)
+
+TELEGRAM_BOT_TOKEN = config('TELEGRAM_BOT_TOKEN')
+TELEGRAM_BOT_TOKENS = parse_bot_tokens(TELEGRAM_BOT_TOKEN, config('TELEGRAM_EXTRA_BOT_TOKENS', default=''))
+
+# Режим webhook: внешний адрес сайта и секрет (часть пути и заголовок X-Telegram-Bot-Api-Secret-Token).
+# Пока адрес не задан, обновления по-старому забирает bot_handler.py (long polling)
+TELEGRAM_WEBHOOK_URL = config('TELEGRAM_WEBHOOK_URL', default='')
+TELEGRAM_WEBHOOK_SECRET = config('TELEGRAM_WEBHOOK_SECRET', default='')
+# Сколько обновлений ждет обработки (сверх этого Telegram получает 503 и повторит позже)
+# и сколько обрабатывается одновременно
+TELEGRAM_WEBHOOK_QUEUE_SIZE = config('TELEGRAM_WEBHOOK_QUEUE_SIZE', default=1000, cast=int)
+TELEGRAM_WEBHOOK_WORKERS = config('TELEGRAM_WEBHOOK_WORKERS', default=8, cast=int)
+
+
+async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Обработчик команды /start."""
+    chat_id = update.effective_message.chat_id
+    chat_type = update.effective_message.chat.type
+    bot_id = str(context.bot.id)
+
+    logger.info(f"Received /start command from chat_id: {chat_id}, chat_type: {chat_type}, bot: {bot_id}")
+
+    # Уже добавленные на сайте чаты теперь получают напоминания от этого бота
+    await sync_to_async(assign_chat_bot)(chat_id, bot_id)
+    bot_line = f"ID бота: <code>{bot_id}</code>\n" if len(TELEGRAM_BOT_TOKENS) > 1 else ""
+
+    if chat_type == 'private':
+        await update.message.reply_text(
+            f"Привет! Я бот для напоминаний.\n"
+            f"Ваш Chat ID: <code>{chat_id}</code>\n"
+            f"{bot_line}"
+            f"Добавьте его при создании пользователя на сайте.",
+            parse_mode='HTML'
+        )
+    else:
+        await update.message.reply_text(
+            f"Привет! Я бот для напоминаний.\n"
+            f"Мой Chat ID для этого чата: <code>{chat_id}</code>\n"
+            f"{bot_line}"
+            f"Укажите его в поле «Чат группы» у группы на сайте: "
+            f"напоминания группы будут приходить сюда одним сообщением.",
+            parse_mode='HTML'
+        )
+
+
+def build_application(token, webhook=False, request=None):
+    """Приложение python-telegram-bot с обработчиками; для webhook - без Updater (обновления приносит сайт)"""
+    builder = ApplicationBuilder().token(token)
+    if webhook:
+        builder = builder.updater(None)
+    if request is not None:
+        builder = builder.request(request)
+    application = builder.build()
+    application.add_handler(CommandHandler("start", start_command))
+    return application
+
+
+def webhook_path(bot_id):
+    return reverse('telegram_webhook', kwargs={'secret': TELEGRAM_WEBHOOK_SECRET, 'bot_id': bot_id})
+
+
+class WebhookBots:
+    """
+    Боты в режиме webhook внутри event loop ASGI-сервера.
+
+    Представление кладет обновление в общую ограниченную очередь и сразу отвечает Telegram;
+    workers обработчиков разбирают очередь через Application.process_update. Переполненная
+    очередь - это 503: Telegram повторит доставку позже, а память процесса не растет.
+    """
+
+    def __init__(self, applications, queue_size=TELEGRAM_WEBHOOK_QUEUE_SIZE, workers=TELEGRAM_WEBHOOK_WORKERS):
+        # {bot_id: Application}
+        self.applications = dict(applications)
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.workers = workers
+        self._tasks = []
+
+    async def astart(self, base_url=None):
+        """Запускает приложения и обработчиков; с base_url регистрирует webhook каждого бота в Telegram"""
+        for bot_id, application in self.applications.items():
+            await application.initialize()
+            await application.start()
+            if base_url:
+                await application.bot.set_webhook(
+                    url=base_url.rstrip('/') + webhook_path(bot_id),
+                    secret_token=TELEGRAM_WEBHOOK_SECRET,
+                    allowed_updates=Update.ALL_TYPES,
+                )
+                logger.info(f"Webhook set for bot {bot_id}")
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+
+    async def astop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        for application in self.applications.values():
+            await application.stop()
+            await application.shutdown()
+
+    def enqueue(self, bot_id, data):
+        """
+        Ставит обновление в очередь. KeyError - неизвестный бот, ValueError - тело
+        не похоже на обновление Telegram, asyncio.QueueFull - обработчики не успевают.
+        """
+        application = self.applications[bot_id]
+        if not isinstance(data, dict):
+            raise ValueError("Update must be a JSON object")
+        try:
+            update = Update.de_json(data, application.bot)
+        except (AttributeError, KeyError, TypeError) as e:
+            raise ValueError(f"Malformed update: {e}") from e
+        self.queue.put_nowait((application, update))
+
+    async def _work(self):
+        while True:
+            application, update = await self.queue.get()
+            try:
+                await application.process_update(update)
+            except Exception as e:
+                logger.error(f"Failed to process update {update.update_id}: {e}", exc_info=True)
+            finally:
+                self.queue.task_done()
+
+
+_webhook_bots = None
+
+
+def get_webhook_bots():
+    """Боты webhook этого процесса или None, если режим webhook выключен или не запустился"""
+    return _webhook_bots
+
+
+async def webhook_lifespan(receive, send):
+    """
+    Обработчик ASGI lifespan (reminder_project/asgi.py): при старте сервера поднимает ботов
+    и регистрирует webhook, при остановке останавливает их. Ошибка ботов не мешает работе сайта.
+    """
+    global _webhook_bots
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            if TELEGRAM_WEBHOOK_URL and not TELEGRAM_WEBHOOK_SECRET:
+                logger.error("TELEGRAM_WEBHOOK_SECRET is required for webhook mode; webhook disabled")
+            elif TELEGRAM_WEBHOOK_URL:
+                bots = WebhookBots({
+                    bot_id_for_token(token): build_application(token, webhook=True) for token in TELEGRAM_BOT_TOKENS
+                })
+                try:
+                    await bots.astart(TELEGRAM_WEBHOOK_URL)
+                    _webhook_bots = bots
+                except Exception as e:
+                    logger.error(f"Failed to start webhook bots: {e}", exc_info=True)
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            if _webhook_bots is not None:
+                await _webhook_bots.astop()
+                _webhook_bots = None
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
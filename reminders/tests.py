@@ -1,3 +1,805 @@
+import csv
+import heapq
+import io
+import json
+import time
+from contextlib import asynccontextmanager
+from datetime import timedelta
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from django.core.cache import caches
 from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from telegram.error import BadRequest, ChatMigrated, Forbidden, NetworkError, RetryAfter, TimedOut
+from telegram.request import BaseRequest
+
+from send_reminders import claim_due_reminders, process_due_reminders, send_reminder_to_user
+from .cursors import decode_cursor
+from .fanout import MERGED_SEPARATOR, MESSAGE_HEADER, TELEGRAM_MESSAGE_LIMIT, plan_fanout
+from .health import CHAT_MAX_FAILURES, chat_statuses, reactivate_chats, record_chat_health
+from .models import Delivery, Group, Reminder, UserInGroup
+from .ratelimit import TelegramRateLimiter
+from .recipients import RecipientCache
+from .retry import is_chat_error, is_retryable
+from .scheduler import ReminderScheduler
+from .transfer import ImportFormatError, import_users, read_import_rows
+from .views import CHANGES_SEEN_LIMIT, REMINDER_SORTS
+from .telegram_bot import WebhookBots, build_application
+
+WEBHOOK_SECRET = 's3cr3t'
+BOT_ID = 123
+
+
+class FakeTelegram(BaseRequest):
+    """Подмена api.telegram.org для python-telegram-bot: записывает вызовы и отвечает как Telegram"""
+
+    def __init__(self, bot_id=BOT_ID):
+        self.bot_id = bot_id
+        self.calls = []
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+    @property
+    def read_timeout(self):
+        return 5
+
+    async def do_request(self, url, method, request_data=None, **kwargs):
+        name = url.rsplit('/', 1)[1]
+        params = request_data.parameters if request_data else {}
+        self.calls.append((name, params))
+        if name == 'getMe':
+            result = {'id': self.bot_id, 'is_bot': True, 'first_name': 'Reminders', 'username': f'bot{self.bot_id}'}
+        elif name == 'sendMessage':
+            result = {
+                'message_id': 1,
+                'date': int(time.time()),
+                'chat': {'id': int(params['chat_id']), 'type': 'private'},
+                'text': params['text'],
+            }
+        else:
+            result = True
+        return 200, json.dumps({'ok': True, 'result': result}).encode()
+
+
+def start_update(chat_id, update_id=1):
+    return {
+        'update_id': update_id,
+        'message': {
+            'message_id': update_id,
+            'date': int(time.time()),
+            'chat': {'id': chat_id, 'type': 'private'},
+            'from': {'id': chat_id, 'is_bot': False, 'first_name': 'User'},
+            'text': '/start',
+            'entities': [{'type': 'bot_command', 'offset': 0, 'length': 6}],
+        },
+    }
+
+
+class TelegramWebhookTests(TestCase):
+    """Прием обновлений Telegram по webhook (TelegramWebhookView и WebhookBots)"""
+
+    def setUp(self):
+        self.telegram = FakeTelegram()
+        patcher = mock.patch('reminders.views.TELEGRAM_WEBHOOK_SECRET', WEBHOOK_SECRET)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @asynccontextmanager
+    async def webhook_bots(self, queue_size=10, workers=1):
+        """Запущенные боты webhook с подменой Telegram; каждый async-тест идет в своем event loop"""
+        application = build_application(f'{BOT_ID}:token', webhook=True, request=self.telegram)
+        bots = WebhookBots({str(BOT_ID): application}, queue_size=queue_size, workers=workers)
+        await bots.astart()
+        try:
+            with mock.patch('reminders.views.get_webhook_bots', return_value=bots):
+                yield bots
+        finally:
+            await bots.astop()
+
+    def post_update(self, data, secret=WEBHOOK_SECRET, header=WEBHOOK_SECRET):
+        url = reverse('telegram_webhook', kwargs={'secret': secret, 'bot_id': str(BOT_ID)})
+        body = data if isinstance(data, str) else json.dumps(data)
+        return self.async_client.post(
+            url, body, content_type='application/json', headers={'X-Telegram-Bot-Api-Secret-Token': header},
+        )
+
+    async def test_wrong_secret_is_not_found(self):
+        async with self.webhook_bots():
+            response = await self.post_update(start_update(42), secret='wrong')
+            self.assertEqual(response.status_code, 404)
+            response = await self.post_update(start_update(42), header='wrong')
+            self.assertEqual(response.status_code, 404)
+
+    async def test_full_queue_is_service_unavailable(self):
+        # Без обработчиков очередь не разбирается
+        async with self.webhook_bots(queue_size=1, workers=0):
+            self.assertEqual((await self.post_update(start_update(42, update_id=1))).status_code, 200)
+            self.assertEqual((await self.post_update(start_update(42, update_id=2))).status_code, 503)
+
+    async def test_malformed_update_is_bad_request(self):
+        async with self.webhook_bots():
+            for body in ('[]', '"update"', 'null', '{}', 'not json'):
+                with self.subTest(body=body):
+                    self.assertEqual((await self.post_update(body)).status_code, 400)
+
+    async def test_start_is_answered_through_process_update(self):
+        group = await Group.objects.acreate(name='Team')
+        await UserInGroup.objects.acreate(name='User', telegram_id='42', group=group)
+        async with self.webhook_bots() as bots:
+            response = await self.post_update(start_update(42))
+            self.assertEqual(response.status_code, 200)
+            await bots.queue.join()
+
+        replies = [params for name, params in self.telegram.calls if name == 'sendMessage']
+        self.assertEqual(len(replies), 1)
+        self.assertEqual(str(replies[0]['chat_id']), '42')
+        self.assertIn('<code>42</code>', replies[0]['text'])
+        # Чат закрепляется за ботом, которому нажали /start
+        user = await UserInGroup.objects.aget(telegram_id='42')
+        self.assertEqual(user.telegram_bot_id, str(BOT_ID))
+
+
+class FakeClock:
+    """Управляемое время вместо time.monotonic"""
+
+    def __init__(self, now=100.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def simulate_sends(limiter, clock, chat_ids):
+    """
+    Время отправки каждого сообщения, если все они разом ждут слота (как _wait, но без
+    event loop): сообщение, которому ограничитель велел подождать свой чат, пробует снова
+    """
+    pending = [(clock.now, index, chat_id) for index, chat_id in enumerate(chat_ids)]
+    heapq.heapify(pending)
+    sent_at = {}
+    while pending:
+        clock.now, index, chat_id = heapq.heappop(pending)
+        delay, reserved = limiter._reserve(chat_id)
+        if reserved:
+            sent_at[index] = clock.now + delay
+        else:
+            heapq.heappush(pending, (clock.now + delay, index, chat_id))
+    return [sent_at[index] for index in range(len(chat_ids))]
+
+
+class TelegramRateLimiterTests(TestCase):
+    """Расписание TelegramRateLimiter на поддельных часах: задержки считаются без ожидания"""
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.start = self.clock.now
+
+    def limiter(self, **kwargs):
+        return TelegramRateLimiter(clock=self.clock, **kwargs)
+
+    def send(self, limiter, chat_ids):
+        return [sent_at - self.start for sent_at in simulate_sends(limiter, self.clock, chat_ids)]
+
+    def test_global_rate(self):
+        times = self.send(self.limiter(rate=25, chat_interval=1.0), range(50))
+        self.assertEqual(times[0], 0)
+        for previous, current in zip(times, times[1:]):
+            self.assertAlmostEqual(current - previous, 1 / 25)
+
+    def test_burst_is_sent_at_once(self):
+        times = self.send(self.limiter(rate=25, burst=5), range(6))
+        for t in times[:5]:
+            self.assertAlmostEqual(t, 0)
+        self.assertAlmostEqual(times[5], 1 / 25)
+
+    def test_chat_interval(self):
+        times = self.send(self.limiter(rate=25, chat_interval=1.0), ['chat'] * 3)
+        self.assertEqual(times, [0, 1.0, 2.0])
+
+    def test_waiting_chat_does_not_take_global_slot(self):
+        limiter = self.limiter(rate=25, chat_interval=1.0)
+        self.assertEqual(limiter._reserve('busy'), (0, True))
+        self.assertEqual(limiter._reserve('busy'), (1.0, False))
+        # Другой чат получает следующий слот, а не ждет за занятым
+        delay, reserved = limiter._reserve('other')
+        self.assertTrue(reserved)
+        self.assertAlmostEqual(delay, 1 / 25)
+
+    def test_busy_chat_does_not_stall_other_chats(self):
+        # Порядок plan_fanout: все сообщения одного чата подряд
+        chat_ids = [chat_id for chat_id in range(10) for _ in range(4)]
+        times = self.send(self.limiter(rate=25, chat_interval=1.0), chat_ids)
+        # 40 сообщений по 25 в секунду и 4 сообщения в чат раз в секунду - около 3 с, а не 30
+        self.assertLess(max(times), 3.5)
+        for chat_id in range(10):
+            chat_times = [t for t, chat in zip(times, chat_ids) if chat == chat_id]
+            for previous, current in zip(chat_times, chat_times[1:]):
+                self.assertGreaterEqual(current - previous, 1.0)
+        # Общий темп соблюдается: в любой секунде не больше 25 отправок
+        for t in times:
+            self.assertLessEqual(sum(t <= other < t + 1 for other in times), 25)
+
+    def test_pause_moves_schedule(self):
+        limiter = self.limiter(rate=10, burst=3, chat_interval=0)
+        limiter._reserve('a')
+        limiter.pause(2)
+        self.assertAlmostEqual(limiter._pause_delay(), 2)
+        delays = [limiter._reserve(chat_id)[0] for chat_id in range(3)]
+        # После паузы отправки идут общим темпом, а не пачкой в момент ее окончания
+        self.assertAlmostEqual(delays[0], 2)
+        self.assertAlmostEqual(delays[1], 2.1)
+        self.assertAlmostEqual(delays[2], 2.2)
+
+    def test_schedule_follows_clock(self):
+        limiter = self.limiter(rate=25, chat_interval=1.0)
+        limiter._reserve('chat')
+        self.clock.now += 5
+        self.assertEqual(limiter._reserve('chat'), (0, True))
+
+
+class ReminderRetryTests(TestCase):
+    """Повтор неудавшейся отправки: срок хранится в БД (next_attempt_at), а не только в куче диспетчера"""
+
+    def setUp(self):
+        self.now = timezone.now()
+        group = Group.objects.create(name='Team')
+        UserInGroup.objects.create(name='User', telegram_id='42', group=group)
+        self.reminder = Reminder.objects.create(text='Standup', due_time=self.now - timedelta(minutes=1))
+        self.reminder.groups.add(group)
+
+    async def fail_send(self, retry_delay=60):
+        # Отправка не удалась ни одному получателю: напоминание возвращается в очередь
+        with mock.patch('send_reminders.send_reminders_batch', mock.AsyncMock(return_value=([], []))):
+            claimed_ids, successful_ids = await process_due_reminders(None, self.now, retry_delay=retry_delay)
+        self.assertEqual((claimed_ids, successful_ids), ([self.reminder.id], []))
+
+    async def claim(self, now):
+        return [r.id for r in await sync_to_async(claim_due_reminders)(now)]
+
+    async def test_failed_send_is_not_reclaimed_before_delay(self):
+        await self.fail_send(retry_delay=60)
+        reminder = await Reminder.objects.aget(id=self.reminder.id)
+        self.assertFalse(reminder.is_sending)
+        self.assertEqual(reminder.next_attempt_at, self.now + timedelta(seconds=60))
+
+        self.assertEqual(await self.claim(self.now), [])
+        self.assertEqual(await self.claim(self.now + timedelta(seconds=59)), [])
+        self.assertEqual(await self.claim(self.now + timedelta(seconds=60)), [self.reminder.id])
+
+    async def test_scheduler_reload_keeps_retry_time(self):
+        await self.fail_send(retry_delay=60)
+        # Уведомление об освобождении перечитывает напоминание из БД: срок повтора не теряется
+        scheduler = ReminderScheduler()
+        await scheduler.aload(self.now)
+        self.assertEqual(scheduler.pop_due(self.now + timedelta(seconds=59)), [])
+        self.assertEqual(scheduler.next_due_time(), self.now + timedelta(seconds=60))
+        await scheduler.arefresh([self.reminder.id])
+        self.assertEqual(scheduler.pop_due(self.now + timedelta(seconds=60)), [self.reminder.id])
+
+    async def test_successful_send_clears_retry_time(self):
+        await self.fail_send(retry_delay=60)
+        retry_at = self.now + timedelta(seconds=60)
+        with mock.patch(
+            'send_reminders.send_reminders_batch', mock.AsyncMock(return_value=([self.reminder.id], [])),
+        ):
+            await process_due_reminders(None, retry_at, [self.reminder.id])
+        reminder = await Reminder.objects.aget(id=self.reminder.id)
+        self.assertTrue(reminder.is_completed)
+        self.assertIsNone(reminder.next_attempt_at)
+
+
+class BulkRemindersTests(TestCase):
+    """Пакетные операции: ошибочный элемент отклоняется сам, остальные применяются"""
+
+    def post_bulk(self, data):
+        return self.client.post(reverse('api_bulk_reminders'), json.dumps(data), content_type='application/json')
+
+    def test_impossible_dates_are_item_errors(self):
+        reminder = Reminder.objects.create(text='Old', due_time=timezone.now())
+        response = self.post_bulk({
+            'create': [
+                {'text': 'Valid', 'due_time': '2024-12-01T10:00:00Z'},
+                {'text': 'Bad month', 'due_time': '2024-13-01T00:00:00'},
+                {'text': 'Bad day', 'due_time': '2024-02-30T00:00:00'},
+                {'text': 'Not a date', 'due_time': 'tomorrow'},
+                {'text': 'Bad sent_at', 'due_time': '2024-12-01T10:00:00Z', 'sent_at': '2024-12-01T25:00:00'},
+            ],
+            'update': [
+                {'id': reminder.id, 'sent_at': '2024-00-10T10:00:00'},
+                {'id': reminder.id, 'text': 'Renamed'},
+            ],
+        })
+        self.assertEqual(response.status_code, 200)
+        results = response.json()
+
+        created = results['created']
+        self.assertEqual([item['index'] for item in created], [0, 1, 2, 3, 4])
+        self.assertIn('id', created[0])
+        self.assertEqual(
+            [item.get('error') for item in created[1:]],
+            ['Invalid due_time format'] * 3 + ['Invalid sent_at format'],
+        )
+        self.assertEqual(list(Reminder.objects.exclude(id=reminder.id).values_list('text', flat=True)), ['Valid'])
+
+        updated = results['updated']
+        self.assertEqual(updated[0]['error'], 'Invalid sent_at format')
+        self.assertNotIn('error', updated[1])
+        reminder.refresh_from_db()
+        self.assertEqual(reminder.text, 'Renamed')
+        self.assertIsNone(reminder.sent_at)
+
+
+class ReminderChangesTests(TestCase):
+    """Изменения после курсора (?since=)"""
+
+    def get_changes(self, cursor):
+        response = self.client.get(reverse('api_reminders'), {'since': cursor})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_cursor_size_is_bounded(self):
+        cursor = self.client.get(reverse('api_reminders')).json()['cursor']
+        count = CHANGES_SEEN_LIMIT + 50
+        Reminder.objects.bulk_create(
+            Reminder(text=f'Reminder {i}', due_time=timezone.now()) for i in range(count)
+        )
+
+        changes = self.get_changes(cursor)
+        self.assertEqual(len(changes['reminders']), count)
+        self.assertFalse(changes['has_more'])
+        # Все изменения в окне CHANGES_OVERLAP, но курсор помнит только последние
+        _, _, _, seen, _ = decode_cursor(changes['cursor'], 5)
+        self.assertEqual(len(seen), CHANGES_SEEN_LIMIT)
+        self.assertLess(len(changes['cursor']), 4096)
+
+        # Забытые курсором приходят повторно без изменений, has_more не зацикливается
+        first = {r['id']: r['updated_at'] for r in changes['reminders']}
+        again = self.get_changes(changes['cursor'])
+        self.assertEqual(len(again['reminders']), count - CHANGES_SEEN_LIMIT)
+        self.assertFalse(again['has_more'])
+        for reminder in again['reminders']:
+            self.assertEqual(reminder['updated_at'], first[reminder['id']])
+        self.assertEqual(decode_cursor(again['cursor'], 5)[3], seen)
+
+
+class RecipientCacheTests(TestCase):
+    """Общий для процессов кэш состава групп (RECIPIENT_CACHE_ALIAS)"""
+
+    def setUp(self):
+        caches['default'].clear()
+        self.addCleanup(caches['default'].clear)
+        self.group = Group.objects.create(name='Team')
+        self.user = UserInGroup.objects.create(name='User', telegram_id='42', group=self.group)
+
+    def process_cache(self):
+        # Каждый RecipientCache - память отдельного процесса, общий у них только кэш Django
+        return RecipientCache(backend_alias='default', backend_timeout=3600)
+
+    def test_shared_entry_is_reused(self):
+        self.assertEqual(self.process_cache().group_chats([self.group.id]), {self.group.id: (('42', ''),)})
+        other = self.process_cache()
+        with self.assertNumQueries(0):
+            self.assertEqual(other.group_chats([self.group.id]), {self.group.id: (('42', ''),)})
+        self.assertEqual(other.stats()['backend_hits'], 1)
+
+    def test_invalidation_during_read_is_not_overwritten(self):
+        reader, writer = self.process_cache(), self.process_cache()
+        backend = caches['default']
+        set_many = backend.set_many
+
+        def invalidate_then_set_many(*args, **kwargs):
+            # Пока reader читал старый состав из БД, другой процесс выключил чат и сбросил кэш
+            UserInGroup.objects.filter(id=self.user.id).update(is_active=False)
+            writer.invalidate_backend([self.group.id])
+            return set_many(*args, **kwargs)
+
+        with mock.patch.object(backend, 'set_many', side_effect=invalidate_then_set_many):
+            self.assertEqual(reader.group_chats([self.group.id]), {self.group.id: (('42', ''),)})
+
+        # Запоздавшая запись reader не возвращает выключенный чат в общий кэш
+        self.assertEqual(self.process_cache().group_chats([self.group.id]), {self.group.id: ()})
+
+
+class ReminderFilterTests(TestCase):
+    """Фильтры списка напоминаний"""
+
+    def test_impossible_due_range_is_bad_request(self):
+        for param in ('due_after', 'due_before'):
+            for value in ('2024-13-01T00:00:00', 'tomorrow'):
+                with self.subTest(param=param, value=value):
+                    response = self.client.get(reverse('api_reminders'), {param: value})
+                    self.assertEqual(response.status_code, 400)
+                    self.assertEqual(response.json(), {'error': f'Invalid {param} format'})
+
+
+class ReminderSchedulerTests(TestCase):
+    """Куча ReminderScheduler: перенос и отмена без перестройки кучи"""
+
+    def setUp(self):
+        self.now = timezone.now()
+        self.scheduler = ReminderScheduler(horizon=timedelta(hours=1))
+
+    def at(self, minutes):
+        return self.now + timedelta(minutes=minutes)
+
+    def test_due_reminders_are_popped_in_order(self):
+        for reminder_id, minutes in ((1, 3), (2, 1), (3, 2), (4, 10)):
+            self.scheduler.schedule(reminder_id, self.at(minutes))
+        self.assertEqual(self.scheduler.next_due_time(), self.at(1))
+        self.assertEqual(self.scheduler.pop_due(self.at(3)), [2, 3, 1])
+        self.assertEqual(len(self.scheduler), 1)
+        self.assertEqual(self.scheduler.next_due_time(), self.at(10))
+
+    def test_reschedule_keeps_only_latest_time(self):
+        self.scheduler.schedule(1, self.at(1))
+        self.scheduler.schedule(2, self.at(2))
+        # Перенос позже: старая запись в куче устаревает и пропускается
+        self.scheduler.schedule(1, self.at(5))
+        self.assertEqual(self.scheduler.next_due_time(), self.at(2))
+        self.assertEqual(self.scheduler.pop_due(self.at(4)), [2])
+        # Перенос раньше
+        self.scheduler.schedule(1, self.at(3))
+        self.assertEqual(self.scheduler.pop_due(self.at(4)), [1])
+        self.assertEqual(self.scheduler.pop_due(self.at(10)), [])
+        self.assertIsNone(self.scheduler.next_due_time())
+
+    def test_cancel(self):
+        self.scheduler.schedule(1, self.at(1))
+        self.scheduler.schedule(2, self.at(2))
+        self.scheduler.discard(1)
+        self.scheduler.discard(42)
+        self.assertEqual(len(self.scheduler), 1)
+        self.assertEqual(self.scheduler.next_due_time(), self.at(2))
+        self.assertEqual(self.scheduler.pop_due(self.at(5)), [2])
+
+    async def test_reschedule_beyond_horizon_is_dropped(self):
+        await self.scheduler.aload(self.now)
+        self.scheduler.schedule(1, self.at(30))
+        # За концом окна напоминание не хранится: его подберет следующая загрузка
+        self.scheduler.schedule(1, self.at(90))
+        self.assertEqual(len(self.scheduler), 0)
+        self.assertIsNone(self.scheduler.next_due_time())
+
+    async def test_refresh_follows_database(self):
+        due = await Reminder.objects.acreate(text='Due', due_time=self.at(1))
+        moved = await Reminder.objects.acreate(text='Moved', due_time=self.at(2))
+        done = await Reminder.objects.acreate(text='Done', due_time=self.at(3))
+        await Reminder.objects.acreate(text='Later', due_time=self.at(120))
+        await self.scheduler.aload(self.now)
+        self.assertEqual(len(self.scheduler), 3)
+
+        await Reminder.objects.filter(id=moved.id).aupdate(due_time=self.at(4))
+        await Reminder.objects.filter(id=done.id).aupdate(is_completed=True)
+        await self.scheduler.arefresh([moved.id, done.id])
+        self.assertEqual(self.scheduler.pop_due(self.at(5)), [due.id, moved.id])
+        self.assertEqual(len(self.scheduler), 0)
+
+
+class KeysetPaginationTests(TestCase):
+    """Постраничный вывод по курсору (?cursor=): одинаковые значения сортировки и страница назад"""
+
+    def setUp(self):
+        # Три пары с одинаковым created_at и due_time: порядок внутри пары задает id
+        now = timezone.now()
+        self.reminders = [Reminder.objects.create(text=f'Reminder {i}', due_time=now) for i in range(6)]
+        for i, reminder in enumerate(self.reminders):
+            Reminder.objects.filter(id=reminder.id).update(
+                created_at=now - timedelta(minutes=i // 2), due_time=now + timedelta(minutes=i // 2),
+            )
+        self.ids = [r.id for r in self.reminders]
+
+    def get_page(self, cursor='', **params):
+        response = self.client.get(reverse('api_reminders'), {'cursor': cursor, 'page_size': 2, **params})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        return [r['id'] for r in data['reminders']], data['pagination']
+
+    def walk_forward(self, **params):
+        pages, cursor = [], ''
+        while True:
+            ids, pagination = self.get_page(cursor, **params)
+            pages.append(ids)
+            if not pagination['has_next']:
+                return pages, pagination
+            cursor = pagination['next']
+
+    def test_ties_are_split_by_id(self):
+        ids = self.ids
+        expected = {
+            '-created': [[ids[1], ids[0]], [ids[3], ids[2]], [ids[5], ids[4]]],
+            'created': [[ids[4], ids[5]], [ids[2], ids[3]], [ids[0], ids[1]]],
+            'due': [[ids[0], ids[1]], [ids[2], ids[3]], [ids[4], ids[5]]],
+            '-due': [[ids[5], ids[4]], [ids[3], ids[2]], [ids[1], ids[0]]],
+        }
+        for sort, pages in expected.items():
+            with self.subTest(sort=sort):
+                self.assertEqual(self.walk_forward(sort=sort)[0], pages)
+
+    def test_previous_page(self):
+        for sort in REMINDER_SORTS:
+            with self.subTest(sort=sort):
+                pages, pagination = self.walk_forward(sort=sort)
+                # Назад от последней страницы - те же страницы в обратном порядке
+                cursor = pagination['previous']
+                for expected in reversed(pages[:-1]):
+                    ids, pagination = self.get_page(cursor, sort=sort)
+                    self.assertEqual(ids, expected)
+                    self.assertTrue(pagination['has_next'])
+                    cursor = pagination['previous']
+                self.assertFalse(pagination['has_previous'])
+                self.assertIsNone(cursor)
+
+    def test_cursor_of_other_sort_is_rejected(self):
+        _, pagination = self.get_page(sort='due')
+        response = self.client.get(reverse('api_reminders'), {'cursor': pagination['next'], 'sort': '-created'})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get(reverse('api_reminders'), {'cursor': 'garbage'})
+        self.assertEqual(response.status_code, 400)
+
+
+class UserImportTests(TestCase):
+    """Разбор файлов импорта пользователей (transfer.py): ошибочные строки пропускаются с номером"""
+
+    def import_file(self, content, fmt):
+        return import_users(read_import_rows(io.BytesIO(content.encode('utf-8')), fmt))
+
+    def test_malformed_csv_rows(self):
+        stats = self.import_file(
+            '\ufeffname,telegram_id,group\r\n'
+            'Ann,1,Team\r\n'
+            'Bob,,Team\r\n'
+            ',2,Team\r\n'
+            'Carl,3\r\n'
+            'Dan,4,Team,extra\r\n'
+            '"Eve, Jr.",5,"Team"\r\n'
+            ',,Empty\r\n'
+            'Ann Again,1,Other\r\n',
+            'csv',
+        )
+        self.assertEqual(stats['rows'], 8)
+        self.assertEqual(stats['errors'], [
+            {'line': 2, 'error': 'telegram_id is required'},
+            {'line': 3, 'error': 'name is required'},
+            {'line': 4, 'error': 'group is required'},
+        ])
+        users = dict(UserInGroup.objects.values_list('telegram_id', 'name'))
+        self.assertEqual(users, {'1': 'Ann Again', '4': 'Dan', '5': 'Eve, Jr.'})
+        self.assertEqual(UserInGroup.objects.get(telegram_id='1').group.name, 'Other')
+        self.assertEqual(set(Group.objects.values_list('name', flat=True)), {'Team', 'Empty', 'Other'})
+
+    def test_csv_header_is_required(self):
+        for content in ('', 'name,telegram_id\nAnn,1\n', 'Ann,1,Team\n'):
+            with self.subTest(content=content):
+                with self.assertRaises(ImportFormatError):
+                    read_import_rows(io.BytesIO(content.encode()), 'csv')
+        self.assertFalse(Group.objects.exists())
+
+    def test_unclosed_quote_aborts_import(self):
+        content = 'name,telegram_id,group\nAnn,1,Team\n"Bob,2,Team\n' + 'x' * (csv.field_size_limit() + 1)
+        with self.assertRaisesMessage(ImportFormatError, 'Invalid CSV at line'):
+            self.import_file(content, 'csv')
+        self.assertFalse(UserInGroup.objects.exists())
+
+    def test_malformed_json_lines(self):
+        stats = self.import_file(
+            '{"name": "Ann", "telegram_id": 1, "group": "Team"}\n'
+            '{"name": "Bob", "telegram_id": \n'
+            '\n'
+            '["Carl", 3, "Team"]\n'
+            '{"name": "Dan", "telegram_id": "4"}\n',
+            'jsonl',
+        )
+        self.assertEqual(stats['errors'], [
+            {'line': 2, 'error': 'Row must be an object'},
+            {'line': 3, 'error': 'Row must be an object'},
+            {'line': 4, 'error': 'group is required'},
+        ])
+        self.assertEqual(list(UserInGroup.objects.values_list('telegram_id', flat=True)), ['1'])
+
+    def test_json_must_be_array(self):
+        for content in ('{"name": "Ann"}', '[{"name": ', ''):
+            with self.subTest(content=content):
+                with self.assertRaises(ImportFormatError):
+                    read_import_rows(io.BytesIO(content.encode()), 'json')
+
+
+class FanoutMergeTests(TestCase):
+    """Склейка напоминаний одного чата (plan_fanout с merge=True) на границе TELEGRAM_MESSAGE_LIMIT"""
+
+    def reminders(self, *lengths):
+        return [Reminder(id=i, text=str(i % 10) * length) for i, length in enumerate(lengths, start=1)]
+
+    def plan(self, reminders, chat_ids=('42',)):
+        return plan_fanout(
+            [(reminder, list(chat_ids)) for reminder in reminders],
+            {reminder.id: set() for reminder in reminders},
+            merge=True,
+        )
+
+    def room(self, count):
+        """Сколько символов текста помещается в одно сообщение из count напоминаний"""
+        return TELEGRAM_MESSAGE_LIMIT - len(MESSAGE_HEADER) - len(MERGED_SEPARATOR) * (count - 1)
+
+    def test_exactly_at_limit_is_one_message(self):
+        room = self.room(3)
+        messages = self.plan(self.reminders(100, 200, room - 300))
+        self.assertEqual([ids for _, ids, _ in messages], [(1, 2, 3)])
+        self.assertEqual(len(messages[0][2]), TELEGRAM_MESSAGE_LIMIT)
+
+    def test_one_over_limit_starts_new_message(self):
+        room = self.room(3)
+        messages = self.plan(self.reminders(100, 200, room - 299))
+        self.assertEqual([ids for _, ids, _ in messages], [(1, 2), (3,)])
+        for _, _, text in messages:
+            self.assertTrue(text.startswith(MESSAGE_HEADER))
+            self.assertLessEqual(len(text), TELEGRAM_MESSAGE_LIMIT)
+
+    def test_order_and_separator_are_kept(self):
+        reminders = self.reminders(*[self.room(2) // 2] * 5)
+        messages = self.plan(reminders)
+        # По два напоминания в сообщении: третье уже не помещается из-за разделителей
+        self.assertEqual([ids for _, ids, _ in messages], [(1, 2), (3, 4), (5,)])
+        chat_id, ids, text = messages[0]
+        self.assertEqual(chat_id, '42')
+        self.assertEqual(text, MESSAGE_HEADER + reminders[0].text + MERGED_SEPARATOR + reminders[1].text)
+
+    def test_long_reminder_is_sent_alone(self):
+        messages = self.plan(self.reminders(10, self.room(1), 10))
+        self.assertEqual([ids for _, ids, _ in messages], [(1,), (2,), (3,)])
+        self.assertEqual(len(messages[1][2]), TELEGRAM_MESSAGE_LIMIT)
+
+    def test_chats_are_merged_separately(self):
+        reminders = self.reminders(10, 20)
+        messages = self.plan(reminders, chat_ids=('1', '2'))
+        self.assertEqual(sorted((chat_id, ids) for chat_id, ids, _ in messages), [('1', (1, 2)), ('2', (1, 2))])
+
+
+class ScriptedBot:
+    """Бот, чьи send_message по очереди бросают заданные ошибки, а затем отправляют"""
+
+    def __init__(self, *errors):
+        self.errors = list(errors)
+        self.calls = 0
+
+    async def send_message(self, chat_id, text):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return mock.Mock(message_id=self.calls)
+
+
+class RetryClassificationTests(TestCase):
+    """Что делать с ошибкой Telegram: повторить, выключить чат или отклонить сообщение"""
+
+    def setUp(self):
+        # Без ожидания между повторами и без пауз ограничителя
+        patcher = mock.patch('send_reminders.TELEGRAM_RETRY_BASE_DELAY', 0)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.limiter = TelegramRateLimiter(rate=1000, chat_interval=0)
+
+    def test_classification(self):
+        cases = [
+            # (ошибка, повторять, ошибка чата)
+            (RetryAfter(5), True, False),
+            (TimedOut(), True, False),
+            (NetworkError('Bad Gateway'), True, False),
+            (Forbidden('Forbidden: bot was blocked by the user'), False, False),
+            (BadRequest('Chat not found'), False, True),
+            (BadRequest('Bad Request: PEER_ID_INVALID'), False, True),
+            (BadRequest('Not enough rights to send text messages to the chat'), False, True),
+            (ChatMigrated(-100123), False, True),
+            (BadRequest('Message is too long'), False, False),
+            (BadRequest("Can't parse entities: unsupported start tag"), False, False),
+            (ValueError('bug'), False, False),
+        ]
+        for error, retryable, chat_error in cases:
+            with self.subTest(error=repr(error)):
+                self.assertEqual(is_retryable(error), retryable)
+                self.assertEqual(is_chat_error(error), chat_error)
+
+    async def send(self, bot):
+        return await send_reminder_to_user(bot, '42', 'text', limiter=self.limiter)
+
+    async def test_retry_after_pauses_and_retries(self):
+        bot = ScriptedBot(RetryAfter(0), TimedOut())
+        with mock.patch.object(self.limiter, 'pause', wraps=self.limiter.pause) as pause:
+            self.assertEqual(await self.send(bot), (Delivery.STATUS_SENT, '', 3))
+        pause.assert_called_once_with(0)
+
+    async def test_forbidden_is_blocked(self):
+        bot = ScriptedBot(Forbidden('Forbidden: bot was blocked by the user'))
+        self.assertEqual(await self.send(bot), (Delivery.STATUS_BLOCKED, 'Forbidden', None))
+        self.assertEqual(bot.calls, 1)
+
+    async def test_bad_request_mapping(self):
+        for error, status in (
+            (BadRequest('Chat not found'), Delivery.STATUS_UNREACHABLE),
+            (ChatMigrated(-100123), Delivery.STATUS_UNREACHABLE),
+            (BadRequest('Message is too long'), Delivery.STATUS_REJECTED),
+        ):
+            with self.subTest(error=repr(error)):
+                bot = ScriptedBot(error)
+                self.assertEqual(await self.send(bot), (status, type(error).__name__, None))
+                # Повтор не поможет: одна попытка
+                self.assertEqual(bot.calls, 1)
+
+    async def test_retries_are_limited(self):
+        with mock.patch('send_reminders.TELEGRAM_MAX_ATTEMPTS', 3):
+            bot = ScriptedBot(*[NetworkError('Bad Gateway')] * 5)
+            self.assertEqual(await self.send(bot), (Delivery.STATUS_FAILED, 'NetworkError', None))
+        self.assertEqual(bot.calls, 3)
+
+
+class ChatHealthTests(TestCase):
+    """Выключение мертвых чатов по итогам рассылки (health.py)"""
+
+    def setUp(self):
+        self.group = Group.objects.create(name='Team', telegram_chat_id='-100')
+        self.user = UserInGroup.objects.create(name='User', telegram_id='42', group=Group.objects.create(name='Solo'))
+
+    def record(self, status, chat_id='42'):
+        record_chat_health({chat_id: status})
+        self.user.refresh_from_db()
+        self.group.refresh_from_db()
+
+    def test_unreachable_chat_is_deactivated_at_threshold(self):
+        for failures in range(1, CHAT_MAX_FAILURES):
+            self.record(Delivery.STATUS_UNREACHABLE)
+            self.assertEqual(self.user.consecutive_failures, failures)
+            self.assertTrue(self.user.is_active)
+        with mock.patch('reminders.health.recipients_changed') as recipients_changed:
+            self.record(Delivery.STATUS_UNREACHABLE)
+        self.assertFalse(self.user.is_active)
+        self.assertIsNotNone(self.user.blocked_at)
+        recipients_changed.assert_called_once_with(group_ids={self.user.group_id})
+
+    def test_success_resets_failures(self):
+        for _ in range(CHAT_MAX_FAILURES - 1):
+            self.record(Delivery.STATUS_UNREACHABLE)
+        self.record(Delivery.STATUS_SENT)
+        self.assertEqual(self.user.consecutive_failures, 0)
+        for _ in range(CHAT_MAX_FAILURES - 1):
+            self.record(Delivery.STATUS_UNREACHABLE)
+        self.assertTrue(self.user.is_active)
+
+    def test_blocked_chat_is_deactivated_at_once(self):
+        self.record(Delivery.STATUS_BLOCKED)
+        self.assertFalse(self.user.is_active)
+        self.assertEqual(self.user.consecutive_failures, 0)
+
+    def test_message_errors_do_not_count(self):
+        for _ in range(CHAT_MAX_FAILURES + 1):
+            self.record(Delivery.STATUS_REJECTED)
+            self.record(Delivery.STATUS_FAILED)
+        self.assertTrue(self.user.is_active)
+        self.assertEqual(self.user.consecutive_failures, 0)
+
+    def test_group_chat_threshold_and_reactivation(self):
+        for _ in range(CHAT_MAX_FAILURES):
+            self.record(Delivery.STATUS_UNREACHABLE, chat_id='-100')
+        self.assertFalse(self.group.chat_is_active)
+        self.assertEqual(self.group.chat_consecutive_failures, CHAT_MAX_FAILURES)
+        # Личный чат с тем же статусом в проходе не участвовал
+        self.assertTrue(self.user.is_active)
+
+        self.assertEqual(reactivate_chats(Group.objects.filter(id=self.group.id)), 1)
+        self.group.refresh_from_db()
+        self.assertTrue(self.group.chat_is_active)
+        self.assertIsNone(self.group.chat_blocked_at)
+        self.assertEqual(self.group.chat_consecutive_failures, 0)
 
-# Create your tests here.
+    def test_one_delivery_keeps_chat_alive(self):
+        statuses = chat_statuses([
+            ('42', Delivery.STATUS_UNREACHABLE), ('42', Delivery.STATUS_SENT), ('7', Delivery.STATUS_FAILED),
+            ('7', Delivery.STATUS_BLOCKED), ('8', Delivery.STATUS_REJECTED), ('8', Delivery.STATUS_UNREACHABLE),
+        ])
+        self.assertEqual(statuses, {
+            '42': Delivery.STATUS_SENT, '7': Delivery.STATUS_BLOCKED, '8': Delivery.STATUS_UNREACHABLE,
+        })
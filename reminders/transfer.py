@@ -0,0 +1,183 @@
+import csv
+import io
+import json
+import logging
+from itertools import islice
+
+from django.db import transaction
+
+from .models import Group, UserInGroup
+from .recipients import recipients_changed
+
+logger = logging.getLogger(__name__)
+
+TRANSFER_FIELDS = ('name', 'telegram_id', 'group')
+IMPORT_BATCH_SIZE = 1000
+EXPORT_CHUNK_SIZE = 2000
+# Сколько ошибок в строках возвращать в ответе импорта
+MAX_REPORTED_ERRORS = 100
+
+
+class ImportFormatError(ValueError):
+    pass
+
+
+def _json_lines(text):
+    for line in text:
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError:
+            # Битая строка попадет в errors импорта, а не прервет его
+            yield None
+
+
+def _csv_rows(reader):
+    try:
+        yield from reader
+    except csv.Error as e:
+        # Например, незакрытая кавычка: поле растягивается до конца файла и превышает лимит.
+        # Дальше строк не разобрать, поэтому импорт отменяется целиком
+        raise ImportFormatError(f"Invalid CSV at line {reader.line_num}: {e}")
+
+
+def read_import_rows(stream, fmt):
+    """
+    Читает строки импорта из бинарного потока: csv (с заголовком name,telegram_id,group),
+    jsonl (объект на строку) или json (массив объектов). csv и jsonl читаются потоково.
+    """
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    if fmt == 'csv':
+        reader = csv.DictReader(text)
+        try:
+            fieldnames = reader.fieldnames
+        except csv.Error as e:
+            raise ImportFormatError(f"Invalid CSV header: {e}")
+        if not fieldnames or not set(TRANSFER_FIELDS).issubset(fieldnames):
+            raise ImportFormatError(f"CSV header must contain: {', '.join(TRANSFER_FIELDS)}")
+        return _csv_rows(reader)
+    if fmt == 'jsonl':
+        return _json_lines(text)
+    if fmt == 'json':
+        try:
+            rows = json.load(text)
+        except ValueError as e:
+            raise ImportFormatError(f"Invalid JSON: {e}")
+        if not isinstance(rows, list):
+            raise ImportFormatError("JSON must be an array of objects")
+        return rows
+    raise ImportFormatError(f"Unknown format: {fmt}")
+
+
+def _clean(row):
+    if not isinstance(row, dict):
+        raise ValueError("Row must be an object")
+    name, telegram_id, group = (str(row.get(field) or '').strip() for field in TRANSFER_FIELDS)
+    if not group:
+        raise ValueError("group is required")
+    if telegram_id and not name:
+        raise ValueError("name is required")
+    if name and not telegram_id:
+        raise ValueError("telegram_id is required")
+    return name, telegram_id, group
+
+
+def _import_batch(rows, stats):
+    """Одна пачка: недостающие группы создаются одним запросом, пользователи - одним upsert"""
+    group_names = {group for _, _, group in rows}
+    groups = dict(Group.objects.filter(name__in=group_names).values_list('name', 'id'))
+    missing = group_names - groups.keys()
+    if missing:
+        Group.objects.bulk_create([Group(name=name) for name in missing], ignore_conflicts=True)
+        groups.update(Group.objects.filter(name__in=missing).values_list('name', 'id'))
+        stats['groups_created'] += len(missing)
+
+    # Повтор telegram_id в одной пачке ON CONFLICT не допускает: побеждает последняя строка
+    users = {
+        telegram_id: UserInGroup(name=name, telegram_id=telegram_id, group_id=groups[group])
+        for name, telegram_id, group in rows
+        if telegram_id
+    }
+    if users:
+        # bulk_create не отправляет сигналы: кэш получателей сбрасываем сами, включая прежние группы
+        touched = set(UserInGroup.objects.filter(telegram_id__in=list(users)).values_list('group_id', flat=True))
+        touched.update(user.group_id for user in users.values())
+        recipients_changed(group_ids=touched)
+        UserInGroup.objects.bulk_create(
+            list(users.values()),
+            update_conflicts=True,
+            unique_fields=['telegram_id'],
+            update_fields=['name', 'group'],
+        )
+        stats['users_upserted'] += len(users)
+
+
+def import_users(rows, batch_size=IMPORT_BATCH_SIZE):
+    """
+    Загружает пользователей и группы из строк {name, telegram_id, group} в одной транзакции.
+
+    Пользователи обновляются по уникальному telegram_id (bulk_create с update_conflicts),
+    отсутствующие группы создаются. Строка только с group создает пустую группу.
+    Ошибочные строки пропускаются и попадают в errors (номер строки считается с 1).
+    """
+    stats = {'rows': 0, 'users_upserted': 0, 'groups_created': 0, 'errors': []}
+    rows = iter(rows)
+    line = 0
+    with transaction.atomic():
+        while chunk := list(islice(rows, batch_size)):
+            batch = []
+            for row in chunk:
+                line += 1
+                try:
+                    batch.append(_clean(row))
+                except ValueError as e:
+                    if len(stats['errors']) < MAX_REPORTED_ERRORS:
+                        stats['errors'].append({'line': line, 'error': str(e)})
+            if batch:
+                _import_batch(batch, stats)
+    stats['rows'] = line
+    logger.info(
+        f"Imported users: {stats['users_upserted']} upserted, {stats['groups_created']} groups created, "
+        f"{len(stats['errors'])} bad rows of {stats['rows']}"
+    )
+    return stats
+
+
+async def aexport_rows():
+    """Все пользователи и пустые группы как (name, telegram_id, group) курсором, без загрузки в память"""
+    # values(), а не values_list(): у values_list() aiterator() выполняет запрос вне потока
+    users = UserInGroup.objects.order_by('id').values('name', 'telegram_id', 'group__name')
+    async for row in users.aiterator(chunk_size=EXPORT_CHUNK_SIZE):
+        yield row['name'], row['telegram_id'], row['group__name']
+    empty_groups = Group.objects.filter(users__isnull=True).order_by('id').values_list('name', flat=True)
+    async for name in empty_groups.aiterator(chunk_size=EXPORT_CHUNK_SIZE):
+        yield '', '', name
+
+
+class _Echo:
+    """Буфер для csv.writer: строка сразу возвращается, а не копится"""
+
+    def write(self, value):
+        return value
+
+
+async def aexport_csv():
+    writer = csv.writer(_Echo())
+    yield writer.writerow(TRANSFER_FIELDS)
+    async for row in aexport_rows():
+        yield writer.writerow(row)
+
+
+async def aexport_jsonl():
+    async for row in aexport_rows():
+        yield json.dumps(dict(zip(TRANSFER_FIELDS, row)), ensure_ascii=False) + '\n'
+
+
+async def aexport_json():
+    """JSON-массив по частям: открывающая скобка, объекты через запятую, закрывающая скобка"""
+    separator = '['
+    async for row in aexport_rows():
+        yield separator + json.dumps(dict(zip(TRANSFER_FIELDS, row)), ensure_ascii=False)
+        separator = ','
+    yield ']' if separator == ',' else '[]'
@@ -17,14 +17,25 @@ urlpatterns = [
     path('users/create/', views.UserInGroupCreateView.as_view(), name='useringroup_create'),
     path('users/<int:pk>/update/', views.UserInGroupUpdateView.as_view(), name='useringroup_update'),
     path('users/<int:pk>/delete/', views.UserInGroupDeleteView.as_view(), name='useringroup_delete'),
+    path('users/import/', views.UserImportView.as_view(), name='useringroup_import'),
+    path('users/export/', views.UserExportView.as_view(), name='useringroup_export'),
     
     # Инструкция
     path('instruction/', views.instruction_view, name='instruction'),
     
     # API URLs
     path('api/reminders/', views.RemindersAPIView.as_view(), name='api_reminders'),
+    path('api/reminders/bulk/', views.BulkRemindersAPIView.as_view(), name='api_bulk_reminders'),
+    path('api/reminders/events/', views.ReminderEventsAPIView.as_view(), name='api_reminder_events'),
     path('api/groups/', views.GroupsAPIView.as_view(), name='api_groups'),
+    path('api/users/import/', views.UserImportAPIView.as_view(), name='api_users_import'),
+    path('api/users/export/', views.UserExportView.as_view(), name='api_users_export'),
+    path('api/chats/blocked/', views.BlockedChatsAPIView.as_view(), name='api_blocked_chats'),
+
+    # Обновления Telegram в режиме webhook
+    path('telegram/<str:secret>/<str:bot_id>/', views.TelegramWebhookView.as_view(), name='telegram_webhook'),
     path('api/reminders/<int:pk>/', views.ReminderUpdateView.as_view(), name='api_update_reminder'),
     path('api/reminders/delete/<int:pk>/', views.ReminderDeleteView.as_view(), name='api_delete_reminder'),
     path('api/reminders/send_due/', views.SendDueRemindersAPIView.as_view(), name='api_send_due_reminders'),
+    path('api/send_jobs/<int:pk>/', views.SendJobStatusAPIView.as_view(), name='api_send_job'),
 ]
\ No newline at end of file
@@ -2,30 +2,43 @@ from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib import messages
 from django.urls import reverse_lazy
 from django.views.generic import ListView, CreateView, UpdateView, DeleteView
-from django.http import JsonResponse
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.db.models import Count, Max, Min, Q
+from django.utils.cache import get_conditional_response
+from django.core.cache import cache
+from django.core.handlers.asgi import ASGIRequest
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
 from django.views import View
 from django.views.generic import TemplateView
-from django.shortcuts import get_object_or_404
+from django.shortcuts import get_object_or_404, aget_object_or_404
 from django.utils.dateparse import parse_datetime
 from django.core.exceptions import ValidationError
-from django.core.paginator import Paginator
 from django.utils import timezone
 from datetime import timedelta
-from django.db import transaction
 
 import asyncio
+import hashlib
+import hmac
 import json
+import math
 import logging
 from logging.handlers import RotatingFileHandler
 from decouple import config
 from datetime import datetime
 from zoneinfo import ZoneInfo
+from asgiref.sync import sync_to_async
 
-from .models import Reminder, Group, UserInGroup
+from .models import Reminder, Group, UserInGroup, SendJob, ReminderTombstone
+from .cursors import InvalidCursor, decode_cursor, encode_cursor
 from .forms import GroupForm, UserInGroupForm
-from send_reminders import create_bot_with_proxy, send_reminders_batch
+from .jobs import SEND_CUSHION, enqueue_send_job
+from .bulk import MAX_BULK_ITEMS, apply_bulk
+from .health import reactivate_chats
+from .telegram_bot import TELEGRAM_WEBHOOK_SECRET, get_webhook_bots
+from .events import get_event_hub
+from .serializers import FastJsonResponse, aserialize_reminder, aserialize_reminders, dumps
+from .transfer import ImportFormatError, aexport_csv, aexport_json, aexport_jsonl, import_users, read_import_rows
 
 # Настройка логирования
 logger = logging.getLogger(__name__)
@@ -84,6 +97,72 @@ class UserInGroupDeleteView(DeleteView):
     template_name = 'reminders/useringroup_confirm_delete.html'
     success_url = reverse_lazy('useringroup_list')
 
+# Импорт и экспорт пользователей и групп
+IMPORT_FORMATS = ('csv', 'json', 'jsonl')
+EXPORT_FORMATS = {
+    'csv': (aexport_csv, 'text/csv; charset=utf-8'),
+    'json': (aexport_json, 'application/json'),
+    'jsonl': (aexport_jsonl, 'application/x-ndjson'),
+}
+
+
+class UserImportView(View):
+    """
+    Загрузка файла (поле file) со строками name, telegram_id, group. Формат - параметр format
+    или расширение файла. Страница пользователей получает итог в сообщении, API - в JSON.
+    """
+    api = False
+
+    def post(self, request):
+        upload = request.FILES.get('file')
+        if upload is None:
+            return self.respond(request, {'error': 'File is required'}, status=400)
+        fmt = request.POST.get('format') or request.GET.get('format') or upload.name.rpartition('.')[2].lower()
+        if fmt not in IMPORT_FORMATS:
+            return self.respond(request, {'error': f"Unsupported format, use one of: {', '.join(IMPORT_FORMATS)}"}, status=400)
+
+        try:
+            stats = import_users(read_import_rows(upload.file, fmt))
+        except ImportFormatError as e:
+            return self.respond(request, {'error': str(e)}, status=400)
+        except UnicodeDecodeError:
+            return self.respond(request, {'error': 'File must be UTF-8'}, status=400)
+        return self.respond(request, stats)
+
+    def respond(self, request, data, status=200):
+        if self.api:
+            return JsonResponse(data, status=status)
+        if 'error' in data:
+            messages.error(request, f"Импорт не выполнен: {data['error']}")
+        else:
+            messages.success(
+                request,
+                f"Импортировано пользователей: {data['users_upserted']}, создано групп: {data['groups_created']}, "
+                f"строк с ошибками: {len(data['errors'])}",
+            )
+            for error in data['errors'][:10]:
+                messages.warning(request, f"Строка {error['line']}: {error['error']}")
+        return redirect('useringroup_list')
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class UserImportAPIView(UserImportView):
+    api = True
+
+
+class UserExportView(View):
+    """Выгрузка всех пользователей (и пустых групп) потоком: память не растет с числом строк"""
+
+    async def get(self, request):
+        fmt = request.GET.get('format', 'csv')
+        if fmt not in EXPORT_FORMATS:
+            return JsonResponse({'error': f"Unsupported format, use one of: {', '.join(EXPORT_FORMATS)}"}, status=400)
+        stream, content_type = EXPORT_FORMATS[fmt]
+        response = StreamingHttpResponse(stream(), content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="users.{fmt}"'
+        return response
+
+
 # Главная страница (например, список напоминаний)
 def home(request):
     return redirect('reminder_list') # Перенаправляем на список напоминаний
@@ -91,9 +170,139 @@ def home(request):
 
 
 # API Views
+# Сколько изменений отдается за один запрос ?since=
+CHANGES_LIMIT = 500
+# updated_at и ID следа удаления назначаются до коммита, поэтому транзакция, начатая раньше,
+# может стать видна уже после того, как курсор ушел дальше. Изменения за это время перед
+# текущим моментом перечитываются каждым запросом ?since=; уже отданные курсор помнит
+CHANGES_OVERLAP = timedelta(seconds=10)
+# Сколько отданных из этого окна изменений (и отдельно следов удаления) помнит курсор: он
+# передается в URL и не должен расти вместе с числом изменений. Забытые отдаются повторно
+CHANGES_SEEN_LIMIT = 100
+# Курсор пустого списка
+CURSOR_EPOCH = datetime(1970, 1, 1, tzinfo=ZoneInfo('UTC'))
+# Общее число напоминаний для ?count=1 допускает отставание на это время
+REMINDERS_COUNT_CACHE_SECONDS = 60
+# Параметры, от которых зависит число напоминаний
+REMINDER_FILTER_PARAMS = ('status', 'due_after', 'due_before', 'group', 'q')
+
+
+# Сортировки списка: поле и порядок (по убыванию или нет); id добавляется для однозначности
+REMINDER_SORTS = {
+    '-created': ('created_at', True),
+    'created': ('created_at', False),
+    'due': ('due_time', False),
+    '-due': ('due_time', True),
+}
+
+
+def filter_reminders(params):
+    """
+    Напоминания с фильтрами из запроса. Возвращает (queryset, sort) или (None, текст ошибки).
+
+    status - pending, completed или sending; due_after / due_before - диапазон due_time;
+    group - ID группы; q - подстрока текста (индекс pg_trgm); sort - ключ REMINDER_SORTS.
+    """
+    reminders = Reminder.objects.all()
+
+    status = params.get('status')
+    if status == 'pending':
+        reminders = reminders.filter(is_completed=False)
+    elif status == 'completed':
+        reminders = reminders.filter(is_completed=True)
+    elif status == 'sending':
+        reminders = reminders.filter(is_sending=True)
+    elif status not in (None, '', 'all'):
+        return None, 'Invalid status'
+
+    for param, lookup in (('due_after', 'due_time__gte'), ('due_before', 'due_time__lte')):
+        if params.get(param):
+            try:
+                value = parse_datetime(params[param])
+            except ValueError:
+                # Верный формат, но невозможная дата (2024-13-01)
+                value = None
+            if not value:
+                return None, f'Invalid {param} format'
+            reminders = reminders.filter(**{lookup: value})
+
+    if params.get('group'):
+        try:
+            reminders = reminders.filter(groups=int(params['group']))
+        except (ValueError, TypeError):
+            return None, 'Invalid group'
+
+    query = params.get('q', '').strip()
+    if query:
+        reminders = reminders.filter(text__icontains=query)
+
+    sort = params.get('sort') or '-created'
+    if sort not in REMINDER_SORTS:
+        return None, 'Invalid sort'
+    field, descending = REMINDER_SORTS[sort]
+    if descending:
+        reminders = reminders.order_by(f'-{field}', '-id')
+    else:
+        reminders = reminders.order_by(field, 'id')
+    return reminders, sort
+
+
+async def groups_version():
+    """Версия списка групп: меняется при создании, переименовании и удалении"""
+    agg = await Group.objects.aaggregate(last=Max('updated_at'), count=Count('id'))
+    return f"{agg['last']}:{agg['count']}"
+
+
+def cursor_micros(value):
+    """Время для курсора целым числом микросекунд: точно и короче isoformat"""
+    return (value - CURSOR_EPOCH) // timedelta(microseconds=1)
+
+
+async def changes_cursor():
+    """
+    Курсор ?since=: самое свежее изменение (updated_at, id), самое свежее удаление и уже
+    отданные изменения из окна CHANGES_OVERLAP ([id, updated_at] и ID следов удаления)
+    """
+    last = await Reminder.objects.order_by('-updated_at', '-id').values('updated_at', 'id').afirst()
+    tombstone = await ReminderTombstone.objects.aaggregate(last=Max('id'))
+    if last is None:
+        return encode_cursor([CURSOR_EPOCH.isoformat(), 0, tombstone['last'] or 0, [], []])
+    return encode_cursor([last['updated_at'].isoformat(), last['id'], tombstone['last'] or 0, [], []])
+
+
+async def cached_reminders_count(params):
+    """Число напоминаний под фильтрами запроса; кэшируется отдельно для каждого набора фильтров"""
+    filters = [(name, params.get(name, '')) for name in REMINDER_FILTER_PARAMS]
+    key = 'reminders:total_count:' + hashlib.sha1(json.dumps(filters).encode()).hexdigest()
+    count = await cache.aget(key)
+    if count is None:
+        reminders, _ = filter_reminders(params)
+        count = await reminders.acount()
+        await cache.aset(key, count, REMINDERS_COUNT_CACHE_SECONDS)
+    return count
+
+
+def _etag(*parts):
+    return '"%s"' % hashlib.sha1(':'.join(str(p) for p in parts).encode()).hexdigest()
+
+
+async def reminders_etag(request):
+    """
+    Строгий ETag списка напоминаний: последнее изменение (индекс по updated_at), последнее
+    удаление, версия групп (их имена входят в ответ) и параметры запроса.
+    """
+    return _etag(await changes_cursor(), await groups_version(), request.get_full_path())
+
+
+async def groups_etag(request):
+    return _etag(await groups_version(), request.get_full_path())
+
+
+# Асинхронные: под ASGI (uvicorn) один процесс обслуживает много одновременных запросов,
+# не занимая поток на каждый запрос
 @method_decorator(csrf_exempt, name='dispatch')
 class RemindersAPIView(View):
-    def post(self, request):
+    async def post(self, request):
         try:
             data = json.loads(request.body)
         except json.JSONDecodeError:
@@ -117,36 +326,206 @@ class RemindersAPIView(View):
         except (ValueError, TypeError):
             return JsonResponse({'error': 'Invalid group IDs'}, status=400)
 
-        groups = Group.objects.filter(id__in=group_ids)
+        groups = [g async for g in Group.objects.filter(id__in=group_ids)]
         if len(groups) != len(group_ids):
             return JsonResponse({'error': 'Some group IDs do not exist'}, status=400)
 
         # Создание напоминания с новыми полями
         logger.info(f"{data=}")
-        reminder = Reminder.objects.create(
+        reminder = await Reminder.objects.acreate(
             text=text,
             due_time=due_time,
             is_completed=data.get('is_completed', False),
             repeat_interval_minutes=data.get('repeat_interval_minutes', 0),
             max_repeats=data.get('max_repeats', 1)
         )
-        reminder.groups.set(groups)
-
-        created_data = {
-            'id': reminder.id,
-            'text': reminder.text,
-            'groups': [{'id': g.id, 'name': g.name} for g in reminder.groups.all()],
-            'due_time': reminder.due_time.isoformat(),
-            'is_completed': reminder.is_completed,
-            'is_sending': reminder.is_sending,
-            'sent_at': reminder.sent_at,
-            'repeat_interval_minutes': reminder.repeat_interval_minutes,
-            'repeat_count': reminder.repeat_count,
-            'max_repeats': reminder.max_repeats,
+        await reminder.groups.aset(groups)
+
+        return FastJsonResponse(await aserialize_reminder(reminder.id), status=201)
+
+    async def get(self, request):
+        # Неизменившийся список отдаем как 304 по двум индексным запросам, не сериализуя страницу
+        etag = await reminders_etag(request)
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            if 'since' in request.GET:
+                response = await self.get_changes(request)
+            elif 'cursor' in request.GET:
+                response = await self.get_keyset_page(request)
+            else:
+                response = await self.get_page(request)
+        if response.status_code in (200, 304):
+            response['ETag'] = etag
+            response['Cache-Control'] = 'no-cache'
+        return response
+
+    async def get_changes(self, request):
+        """
+        Напоминания, измененные после курсора, и ID удаленных (по следам ReminderTombstone).
+
+        Изменения идут в порядке (updated_at, id) пачками по CHANGES_LIMIT; has_more означает,
+        что нужно сразу запросить следующую пачку с новым курсором. Кроме того, каждый запрос
+        перечитывает последние CHANGES_OVERLAP позади курсора: там могут появиться изменения
+        транзакций, закоммиченных позже, чем их обогнал курсор. Последние CHANGES_SEEN_LIMIT
+        отданных из этого окна изменений курсор помнит и повторно не отдает; более старые
+        (если за CHANGES_OVERLAP изменений было больше) могут прийти еще раз с тем же
+        updated_at, поэтому клиент применяет изменения по паре (id, updated_at).
+        """
+        try:
+            updated_at, reminder_id, tombstone_id, seen, seen_tombstones = decode_cursor(request.GET['since'], 5)
+            updated_at = datetime.fromisoformat(updated_at)
+            seen = {(int(seen_id), int(micros)) for seen_id, micros in seen}
+            seen_tombstones = {int(seen_id) for seen_id in seen_tombstones}
+        except (InvalidCursor, TypeError, ValueError):
+            return JsonResponse({'error': 'Invalid cursor'}, status=400)
+
+        # Старые следы удалений стираются (самый свежий остается всегда); если стерты следы
+        # после курсора, клиент не узнает об этих удалениях и должен загрузить список заново
+        oldest = await ReminderTombstone.objects.aaggregate(first=Min('id'))
+        if oldest['first'] is not None and tombstone_id < oldest['first'] - 1:
+            return JsonResponse({'error': 'Cursor expired'}, status=410)
+
+        horizon = timezone.now() - CHANGES_OVERLAP
+        behind = Q(updated_at__lt=updated_at) | Q(updated_at=updated_at, id__lte=reminder_id)
+        window = {
+            (rid, cursor_micros(changed_at))
+            async for rid, changed_at in Reminder.objects.filter(behind, updated_at__gt=horizon).values_list(
+                'id', 'updated_at',
+            )
+        }
+        late_ids = sorted(rid for rid, _ in window - seen)[:CHANGES_LIMIT + 1]
+        late = await aserialize_reminders(Reminder.objects.filter(id__in=late_ids).order_by('updated_at', 'id'))
+        changed = await aserialize_reminders(
+            Reminder.objects.filter(
+                Q(updated_at__gt=updated_at) | Q(updated_at=updated_at, id__gt=reminder_id)
+            ).order_by('updated_at', 'id')[:CHANGES_LIMIT + 1]
+        )
+
+        tombstone_window = {
+            t.id: t async for t in ReminderTombstone.objects.filter(id__lte=tombstone_id, deleted_at__gt=horizon)
         }
-        return JsonResponse(created_data, status=201)
+        late_tombstones = [
+            tombstone_window[tid] for tid in sorted(set(tombstone_window) - seen_tombstones)
+        ][:CHANGES_LIMIT + 1]
+        tombstones = [
+            t async for t in ReminderTombstone.objects.filter(id__gt=tombstone_id).order_by('id')[:CHANGES_LIMIT + 1]
+        ]
+
+        # Опоздавшие из окна на has_more не влияют: забытые курсором изменения отдаются
+        # повторно, и следующая пачка сразу же вернула бы их снова. Остаток окна придет
+        # со следующим запросом
+        has_more = any(len(items) > CHANGES_LIMIT for items in (changed, tombstones))
+        late, changed = late[:CHANGES_LIMIT], changed[:CHANGES_LIMIT]
+        # Напоминание могло успеть измениться еще раз и уйти за курсор: отдаем один раз
+        changed_ids = {r['id'] for r in changed}
+        late = [r for r in late if r['id'] not in changed_ids]
+        late_tombstones, tombstones = late_tombstones[:CHANGES_LIMIT], tombstones[:CHANGES_LIMIT]
+
+        if changed:
+            updated_at, reminder_id = changed[-1]['updated_at'], changed[-1]['id']
+        if tombstones:
+            tombstone_id = tombstones[-1].id
+        # Помним отданное из окна (и то, что уже было отдано раньше и еще в нем)
+        seen = (seen & window) | {
+            (r['id'], cursor_micros(r['updated_at'])) for r in late + changed if r['updated_at'] > horizon
+        }
+        seen_tombstones = (seen_tombstones & set(tombstone_window)) | {
+            t.id for t in late_tombstones + tombstones if t.deleted_at > horizon
+        }
+        # Размер курсора ограничен: остаются самые свежие, они дольше всех пробудут в окне
+        seen = sorted(seen, key=lambda pair: (pair[1], pair[0]))[-CHANGES_SEEN_LIMIT:]
+        seen_tombstones = sorted(seen_tombstones)[-CHANGES_SEEN_LIMIT:]
+
+        return FastJsonResponse({
+            'reminders': late + changed,
+            'deleted': [t.reminder_id for t in late_tombstones + tombstones],
+            'cursor': encode_cursor([
+                updated_at.isoformat(), reminder_id, tombstone_id,
+                sorted([rid, micros] for rid, micros in seen), seen_tombstones,
+            ]),
+            'has_more': has_more,
+        })
+
+    async def get_keyset_page(self, request):
+        """
+        Страница по курсору (?cursor=, пустой - первая страница) с фильтрами filter_reminders;
+        по умолчанию в порядке (-created_at, -id).
+
+        Вместо OFFSET страница начинается с позиции курсора в индексе сортировки
+        (reminder_created_id_idx и др.), поэтому глубокие страницы стоят столько же, сколько первая. Общее число записей считается
+        только по ?count=1 и кэшируется на REMINDERS_COUNT_CACHE_SECONDS.
+        """
+        try:
+            page_size = int(request.GET.get('page_size', 20))
+        except (ValueError, TypeError):
+            return JsonResponse({'error': 'Invalid page or page_size'}, status=400)
+        if page_size > 100:
+            page_size = 100
+        if page_size < 1:
+            return JsonResponse({'error': 'Invalid page or page_size'}, status=400)
+
+        reminders, sort = filter_reminders(request.GET)
+        if reminders is None:
+            return JsonResponse({'error': sort}, status=400)
+        field, descending = REMINDER_SORTS[sort]
+
+        token = request.GET['cursor']
+        direction = 'next'
+        if token:
+            try:
+                direction, cursor_sort, value, reminder_id = decode_cursor(token, 4)
+                value = datetime.fromisoformat(value)
+            except (InvalidCursor, TypeError, ValueError):
+                return JsonResponse({'error': 'Invalid cursor'}, status=400)
+            if direction not in ('next', 'prev') or cursor_sort != sort:
+                return JsonResponse({'error': 'Invalid cursor'}, status=400)
+
+            # Строки после курсора в порядке сортировки: (поле, id) дальше (value, id);
+            # нестрогое условие по полю задает начало диапазона в индексе
+            forward = (direction == 'next') != descending
+            if forward:
+                reminders = reminders.filter(
+                    Q(**{f'{field}__gt': value}) | Q(id__gt=reminder_id), **{f'{field}__gte': value},
+                )
+            else:
+                reminders = reminders.filter(
+                    Q(**{f'{field}__lt': value}) | Q(id__lt=reminder_id), **{f'{field}__lte': value},
+                )
+            if direction == 'prev':
+                reminders = reminders.reverse()
+
+        page = await aserialize_reminders(reminders[:page_size + 1])
+        has_more = len(page) > page_size
+        page = page[:page_size]
+        if direction == 'prev':
+            page.reverse()
+
+        # Назад от страницы, открытой через next, всегда есть куда; и наоборот
+        has_next = has_more if direction == 'next' else True
+        has_previous = has_more if direction == 'prev' else bool(token)
+        if not page:
+            has_next = has_previous = False
+
+        def page_cursor(direction, reminder):
+            return encode_cursor([direction, sort, reminder[field].isoformat(), reminder['id']])
+
+        pagination = {
+            'next': page_cursor('next', page[-1]) if has_next else None,
+            'previous': page_cursor('prev', page[0]) if has_previous else None,
+            'has_next': has_next,
+            'has_previous': has_previous,
+            'page_size': page_size,
+        }
+        if request.GET.get('count') == '1':
+            pagination['total_count'] = await cached_reminders_count(request.GET)
+
+        return FastJsonResponse({
+            'reminders': page,
+            'pagination': pagination,
+            'cursor': await changes_cursor(),
+        })
 
-    def get(self, request):
+    async def get_page(self, request):
         page = request.GET.get('page', 1)
         page_size = request.GET.get('page_size', 20)
 
@@ -158,61 +537,125 @@ class RemindersAPIView(View):
 
         if page_size > 100:
             page_size = 100
+        if page_size < 1:
+            return JsonResponse({'error': 'Invalid page or page_size'}, status=400)
 
-        reminders = Reminder.objects.all().prefetch_related('groups')
-
-        paginator = Paginator(reminders, page_size)
+        reminders, sort = filter_reminders(request.GET)
+        if reminders is None:
+            return JsonResponse({'error': sort}, status=400)
 
-        try:
-            reminders_page = paginator.page(page)
-        except Exception:
+        # Paginator синхронный, поэтому страницу считаем сами по тем же правилам
+        total_count = await reminders.acount()
+        total_pages = max(math.ceil(total_count / page_size), 1)
+        if page < 1 or page > total_pages:
             return JsonResponse({'error': 'Invalid page number'}, status=400)
 
+        offset = (page - 1) * page_size
         data = {
-            'reminders': [
-                {
-                    'id': r.id,
-                    'text': r.text,
-                    'groups': [{'id': g.id, 'name': g.name} for g in r.groups.all()],
-                    'due_time': r.due_time.isoformat(),
-                    'is_completed': r.is_completed,
-                    'is_sending': r.is_sending,
-                    'sent_at': r.sent_at,
-                    'repeat_interval_minutes': r.repeat_interval_minutes,
-                    'repeat_count': r.repeat_count,
-                    'max_repeats': r.max_repeats,
-                }
-                for r in reminders_page
-            ],
+            'reminders': await aserialize_reminders(reminders[offset:offset + page_size]),
             'pagination': {
-                'current_page': reminders_page.number,
-                'total_pages': paginator.num_pages,
-                'total_count': paginator.count,
-                'has_next': reminders_page.has_next(),
-                'has_previous': reminders_page.has_previous(),
+                'current_page': page,
+                'total_pages': total_pages,
+                'total_count': total_count,
+                'has_next': page < total_pages,
+                'has_previous': page > 1,
                 'page_size': page_size
-            }
+            },
+            # Начальная точка для последующих запросов ?since=
+            'cursor': await changes_cursor(),
         }
-        return JsonResponse(data)
+        return FastJsonResponse(data)
 
 class GroupsAPIView(View):
-    def get(self, request):
-        groups = Group.objects.all()
-        data = [{'id': g.id, 'name': g.name} for g in groups]
-        return JsonResponse(data, safe=False)
+    async def get(self, request):
+        etag = await groups_etag(request)
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            data = [{'id': g.id, 'name': g.name} async for g in Group.objects.all()]
+            response = JsonResponse(data, safe=False)
+        response['ETag'] = etag
+        response['Cache-Control'] = 'no-cache'
+        return response
+
+@method_decorator(csrf_exempt, name='dispatch')
+class BulkRemindersAPIView(View):
+    """
+    Пакетные операции: {"create": [напоминание, ...], "update": [{"id": ..., поля}, ...],
+    "delete": [id, ...]}. Возвращает результат по каждому элементу (id или error).
+    """
+    async def post(self, request):
+        try:
+            data = json.loads(request.body)
+        except json.JSONDecodeError:
+            return JsonResponse({'error': 'Invalid JSON'}, status=400)
+        if not isinstance(data, dict):
+            return JsonResponse({'error': 'Invalid JSON'}, status=400)
+
+        create_items = data.get('create') or []
+        update_items = data.get('update') or []
+        delete_ids = data.get('delete') or []
+        if not all(isinstance(items, list) for items in (create_items, update_items, delete_ids)):
+            return JsonResponse({'error': 'create, update and delete must be lists'}, status=400)
+        if len(create_items) + len(update_items) + len(delete_ids) > MAX_BULK_ITEMS:
+            return JsonResponse({'error': f'At most {MAX_BULK_ITEMS} items per request'}, status=400)
+        try:
+            delete_ids = [int(reminder_id) for reminder_id in delete_ids]
+        except (ValueError, TypeError):
+            return JsonResponse({'error': 'Invalid reminder IDs to delete'}, status=400)
+
+        results = await sync_to_async(apply_bulk)(create_items, update_items, delete_ids)
+        return FastJsonResponse(results)
+
+
+class ReminderEventsAPIView(View):
+    """
+    Поток событий (Server-Sent Events) об изменениях напоминаний: created, updated,
+    sent, completed, deleted и resync (перезагрузить страницу).
+
+    Работает только под ASGI с PostgreSQL (LISTEN/NOTIFY); иначе отвечает 503,
+    и страница возвращается к периодической перезагрузке.
+    """
+    keepalive_seconds = 15
+
+    async def get(self, request):
+        hub = get_event_hub()
+        if not isinstance(request, ASGIRequest) or not await hub.astart():
+            return JsonResponse({'error': 'Event stream is not available'}, status=503)
+
+        queue = hub.subscribe()
+
+        async def stream():
+            try:
+                yield 'retry: 5000\n\n'
+                while True:
+                    try:
+                        event = await asyncio.wait_for(queue.get(), timeout=self.keepalive_seconds)
+                    except asyncio.TimeoutError:
+                        yield ': keepalive\n\n'
+                        continue
+                    if event is None:
+                        break
+                    yield b'data: ' + dumps(event) + b'\n\n'
+            finally:
+                hub.unsubscribe(queue)
+
+        response = StreamingHttpResponse(stream(), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
 
 # Для обновления статуса и редактирования
 @method_decorator(csrf_exempt, name='dispatch')
 class ReminderUpdateView(View):
-    def patch(self, request, pk): # PATCH для изменения статуса
-        reminder = get_object_or_404(Reminder, pk=pk)
+    async def patch(self, request, pk): # PATCH для изменения статуса
+        reminder = await aget_object_or_404(Reminder, pk=pk)
         try:
             data = json.loads(request.body)
             if 'is_completed' in data:
                 reminder.is_completed = data['is_completed']
                 reminder.sent_at = timezone.now()
                 logger.info(f"Reminder with ID {pk} was chnged is_completed to: {reminder.is_completed}")
-                reminder.save()
+                await reminder.asave()
                 return JsonResponse({'success': True, 'reminder': {
                     'id': reminder.id,
                     'is_completed': reminder.is_completed
@@ -222,8 +665,8 @@ class ReminderUpdateView(View):
 
         return JsonResponse({'error': 'No valid field to update'}, status=400)
 
-    def put(self, request, pk): # PUT для полного редактирования
-        reminder = get_object_or_404(Reminder, pk=pk)
+    async def put(self, request, pk): # PUT для полного редактирования
+        reminder = await aget_object_or_404(Reminder, pk=pk)
         try:
             data = json.loads(request.body)
 
@@ -246,10 +689,10 @@ class ReminderUpdateView(View):
             except (ValueError, TypeError):
                 return JsonResponse({'error': 'Invalid group IDs'}, status=400)
 
-            groups = Group.objects.filter(id__in=group_ids)
+            groups = [g async for g in Group.objects.filter(id__in=group_ids)]
             if len(groups) != len(group_ids):
                 return JsonResponse({'error': 'Some group IDs do not exist'}, status=400)
-            reminder.groups.set(groups)
+            await reminder.groups.aset(groups)
 
             # Обработка полей повторения
             if 'repeat_interval_minutes' in data:
@@ -278,21 +721,10 @@ class ReminderUpdateView(View):
                 else:
                     reminder.sent_at = None
 
-            reminder.save()
+            await reminder.asave()
 
             # Возвращаем обновлённый объект с новыми полями
-            updated_data = {
-                'id': reminder.id,
-                'text': reminder.text,
-                'groups': [{'id': g.id, 'name': g.name} for g in reminder.groups.all()],
-                'due_time': reminder.due_time.isoformat(),
-                'is_completed': reminder.is_completed,
-                'sent_at': reminder.sent_at.isoformat() if reminder.sent_at else None,
-                'repeat_interval_minutes': reminder.repeat_interval_minutes,
-                'repeat_count': reminder.repeat_count,
-                'max_repeats': reminder.max_repeats,
-            }
-            return JsonResponse(updated_data)
+            return FastJsonResponse(await aserialize_reminder(reminder.id))
 
         except json.JSONDecodeError:
             return JsonResponse({'error': 'Invalid JSON'}, status=400)
@@ -302,120 +734,134 @@ class ReminderUpdateView(View):
 # Для удаления
 @method_decorator(csrf_exempt, name='dispatch')
 class ReminderDeleteView(View):
-    def delete(self, request, pk):
-        reminder = get_object_or_404(Reminder, pk=pk)
-        reminder.delete()
+    async def delete(self, request, pk):
+        reminder = await aget_object_or_404(Reminder, pk=pk)
+        await reminder.adelete()
         return JsonResponse({'success': True})
 
 
 @method_decorator(csrf_exempt, name='dispatch')
 class SendDueRemindersAPIView(View):
-    def post(self, request):
+    """
+    Ставит отправку подошедшего напоминания в очередь и сразу отвечает 202 с ID задания.
+
+    Саму отправку выполняют обработчики очереди в диспетчере (run_dispatcher),
+    результат браузер узнает через SendJobStatusAPIView.
+    """
+    async def post(self, request):
         try:
             data = json.loads(request.body.decode('utf-8'))
             reminder_id = data.get('reminder_id')
-            logger.info(f"I got and start sending for reminder: {reminder_id}")
-            
+            logger.info(f"I got send request for reminder: {reminder_id}")
+
             if not reminder_id:
                 return JsonResponse({'error': 'reminder_id is required'}, status=400)
 
+            try:
+                reminder = await Reminder.objects.aget(id=reminder_id)
+            except Reminder.DoesNotExist:
+                logger.error(f"Reminder with id {reminder_id} not found in API.")
+                return JsonResponse({'error': 'Reminder not found'}, status=404)
+
+            # Очевидные случаи отвечаем сразу, не занимая очередь
             now = timezone.now()
+            if reminder.is_completed:
+                logger.info(f"Reminder {reminder_id} already completed.")
+                return JsonResponse({'status': 'already_completed'})
 
-            with transaction.atomic():
-                try:
-                    reminder = Reminder.objects.select_for_update().get(id=reminder_id)
-                except Reminder.DoesNotExist:
-                    logger.error(f"Reminder with id {reminder_id} not found in API.")
-                    return JsonResponse({'error': 'Reminder not found'}, status=404)
-
-                if reminder.is_completed:
-                    logger.info(f"Reminder {reminder_id} already completed.")
-                    return JsonResponse({'status': 'already_completed'})
-
-                if reminder.is_sending:
-                    logger.info(f"Reminder {reminder_id} already being sent.")
-                    return JsonResponse({'status': 'already_sending'})
-
-                cushion = timedelta(seconds=10)
-                if reminder.due_time > now + cushion:
-                    logger.info(f"Reminder {reminder_id} is not due yet (due: {reminder.due_time}, now: {now}), cushion: {cushion}")
-                    return JsonResponse({'status': 'not_due_yet'})
-
-                logger.info(f"Marking reminder {reminder_id} as sending.")
-                reminder.is_sending = True
-                reminder.save()
-
-            user_ids = UserInGroup.objects.filter(
-                group__in=reminder.groups.all()
-            ).values_list('telegram_id', flat=True)
-            user_ids_list = list(user_ids)
-
-            if not user_ids_list:
-                logger.info(f"No users found for reminder {reminder_id}, skipping send.")
-                reminder.is_sending = False
-                reminder.save()
-                return JsonResponse({'status': 'no_users'})
-
-            logger.info(f"Sending reminder {reminder_id} to {len(user_ids_list)} users.")
-            
-            bot = create_bot_with_proxy()
-            
-            try:
-                successful_ids = asyncio.run(send_reminders_batch(bot, [(reminder, user_ids_list)]))
-                
-                if reminder.id in successful_ids:
-                    # Обновляем напоминание с учетом повторений
-                    with transaction.atomic():
-                        reminder = Reminder.objects.select_for_update().get(id=reminder_id)
-                        reminder.repeat_count += 1
-                        reminder.sent_at = now
-                        
-                        # Проверяем, нужно ли повторять
-                        if (reminder.repeat_interval_minutes > 0 and 
-                            reminder.repeat_count < reminder.max_repeats):
-                            # Устанавливаем следующее время отправки
-                            next_due_time = now + timedelta(minutes=reminder.repeat_interval_minutes)
-                            
-                            reminder.due_time = next_due_time
-                            reminder.is_sending = False
-                            reminder.is_completed = False
-                            reminder.save()
-                            
-                            # Возвращаем обновленные данные
-                            updated_data = {
-                                'id': reminder.id,
-                                'due_time': reminder.due_time.isoformat(),
-                                'is_completed': reminder.is_completed,
-                                'is_sending': reminder.is_sending,
-                                'repeat_count': reminder.repeat_count,
-                                'sent_at': reminder.sent_at.isoformat() if reminder.sent_at else None,
-                            }
-                            logger.info(f"Reminder {reminder_id} scheduled for repeat at {next_due_time}. Count: {reminder.repeat_count}/{reminder.max_repeats}")
-                            return JsonResponse({'status': 'repeated', 'reminder': updated_data})
-                        else:
-                            # Достигли максимального количества повторов
-                            reminder.is_completed = True
-                            reminder.is_sending = False
-                            reminder.save()
-                            logger.info(f"Reminder {reminder_id} marked as sent and completed. Total sends: {reminder.repeat_count}")
-                            return JsonResponse({'status': 'sent'})
-                else:
-                    # Сбрасываем флаг отправки при неудаче
-                    reminder.is_sending = False
-                    reminder.save()
-                    logger.error(f"Reminder {reminder_id} failed to send to all users")
-                    return JsonResponse({'error': 'Failed to send to any user'}, status=500)
-                    
-            except Exception as e:
-                logger.error(f"Error sending reminder {reminder_id}: {e}")
-                # При любой ошибке сбрасываем флаг отправки
-                reminder.is_sending = False
-                reminder.save()
-                return JsonResponse({'error': str(e)}, status=500)
+            if reminder.has_active_lease(now):
+                logger.info(f"Reminder {reminder_id} already being sent.")
+                return JsonResponse({'status': 'already_sending'})
+
+            if reminder.due_time > now + SEND_CUSHION:
+                logger.info(f"Reminder {reminder_id} is not due yet (due: {reminder.due_time}, now: {now}), cushion: {SEND_CUSHION}")
+                return JsonResponse({'status': 'not_due_yet'})
+
+            job = await sync_to_async(enqueue_send_job)(reminder)
+            return JsonResponse({'status': 'queued', 'job_id': job.id}, status=202)
 
         except json.JSONDecodeError as e:
             logger.error(f"JSON decode error in SendDueRemindersAPIView: {e}")
             return JsonResponse({'error': 'Invalid JSON'}, status=400)
         except Exception as e:
             logger.error(f"Error in SendDueRemindersAPIView: {e}", exc_info=True)
-            return JsonResponse({'error': str(e)}, status=500)
\ No newline at end of file
+            return JsonResponse({'error': str(e)}, status=500)
+
+
+class SendJobStatusAPIView(View):
+    """Состояние задания на отправку; браузер опрашивает его, пока задание не завершится"""
+    async def get(self, request, pk):
+        job = await aget_object_or_404(SendJob, pk=pk)
+        data = {
+            'id': job.id,
+            'reminder_id': job.reminder_id,
+            'status': job.status,
+            'result': job.result,
+            'error': job.error,
+        }
+        if job.status == SendJob.STATUS_DONE:
+            data['reminder'] = await aserialize_reminder(job.reminder_id)
+        return FastJsonResponse(data)
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class BlockedChatsAPIView(View):
+    """
+    GET - выключенные чаты (заблокировали бота или чат недоступен): личные и общие чаты групп,
+    POST {"ids": [id пользователя, ...], "group_ids": [id группы, ...]} - вернуть их в рассылку.
+    """
+    async def get(self, request):
+        users = UserInGroup.objects.filter(is_active=False).order_by('-blocked_at', 'id').values(
+            'id', 'name', 'telegram_id', 'group_id', 'group__name', 'blocked_at', 'consecutive_failures',
+        )
+        groups = Group.objects.filter(chat_is_active=False).exclude(telegram_chat_id='').order_by(
+            '-chat_blocked_at', 'id',
+        ).values('id', 'name', 'telegram_chat_id', 'chat_blocked_at', 'chat_consecutive_failures')
+        return FastJsonResponse({
+            'chats': [user async for user in users],
+            'groups': [group async for group in groups],
+        })
+
+    async def post(self, request):
+        try:
+            data = json.loads(request.body)
+            user_ids = [int(user_id) for user_id in data.get('ids', [])]
+            group_ids = [int(group_id) for group_id in data.get('group_ids', [])]
+        except (json.JSONDecodeError, AttributeError, TypeError, ValueError):
+            return JsonResponse({'error': 'Expected {"ids": [user IDs], "group_ids": [group IDs]}'}, status=400)
+        count = await sync_to_async(reactivate_chats)(UserInGroup.objects.filter(id__in=user_ids))
+        count += await sync_to_async(reactivate_chats)(Group.objects.filter(id__in=group_ids))
+        return JsonResponse({'reactivated': count})
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class TelegramWebhookView(View):
+    """
+    Обновления от Telegram (режим webhook). Обработка идет в фоне (telegram_bot.WebhookBots),
+    поэтому ответ мгновенный; при переполненной очереди 503 - Telegram повторит позже.
+    """
+    async def post(self, request, secret, bot_id):
+        header = request.headers.get('X-Telegram-Bot-Api-Secret-Token', '')
+        if not TELEGRAM_WEBHOOK_SECRET or not (
+            hmac.compare_digest(secret, TELEGRAM_WEBHOOK_SECRET) and hmac.compare_digest(header, TELEGRAM_WEBHOOK_SECRET)
+        ):
+            return HttpResponse(status=404)
+        bots = get_webhook_bots()
+        if bots is None:
+            return HttpResponse(status=503)
+
+        try:
+            data = json.loads(request.body)
+        except ValueError:
+            return HttpResponse(status=400)
+        try:
+            bots.enqueue(bot_id, data)
+        except KeyError:
+            return HttpResponse(status=404)
+        except ValueError:
+            # Не 500: на ошибку сервера Telegram повторял бы доставку бесконечно
+            return HttpResponse(status=400)
+        except asyncio.QueueFull:
+            logger.warning(f"Telegram update queue is full, rejecting update for bot {bot_id}")
+            return HttpResponse(status=503)
+        return HttpResponse()
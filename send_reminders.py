@@ -1,4 +1,5 @@
 import os
+import socket
 import django
 import asyncio
 import logging
@@ -6,16 +7,26 @@ from logging.handlers import RotatingFileHandler
 from datetime import datetime, timedelta
 from zoneinfo import ZoneInfo
 from telegram import Bot
-from telegram.error import Forbidden
+from telegram.request import HTTPXRequest
+from telegram.error import Forbidden, RetryAfter
 from decouple import config
+from asgiref.sync import sync_to_async
 from django.db import transaction
+from django.db.models import Q
 from django.utils import timezone
 
 # Настройка Django
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'reminder_project.settings')
 django.setup()
 
-from reminders.models import Reminder, UserInGroup
+from reminders.models import Reminder, Delivery
+from reminders.ratelimit import TelegramRateLimiter
+from reminders.retry import is_retryable, is_chat_error, backoff_delay
+from reminders.recipients import recipient_cache, resolve_recipients
+from reminders.fanout import plan_fanout
+from reminders.health import chat_statuses, record_chat_health
+from reminders.bots import BotPool, bot_id_for_token, parse_bot_tokens
+from reminders.notify import notify_reminders_changed
 
 # Настройка логирования
 def setup_logging():
@@ -39,148 +50,426 @@ def setup_logging():
 logger = setup_logging()
 
 TELEGRAM_BOT_TOKEN = config('TELEGRAM_BOT_TOKEN')
+# Дополнительные боты рассылки (токены через запятую): у каждого свой лимит Telegram
+TELEGRAM_BOT_TOKENS = parse_bot_tokens(TELEGRAM_BOT_TOKEN, config('TELEGRAM_EXTRA_BOT_TOKENS', default=''))
 TELEGRAM_PROXY_URL = config('TELEGRAM_PROXY_URL')  
 
-def create_bot_with_proxy():
-    """Создает бота с прокси для рассылки"""
-    if TELEGRAM_PROXY_URL:
-        os.environ['HTTP_PROXY'] = TELEGRAM_PROXY_URL
-        os.environ['HTTPS_PROXY'] = TELEGRAM_PROXY_URL
-        os.environ['http_proxy'] = TELEGRAM_PROXY_URL
-        os.environ['https_proxy'] = TELEGRAM_PROXY_URL
-        
-    logger.info(f"Reminder bot created {'with proxy' if TELEGRAM_PROXY_URL else ''}")
-    return Bot(token=TELEGRAM_BOT_TOKEN)
+# Лимиты Telegram (на каждого бота): ~30 сообщений в секунду и ~1 сообщение в секунду в один чат
+TELEGRAM_RATE_LIMIT = config('TELEGRAM_RATE_LIMIT', default=25, cast=float)
+TELEGRAM_CHAT_INTERVAL = config('TELEGRAM_CHAT_INTERVAL', default=1.0, cast=float)
+TELEGRAM_MAX_CONCURRENCY = config('TELEGRAM_MAX_CONCURRENCY', default=10, cast=int)
+# Склеивать напоминания, которые в один проход причитаются одному чату, в одно сообщение
+TELEGRAM_MERGE_MESSAGES = config('TELEGRAM_MERGE_MESSAGES', default=False, cast=bool)
+# Повторы при временных ошибках: число попыток и границы экспоненциальной задержки в секундах
+TELEGRAM_MAX_ATTEMPTS = config('TELEGRAM_MAX_ATTEMPTS', default=6, cast=int)
+TELEGRAM_RETRY_BASE_DELAY = config('TELEGRAM_RETRY_BASE_DELAY', default=1.0, cast=float)
+TELEGRAM_RETRY_MAX_DELAY = config('TELEGRAM_RETRY_MAX_DELAY', default=30.0, cast=float)
 
-async def send_reminder_to_user(bot, tg_id, message_text):
-    """Асинхронная функция отправки напоминания пользователю"""
-    try:
-        await bot.send_message(chat_id=tg_id, text=message_text)
-        logger.info(f"Sent reminder to {tg_id}")
-        return True
-    except Forbidden:
-        logger.warning(f"User {tg_id} blocked the bot. Skipping.")
-        return False
-    except Exception as e:
-        logger.error(f"Failed to send message to {tg_id}: {e}")
-        return False
+# Сколько напоминаний один обработчик забирает за проход
+CLAIM_BATCH_SIZE = config('CLAIM_BATCH_SIZE', default=500, cast=int)
+# Имя обработчика в claimed_by: несколько диспетчеров на разных хостах делят работу между собой
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+# Срок аренды захваченного напоминания; пока идет отправка, аренда продлевается каждую треть срока
+CLAIM_LEASE_SECONDS = config('CLAIM_LEASE_SECONDS', default=120, cast=int)
+# Через сколько секунд повторять неотправленное напоминание (диспетчер задает свое --retry-delay)
+RETRY_DELAY_SECONDS = 60
+
+# Размеры пачек при записи журнала доставок и обновлении напоминаний
+DELIVERY_BATCH_SIZE = 500
+REMINDER_UPDATE_BATCH_SIZE = 500
+
+def create_rate_limiter():
+    return TelegramRateLimiter(
+        rate=TELEGRAM_RATE_LIMIT,
+        chat_interval=TELEGRAM_CHAT_INTERVAL,
+        max_concurrency=TELEGRAM_MAX_CONCURRENCY,
+    )
 
-async def send_reminders_batch(bot, reminders_user_data):
-    """Асинхронная отправка батча напоминаний"""
+# Ограничитель основного бота
+rate_limiter = create_rate_limiter()
+
+def create_bot_with_proxy(token=TELEGRAM_BOT_TOKEN):
+    """
+    Создает бота для рассылки с собственным пулом HTTP-соединений (keep-alive).
+
+    Прокси передается в HTTPXRequest явно, а не через os.environ, чтобы не менять
+    окружение всего процесса. Бот рассчитан на долгую жизнь: его держит диспетчер.
+    """
+    request = HTTPXRequest(
+        connection_pool_size=TELEGRAM_MAX_CONCURRENCY,
+        proxy=TELEGRAM_PROXY_URL or None,
+    )
+    logger.info(f"Reminder bot {bot_id_for_token(token)} created {'with proxy' if TELEGRAM_PROXY_URL else ''}")
+    return Bot(token=token, request=request)
+
+def create_bot_pool():
+    """Все боты рассылки из TELEGRAM_BOT_TOKEN и TELEGRAM_EXTRA_BOT_TOKENS, каждый со своим ограничителем"""
+    bots = {
+        bot_id_for_token(token): (
+            create_bot_with_proxy(token),
+            rate_limiter if token == TELEGRAM_BOT_TOKEN else create_rate_limiter(),
+        )
+        for token in TELEGRAM_BOT_TOKENS
+    }
+    return BotPool(bots, default_id=bot_id_for_token(TELEGRAM_BOT_TOKEN))
+
+async def send_reminder_to_user(bot, tg_id, message_text, limiter=None):
+    """
+    Асинхронная функция отправки напоминания пользователю с учетом лимитов Telegram.
+
+    Временные ошибки (RetryAfter, таймауты, сетевые ошибки, 5xx) повторяются только для
+    этого получателя с экспоненциальной задержкой, не более TELEGRAM_MAX_ATTEMPTS раз.
+    Возвращает (статус Delivery, код ошибки, message_id).
+    """
+    limiter = limiter or rate_limiter
+    for attempt in range(TELEGRAM_MAX_ATTEMPTS):
+        try:
+            async with limiter.slot(tg_id):
+                message = await bot.send_message(chat_id=tg_id, text=message_text)
+            logger.info(f"Sent reminder to {tg_id}")
+            return Delivery.STATUS_SENT, '', message.message_id
+        except RetryAfter as e:
+            # Telegram просит подождать: ставим на паузу все отправки и повторяем
+            logger.warning(f"Flood control for {tg_id}: {e}")
+            limiter.pause(e.retry_after)
+            error = e
+        except Forbidden as e:
+            logger.warning(f"User {tg_id} blocked the bot. Deactivating chat.")
+            return Delivery.STATUS_BLOCKED, type(e).__name__, None
+        except Exception as e:
+            if is_chat_error(e):
+                logger.warning(f"Chat {tg_id} is unreachable: {e}")
+                return Delivery.STATUS_UNREACHABLE, type(e).__name__, None
+            if not is_retryable(e):
+                # Ошибка в самом сообщении (или в нашем коде): чат тут ни при чем
+                logger.error(f"Failed to send message to {tg_id}: {e}")
+                return Delivery.STATUS_REJECTED, type(e).__name__, None
+            error = e
+            if attempt + 1 < TELEGRAM_MAX_ATTEMPTS:
+                delay = backoff_delay(attempt, TELEGRAM_RETRY_BASE_DELAY, TELEGRAM_RETRY_MAX_DELAY)
+                logger.warning(f"Temporary error sending to {tg_id}: {e}. Retry in {delay:.1f}s")
+                await asyncio.sleep(delay)
+
+    logger.error(f"Failed to send message to {tg_id}: retries exhausted ({error})")
+    return Delivery.STATUS_FAILED, type(error).__name__, None
+
+def get_delivered_recipients(reminders):
+    """Получатели, которым текущий повтор каждого напоминания уже доставлен: {reminder_id: set(telegram_id)}"""
+    delivered = {r.id: set() for r in reminders}
+    if not delivered:
+        return delivered
+
+    # Фильтр по (reminder_id, repeat_number) в SQL, а не по всей истории отправок:
+    # напоминания с одинаковым номером повтора объединяются в одно условие IN
+    by_repeat = {}
+    for reminder in reminders:
+        by_repeat.setdefault(reminder.repeat_count + 1, []).append(reminder.id)
+    current_repeat = Q()
+    for repeat_number, reminder_ids in by_repeat.items():
+        current_repeat |= Q(repeat_number=repeat_number, reminder_id__in=reminder_ids)
+
+    rows = Delivery.objects.filter(current_repeat, status=Delivery.STATUS_SENT).values_list('reminder_id', 'telegram_id')
+    for reminder_id, telegram_id in rows:
+        delivered[reminder_id].add(telegram_id)
+
+    return delivered
+
+def save_deliveries(deliveries):
+    """Пакетно записывает результаты отправки; повторная попытка обновляет прежнюю запись"""
+    Delivery.objects.bulk_create(
+        deliveries,
+        batch_size=DELIVERY_BATCH_SIZE,
+        update_conflicts=True,
+        unique_fields=['reminder', 'repeat_number', 'telegram_id'],
+        update_fields=['status', 'error_code', 'message_id', 'updated_at'],
+    )
+
+async def send_reminders_batch(bots, reminders_user_data):
+    """
+    Асинхронная отправка батча напоминаний. Каждое сообщение уходит от бота, закрепленного
+    за чатом (BotPool.route), через его ограничитель; боты работают параллельно.
+
+    Сообщения строит plan_fanout: каждый чат получает напоминание один раз, а с
+    TELEGRAM_MERGE_MESSAGES несколько напоминаний одному чату уходят одним сообщением.
+    Получатели, которым этот повтор уже доставлен (по журналу Delivery), пропускаются.
+    Напоминание считается отправленным, если его получил хотя бы один получатель и ни у кого
+    не осталось временных ошибок; иначе при следующей попытке отправка пойдет только недостающим.
+    Если же никто не получил и повторять некому (все заблокировали бота, чаты недоступны
+    или Telegram отклонил сообщение), напоминание недоставляемо: повтор ничего не изменит.
+
+    Возвращает пару (ID отправленных, ID недоставляемых).
+    """
     successful_reminders = []
-    
-    for reminder_obj, user_ids_list in reminders_user_data:
+    undeliverable_reminders = []
+    delivered = await sync_to_async(get_delivered_recipients)([r for r, _ in reminders_user_data])
+
+    chat_bots = {}
+    for reminder_obj, recipients in reminders_user_data:
         logger.info(f"Processing reminder: {reminder_obj.text}")
-        
-        tasks = [
-            send_reminder_to_user(bot, tg_id, f"Вы просили напомнить:\n{reminder_obj.text}") 
-            for tg_id in user_ids_list
-        ]
-        
-        if tasks:
-            results = await asyncio.gather(*tasks, return_exceptions=True)
-            
-            successful_sends = sum(1 for r in results if r is True)
-            if successful_sends > 0:
-                successful_reminders.append(reminder_obj.id)
-                logger.info(f"Reminder {reminder_obj.id} successfully sent to {successful_sends} users")
-            else:
-                logger.warning(f"Reminder {reminder_obj.id} failed to send to all users")
-    
-    return successful_reminders
+        chat_bots.update(recipients)
+    messages = plan_fanout(reminders_user_data, delivered, merge=TELEGRAM_MERGE_MESSAGES)
+    logger.info(
+        f"Fan-out: {len(messages)} messages for {sum(len(ids) for _, ids, _ in messages)} deliveries"
+    )
 
-def send_due_reminders():
-    now = timezone.now()
-    logger.info(f"Run at: {now}")
+    # Пока идет рассылка, держим аренду захваченных напоминаний
+    heartbeat = asyncio.create_task(keep_leases([r.id for r, _ in reminders_user_data]))
+    try:
+        sends = []
+        for chat_id, _, text in messages:
+            bot, limiter = bots.route(chat_bots[chat_id])
+            sends.append(send_reminder_to_user(bot, chat_id, text, limiter))
+        results = await asyncio.gather(*sends, return_exceptions=True)
+    finally:
+        heartbeat.cancel()
+
+    repeat_numbers = {r.id: r.repeat_count + 1 for r, _ in reminders_user_data}
+    statuses = {r.id: [] for r, _ in reminders_user_data}
+    deliveries = []
+    chat_results = []
+    for (chat_id, reminder_ids, _), result in zip(messages, results):
+        if isinstance(result, Exception):
+            logger.error(f"Failed to send message to {chat_id}: {result}")
+            result = (Delivery.STATUS_FAILED, type(result).__name__, None)
+        status, error_code, message_id = result
+        chat_results.append((chat_id, status))
+        # Склеенное сообщение записывается в журнал для каждого вошедшего в него напоминания
+        for reminder_id in reminder_ids:
+            statuses[reminder_id].append(status)
+            deliveries.append(Delivery(
+                reminder_id=reminder_id,
+                repeat_number=repeat_numbers[reminder_id],
+                telegram_id=chat_id,
+                status=status,
+                error_code=error_code,
+                message_id=message_id,
+            ))
+
+    for reminder_obj, _ in reminders_user_data:
+        reminder_statuses = statuses[reminder_obj.id]
+        successful_sends = reminder_statuses.count(Delivery.STATUS_SENT)
+        total_delivered = successful_sends + len(delivered[reminder_obj.id])
+        if total_delivered > 0 and Delivery.STATUS_FAILED not in reminder_statuses:
+            successful_reminders.append(reminder_obj.id)
+            logger.info(f"Reminder {reminder_obj.id} successfully sent to {successful_sends} users")
+        elif total_delivered > 0:
+            logger.warning(f"Reminder {reminder_obj.id} sent to {successful_sends} users, {reminder_statuses.count(Delivery.STATUS_FAILED)} will be retried")
+        elif Delivery.STATUS_FAILED not in reminder_statuses:
+            undeliverable_reminders.append(reminder_obj.id)
+            logger.warning(f"Reminder {reminder_obj.id} was rejected by all users")
+        else:
+            logger.warning(f"Reminder {reminder_obj.id} failed to send to all users")
+
+    await sync_to_async(save_deliveries)(deliveries)
+    # Заблокировавшие бота и несуществующие чаты выпадают из следующих рассылок
+    await sync_to_async(record_chat_health)(chat_statuses(chat_results))
 
+    return successful_reminders, undeliverable_reminders
+
+def lease_expiry():
+    return timezone.now() + timedelta(seconds=CLAIM_LEASE_SECONDS)
+
+def claim_due_reminders(now, reminder_ids=None, exclude_ids=None, limit=None, due_before=None):
+    """
+    Забирает пачку просроченных напоминаний (при необходимости только из reminder_ids)
+    и помечает их как отправляющиеся этим обработчиком на срок аренды.
+
+    FOR UPDATE SKIP LOCKED пропускает строки, которые в этот момент забирает другой
+    обработчик, поэтому параллельные диспетчеры получают разные напоминания без ожидания.
+    Напоминания с истекшей арендой (обработчик упал) забираются повторно.
+    due_before позволяет забрать напоминания чуть раньше срока (по умолчанию now).
+    """
     with transaction.atomic():
-        due_reminders = list(
-            Reminder.objects.select_for_update()
-            .filter(
-                due_time__lte=now,
-                is_completed=False,
-                is_sending=False
+        due_reminders = Reminder.objects.select_for_update(skip_locked=True).claimable(now).filter(
+            due_time__lte=due_before or now,
+        )
+        if reminder_ids is not None:
+            due_reminders = due_reminders.filter(id__in=reminder_ids)
+        if exclude_ids:
+            due_reminders = due_reminders.exclude(id__in=exclude_ids)
+        # Порядок по due_time совпадает с частичным индексом reminder_pending_due_idx
+        due_reminders = list(due_reminders.order_by('due_time')[:limit or CLAIM_BATCH_SIZE])
+
+        if due_reminders:
+            expired = [r.id for r in due_reminders if r.is_sending]
+            if expired:
+                logger.warning(f"Reclaiming reminders with expired lease: {expired}")
+
+            # Помечаем как отправляющиеся
+            Reminder.objects.filter(id__in=[r.id for r in due_reminders]).update(
+                is_sending=True,
+                claimed_by=WORKER_ID,
+                claimed_at=timezone.now(),
+                lease_expires_at=lease_expiry(),
+                updated_at=timezone.now(),
             )
+
+    return due_reminders
+
+def extend_leases(reminder_ids):
+    """Продлевает аренду напоминаний, которые этот обработчик еще отправляет"""
+    Reminder.objects.filter(id__in=reminder_ids, is_sending=True, claimed_by=WORKER_ID).update(
+        lease_expires_at=lease_expiry(),
+    )
+
+async def keep_leases(reminder_ids):
+    """Фоновое продление аренды на время долгой рассылки"""
+    while True:
+        await asyncio.sleep(CLAIM_LEASE_SECONDS / 3)
+        try:
+            await sync_to_async(extend_leases)(reminder_ids)
+        except Exception as e:
+            logger.error(f"Failed to extend leases: {e}")
+
+def collect_recipients(reminders):
+    """Собирает Telegram ID получателей для каждого напоминания"""
+    recipients = resolve_recipients([r.id for r in reminders])
+    stats = recipient_cache.stats()
+    logger.info(f"Recipient cache: {stats['hits']} hits, {stats['misses']} misses, {stats['backend_hits']} shared hits")
+    return [(reminder, recipients[reminder.id]) for reminder in reminders if reminder.id in recipients]
+
+def release_reminders(reminder_ids, retry_at=None):
+    """
+    Сбрасывает флаг отправки у напоминаний и сообщает, что они снова ждут отправки.
+
+    retry_at сохраняется в next_attempt_at: до этого момента напоминание не забирает
+    ни один обработчик, и перезагрузка расписания по уведомлению не повторит его сразу.
+    """
+    with transaction.atomic():
+        # Только свои захваты: после истечения аренды напоминание мог забрать другой обработчик
+        Reminder.objects.filter(id__in=reminder_ids, claimed_by=WORKER_ID).update(
+            is_sending=False,
+            claimed_by='',
+            lease_expires_at=None,
+            next_attempt_at=retry_at,
+            updated_at=timezone.now(),
         )
+        notify_reminders_changed(reminder_ids)
 
-        if not due_reminders:
-            logger.info("No due reminders to send.")
-            return
-
-        ids_to_send = [r.id for r in due_reminders]
-        # Помечаем как отправляющиеся
-        Reminder.objects.filter(id__in=ids_to_send).update(is_sending=True)
-
-    reminders_user_data = []
-    reminder_objects_map = {}
-    
-    for reminder in due_reminders:
-        user_ids = UserInGroup.objects.filter(
-            group__in=reminder.groups.all()
-        ).values_list('telegram_id', flat=True)
-        user_ids_list = list(user_ids)
-        if user_ids_list:
-            reminders_user_data.append((reminder, user_ids_list))
-            reminder_objects_map[reminder.id] = reminder
+def finish_sent_reminders(successful_ids, now, delivered=True):
+    """
+    Обновляет успешно отправленные напоминания с учетом повторений.
 
-    if not reminders_user_data:
-        # Если нет пользователей, сбрасываем флаги
-        Reminder.objects.filter(id__in=ids_to_send).update(is_sending=False)
-        logger.info("No users found for any of the due reminders. Skipping send.")
-        return
+    Вся пачка блокируется одним SELECT ... FOR UPDATE и сохраняется одним bulk_update,
+    поэтому число запросов не зависит от количества напоминаний. Возвращает обновленные объекты.
+    С delivered=False так же завершаются недоставляемые напоминания (некому отправить):
+    повтор пропускается, sent_at не меняется.
+    """
+    with transaction.atomic():
+        # Блокируем записи для обновления
+        reminders = list(Reminder.objects.select_for_update().filter(id__in=successful_ids, claimed_by=WORKER_ID))
+
+        for reminder in reminders:
+            # Увеличиваем счетчик отправок
+            reminder.repeat_count += 1
+            if delivered:
+                reminder.sent_at = now
+            reminder.is_sending = False  # Сбрасываем флаг отправки
+            reminder.claimed_by = ''
+            reminder.lease_expires_at = None
+            reminder.next_attempt_at = None
+            reminder.updated_at = timezone.now()
+
+            # Проверяем, нужно ли повторять
+            if (reminder.repeat_interval_minutes > 0 and 
+                reminder.repeat_count < reminder.max_repeats):
+                # Устанавливаем следующее время отправки
+                next_due_time = now + timedelta(minutes=reminder.repeat_interval_minutes)
+                reminder.due_time = next_due_time
+                reminder.is_completed = False
+                logger.info(f"Reminder {reminder.id} scheduled for repeat at {next_due_time}. Count: {reminder.repeat_count}/{reminder.max_repeats}")
+            else:
+                # Достигли максимального количества повторов
+                reminder.is_completed = True
+                logger.info(f"Reminder {reminder.id} marked as completed. Total sends: {reminder.repeat_count}")
+
+        Reminder.objects.bulk_update(
+            reminders,
+            [
+                'repeat_count', 'sent_at', 'due_time', 'is_sending', 'claimed_by', 'lease_expires_at',
+                'next_attempt_at', 'is_completed', 'updated_at',
+            ],
+            batch_size=REMINDER_UPDATE_BATCH_SIZE,
+        )
+        # bulk_update не отправляет post_save, поэтому уведомляем слушателей явно
+        notify_reminders_changed([r.id for r in reminders if r.is_completed], 'completed')
+        notify_reminders_changed([r.id for r in reminders if not r.is_completed], 'sent' if delivered else 'updated')
+
+    return reminders
+
+async def process_due_reminders(bots, now=None, reminder_ids=None, exclude_ids=None, due_before=None,
+                                retry_delay=RETRY_DELAY_SECONDS):
+    """
+    Один проход рассылки: забирает просроченные напоминания, отправляет их и обновляет статусы.
+    Неотправленные повторяются не раньше чем через retry_delay секунд.
 
-    bot = create_bot_with_proxy()
+    Возвращает пару (ID забранных напоминаний, ID успешно отправленных).
+    """
+    now = now or timezone.now()
+    logger.info(f"Run at: {now}")
+
+    due_reminders = await sync_to_async(claim_due_reminders)(
+        now, reminder_ids, exclude_ids, due_before=due_before,
+    )
+    if not due_reminders:
+        logger.info("No due reminders to send.")
+        return [], []
+
+    ids_to_send = [r.id for r in due_reminders]
+    reminders_user_data = await sync_to_async(collect_recipients)(due_reminders)
+
+    # Напоминания без активных получателей (все выключены или групп нет) не отпускаем
+    # в очередь: иначе они забирались бы снова на каждом проходе. Они завершаются
+    # (или переходят к следующему повтору) без отправки
+    with_recipients = {r.id for r, _ in reminders_user_data}
+    no_recipient_ids = [rid for rid in ids_to_send if rid not in with_recipients]
+    if no_recipient_ids:
+        logger.warning(f"No active recipients for reminders {no_recipient_ids}. Finishing them without sending.")
+        await sync_to_async(finish_sent_reminders)(no_recipient_ids, now, delivered=False)
+    if not reminders_user_data:
+        return ids_to_send, []
 
+    retry_at = now + timedelta(seconds=retry_delay)
+    successful_ids = []
     try:
-        try:
-            loop = asyncio.get_event_loop()
-        except RuntimeError:
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-        
-        successful_ids = loop.run_until_complete(send_reminders_batch(bot, reminders_user_data))
-        
+        successful_ids, undeliverable_ids = await send_reminders_batch(bots, reminders_user_data)
+
         # Обрабатываем успешные отправки с учетом повторений
-        for reminder_id in successful_ids:
-            reminder = reminder_objects_map.get(reminder_id)
-            if not reminder:
-                continue
-                
-            with transaction.atomic():
-                # Блокируем запись для обновления
-                reminder = Reminder.objects.select_for_update().get(id=reminder_id)
-                
-                # Увеличиваем счетчик отправок
-                reminder.repeat_count += 1
-                reminder.sent_at = now
-                
-                # Проверяем, нужно ли повторять
-                if (reminder.repeat_interval_minutes > 0 and 
-                    reminder.repeat_count < reminder.max_repeats):
-                    # Устанавливаем следующее время отправки
-                    next_due_time = now + timedelta(minutes=reminder.repeat_interval_minutes)
-                    reminder.due_time = next_due_time
-                    reminder.is_sending = False  # Сбрасываем флаг отправки
-                    reminder.is_completed = False
-                    logger.info(f"Reminder {reminder_id} scheduled for repeat at {next_due_time}. Count: {reminder.repeat_count}/{reminder.max_repeats}")
-                else:
-                    # Достигли максимального количества повторов
-                    reminder.is_completed = True
-                    reminder.is_sending = False  # Сбрасываем флаг отправки
-                    logger.info(f"Reminder {reminder_id} marked as completed. Total sends: {reminder.repeat_count}")
-                
-                reminder.save()
-        
+        await sync_to_async(finish_sent_reminders)(successful_ids, now)
+        if undeliverable_ids:
+            await sync_to_async(finish_sent_reminders)(undeliverable_ids, now, delivered=False)
+
         # Сбрасываем флаг у тех, что не удалось отправить
-        failed_ids = list(set(ids_to_send) - set(successful_ids))
+        failed_ids = list(with_recipients - set(successful_ids) - set(undeliverable_ids))
         if failed_ids:
-            Reminder.objects.filter(id__in=failed_ids).update(is_sending=False)
+            await sync_to_async(release_reminders)(failed_ids, retry_at)
             logger.warning(f"Reset is_sending flag for {len(failed_ids)} failed reminders")
-            
+
     except Exception as e:
         logger.error(f"Critical error during sending: {e}", exc_info=True)
         # При любой ошибке сбрасываем флаги у всех
-        Reminder.objects.filter(id__in=ids_to_send).update(is_sending=False)
+        await sync_to_async(release_reminders)(list(with_recipients), retry_at)
+        successful_ids = []
+
+    return ids_to_send, successful_ids
+
+async def process_all_due_reminders(bots):
+    """Забирает и отправляет пачки, пока не кончатся просроченные напоминания; неудачные в этом запуске не повторяются"""
+    now = timezone.now()
+    attempted_ids = set()
+    while True:
+        claimed_ids, _ = await process_due_reminders(bots, now, exclude_ids=attempted_ids)
+        if not claimed_ids:
+            break
+        attempted_ids.update(claimed_ids)
+
+async def run_once():
+    async with create_bot_pool() as bots:
+        await process_all_due_reminders(bots)
+
+def send_due_reminders():
+    """Разовый запуск рассылки (например, из cron)"""
+    asyncio.run(run_once())
         
         
 if __name__ == "__main__":